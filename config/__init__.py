@@ -0,0 +1,2 @@
+# Load the Celery app with Django so shared_task uses it (eager without a broker)
+from .celery_app import celery_app  # noqa: F401
@@ -9,6 +9,7 @@ os.environ.setdefault(
 django.setup()
 
 from django.core.asgi import get_asgi_application
+from django.urls import re_path
 from channels.routing import ProtocolTypeRouter, URLRouter
 from pq_test.jwt_middleware import JWTAuthMiddlewareStack
 import pq_test.routing
@@ -17,7 +18,9 @@ django_asgi_app = get_asgi_application()
 
 application = ProtocolTypeRouter(
     {
-        "http": django_asgi_app,
+        "http": URLRouter(
+            pq_test.routing.http_urlpatterns + [re_path(r"", django_asgi_app)]
+        ),
         "websocket": JWTAuthMiddlewareStack(
             URLRouter(pq_test.routing.websocket_urlpatterns)
         ),
@@ -18,3 +18,18 @@ else:
     app.conf.task_store_eager_result = False
 
 app.autodiscover_tasks()
+
+# Quiz timers (pq_test.timers); needs `celery ... worker --beat` or a beat process
+app.conf.beat_schedule = {
+    "pq-fire-due-timers": {
+        "task": "pq_test.tasks.fire_due_timers",
+        "schedule": float(os.getenv("PQ_TIMER_SWEEP_SECONDS", "1")),
+        # Drop sweeps that could not start in time; the next one covers them.
+        "options": {"expires": 10},
+    },
+    # Answer archival (pq_test.archive)
+    "pq-archive-ended-sessions": {
+        "task": "pq_test.tasks.archive_ended_sessions",
+        "schedule": 24 * 60 * 60.0,
+    },
+}
@@ -134,6 +134,54 @@ else:
         }
     }
 
+# Live quiz (pq_test) runtime stores: "memory" (single process) or "redis"
+PQ_REDIS_URL = env.str(
+    "PQ_REDIS_URL",
+    default=f"redis://{env.str('REDIS_HOST', default='127.0.0.1')}:6379/1",
+)
+PQ_STATS_BACKEND = env.str(
+    "PQ_STATS_BACKEND",
+    default="redis" if env.bool("USE_REDIS", default=False) else "memory",
+)
+PQ_STATS_TTL_SECONDS = env.int("PQ_STATS_TTL_SECONDS", default=6 * 60 * 60)
+# At most one stats_update per session per interval (per process)
+PQ_STATS_BROADCAST_INTERVAL_MS = env.int("PQ_STATS_BROADCAST_INTERVAL_MS", default=250)
+# "direct" writes each answer in its request; "buffered" acks immediately and
+# upserts in batches (durable when PQ_STATS_BACKEND is "redis")
+PQ_ANSWER_INGEST_MODE = env.str("PQ_ANSWER_INGEST_MODE", default="direct")
+PQ_ANSWER_BATCH_SIZE = env.int("PQ_ANSWER_BATCH_SIZE", default=200)
+PQ_ANSWER_FLUSH_INTERVAL_MS = env.int("PQ_ANSWER_FLUSH_INTERVAL_MS", default=200)
+PQ_ANSWER_BUFFER_MAX = env.int("PQ_ANSWER_BUFFER_MAX", default=5000)
+# Flushes a buffered answer may fail (on its own) before it is dead-lettered
+PQ_ANSWER_MAX_ATTEMPTS = env.int("PQ_ANSWER_MAX_ATTEMPTS", default=5)
+PQ_SNAPSHOT_TTL_SECONDS = env.int("PQ_SNAPSHOT_TTL_SECONDS", default=60 * 60)
+# Snapshots of the memory backend (per process, invalidated per process)
+# expire after this long, which bounds how stale another worker's can be
+PQ_SNAPSHOT_LOCAL_TTL_SECONDS = env.float("PQ_SNAPSHOT_LOCAL_TTL_SECONDS", default=5.0)
+# Question bundles kept per process by the memory backend (same TTL)
+PQ_BUNDLE_LOCAL_MAX = env.int("PQ_BUNDLE_LOCAL_MAX", default=1000)
+# Entries in leaderboard_update events (throttled like stats_update)
+PQ_LEADERBOARD_SIZE = env.int("PQ_LEADERBOARD_SIZE", default=10)
+# Participants are dropped from presence after this long without a heartbeat;
+# last_active_at is written in one batched UPDATE per flush interval
+PQ_PRESENCE_TIMEOUT_SECONDS = env.int("PQ_PRESENCE_TIMEOUT_SECONDS", default=60)
+PQ_PRESENCE_FLUSH_SECONDS = env.float("PQ_PRESENCE_FLUSH_SECONDS", default=5.0)
+# Per-process cache of validated WS tokens / user principals (see pq_test.jwt_middleware)
+PQ_WS_AUTH_CACHE_SIZE = env.int("PQ_WS_AUTH_CACHE_SIZE", default=10000)
+PQ_WS_AUTH_CACHE_TTL_SECONDS = env.int("PQ_WS_AUTH_CACHE_TTL_SECONDS", default=60)
+# Recent session events kept for `resume` (older gaps get a full resync)
+PQ_EVENT_LOG_SIZE = env.int("PQ_EVENT_LOG_SIZE", default=256)
+# Participant sockets of a session are spread over this many channel groups
+# (hosts always get their own); see bench_session_fanout before raising it
+PQ_SESSION_GROUP_SHARDS = env.int("PQ_SESSION_GROUP_SHARDS", default=1)
+# Per-process cache of public-live session pages (per-user flags are added per request)
+PQ_PUBLIC_LIVE_CACHE_SECONDS = env.float("PQ_PUBLIC_LIVE_CACHE_SECONDS", default=5.0)
+# Answers of sessions ended this long ago move to compressed per-session
+# archives (pq_test.archive; daily `archive_ended_sessions` beat entry)
+PQ_ANSWER_ARCHIVE_AFTER_DAYS = env.int("PQ_ANSWER_ARCHIVE_AFTER_DAYS", default=30)
+# Comment line sent on idle SSE streams (pq_test.sse) so proxies keep them open
+PQ_SSE_KEEPALIVE_SECONDS = env.float("PQ_SSE_KEEPALIVE_SECONDS", default=15.0)
+
 
 # Database: PostgreSQL
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -0,0 +1,132 @@
+# backend/pq_test/access.py
+"""
+Quiz visibility through the denormalized QuizAccess table.
+
+A user sees a quiz for one or more reasons (QuizAccess.source): they own
+it, own or are a member of its classroom, or host one of its sessions.
+Each reason is its own row, so losing one reason (leaving the classroom,
+deleting a session) keeps the others.
+
+Signals (signals.py) keep the rows in step: membership changes grant or
+revoke member rows directly; rarer changes (quiz owner/classroom,
+classroom owner, classroom deletion, session host) recompute the affected
+quizzes with `sync_quiz_access`. `rebuild_quiz_access` recomputes all.
+"""
+from .models import Quiz, QuizAccess, QuizSession
+
+# What QuizViewSet lists; QuestionViewSet also shows quizzes the user hosts
+QUIZ_LIST_SOURCES = (
+    QuizAccess.SOURCE_OWNER,
+    QuizAccess.SOURCE_CLASSROOM_OWNER,
+    QuizAccess.SOURCE_CLASSROOM_MEMBER,
+)
+
+BATCH_SIZE = 5000
+
+
+def accessible_quiz_ids(user, sources=None):
+    """
+    Subquery of the ids of quizzes `user` can see (for `id__in=`).
+    """
+    access = QuizAccess.objects.filter(user=user)
+    if sources is not None:
+        access = access.filter(source__in=sources)
+    return access.values("quiz_id")
+
+
+def expected_access(quiz_ids):
+    """
+    (user_id, quiz_id, source) rows the given quizzes should have.
+    """
+    quizzes = Quiz.objects.filter(id__in=quiz_ids)
+    rows = set()
+    for quiz_id, owner_id, classroom_owner_id in quizzes.values_list(
+        "id", "owner_id", "classroom__owner_id"
+    ):
+        rows.add((owner_id, quiz_id, QuizAccess.SOURCE_OWNER))
+        if classroom_owner_id is not None:
+            rows.add((classroom_owner_id, quiz_id, QuizAccess.SOURCE_CLASSROOM_OWNER))
+    for quiz_id, member_id in quizzes.filter(classroom__members__isnull=False).values_list(
+        "id", "classroom__members"
+    ):
+        rows.add((member_id, quiz_id, QuizAccess.SOURCE_CLASSROOM_MEMBER))
+    for quiz_id, host_id in (
+        QuizSession.objects.filter(quiz_id__in=quiz_ids, host__isnull=False)
+        .values_list("quiz_id", "host_id")
+        .distinct()
+    ):
+        rows.add((host_id, quiz_id, QuizAccess.SOURCE_HOST))
+    return rows
+
+
+def sync_quiz_access(quiz_ids):
+    """
+    Make the QuizAccess rows of the given quizzes match their current owner,
+    classroom and sessions. Returns (added, removed).
+    """
+    quiz_ids = set(quiz_ids)
+    if not quiz_ids:
+        return 0, 0
+    expected = expected_access(quiz_ids)
+    existing = {
+        (user_id, quiz_id, source): pk
+        for pk, user_id, quiz_id, source in QuizAccess.objects.filter(
+            quiz_id__in=quiz_ids
+        ).values_list("id", "user_id", "quiz_id", "source")
+    }
+    stale = [pk for key, pk in existing.items() if key not in expected]
+    if stale:
+        QuizAccess.objects.filter(id__in=stale).delete()
+    missing = expected - existing.keys()
+    _grant(missing)
+    return len(missing), len(stale)
+
+
+def grant_classroom_members(classroom_ids, user_ids):
+    """
+    Member rows for every quiz of the classrooms (users joined them).
+    """
+    quiz_ids = list(
+        Quiz.objects.filter(classroom_id__in=classroom_ids).values_list("id", flat=True)
+    )
+    _grant(
+        (user_id, quiz_id, QuizAccess.SOURCE_CLASSROOM_MEMBER)
+        for user_id in user_ids
+        for quiz_id in quiz_ids
+    )
+
+
+def revoke_classroom_members(classroom_ids, user_ids=None):
+    """
+    Drop member rows for the classrooms' quizzes (users left; all members
+    when `user_ids` is None).
+    """
+    access = QuizAccess.objects.filter(
+        source=QuizAccess.SOURCE_CLASSROOM_MEMBER,
+        quiz_id__in=Quiz.objects.filter(classroom_id__in=classroom_ids).values("id"),
+    )
+    if user_ids is not None:
+        access = access.filter(user_id__in=user_ids)
+    access.delete()
+
+
+def grant_host(user_id, quiz_id):
+    _grant([(user_id, quiz_id, QuizAccess.SOURCE_HOST)])
+
+
+def revoke_host(user_id, quiz_id):
+    """
+    Drop the host row unless the user still hosts another session of the quiz.
+    """
+    if not QuizSession.objects.filter(quiz_id=quiz_id, host_id=user_id).exists():
+        QuizAccess.objects.filter(
+            user_id=user_id, quiz_id=quiz_id, source=QuizAccess.SOURCE_HOST
+        ).delete()
+
+
+def _grant(rows):
+    QuizAccess.objects.bulk_create(
+        [QuizAccess(user_id=user_id, quiz_id=quiz_id, source=source) for user_id, quiz_id, source in rows],
+        ignore_conflicts=True,
+        batch_size=BATCH_SIZE,
+    )
@@ -0,0 +1,185 @@
+# backend/pq_test/answers.py
+"""
+Answer submission shared by the HTTP endpoint (SubmitAnswerView) and the
+quiz WebSocket (`submit_answer` action), so validation and scoring are
+identical on both paths.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .broadcast import schedule_stats_update
+from .completion import count_answered
+from .ingest import buffer_answer
+from .leaderboard import abort_scores, begin_scores, record_score
+from .models import AnswerRecord, ParticipantSession, QuizSession
+from .scoring import score_answer
+from .snapshot import get_snapshot_cache
+from .stats import abort_answers, begin_answers, record_answer
+from .timers import expire_session
+
+
+class AnswerRejected(Exception):
+    """
+    Raised when an answer cannot be accepted; carries the HTTP status the
+    REST endpoint responds with.
+    """
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def submit_answer(session_code, user, data, participant_id=None):
+    """
+    Validate, score and store one answer for `user`.
+
+    `participant_id` lets long-lived callers (the WS consumer) skip the
+    ParticipantSession lookup after their first answer.
+    Returns (answer, participant_id).
+    """
+    cache = get_snapshot_cache()
+    try:
+        snapshot = cache.get(session_code)
+    except QuizSession.DoesNotExist:
+        raise AnswerRejected("Not found.", 404)
+
+    # Total quiz timer enforcement
+    if snapshot.is_expired():
+        # No-op once the timer (or an earlier request) has handled the expiry
+        expire_session(snapshot.session_id, snapshot.session_code, snapshot.quiz_id)
+        raise AnswerRejected(
+            "Quiz time is over. Unanswered questions marked as not done."
+        )
+
+    status = snapshot.status
+    # If host hasn't explicitly started, allow first submission to start it
+    if status == QuizSession.STATUS_NOT_STARTED:
+        session = QuizSession.objects.get(pk=snapshot.session_id)
+        session.start()
+        status = session.status
+
+    if status != QuizSession.STATUS_LIVE:
+        raise AnswerRejected("Session is not live.")
+
+    if not participant_id:
+        participant_id = cache.participant_id(snapshot, user.id)
+    participant = ParticipantSession(
+        pk=participant_id, session_id=snapshot.session_id, user_id=user.id
+    )
+
+    data = data or {}
+    question_id = data.get("question_id")
+    if question_id in [None, ""]:
+        # Fallback to the session's current question if not provided
+        question_id = snapshot.current_question_id
+    try:
+        question_id = int(question_id)
+    except Exception:
+        raise AnswerRejected("question_id is required.")
+
+    selected_option = (data.get("selected_option") or "").upper()
+    if selected_option not in {"A", "B", "C", "D"}:
+        raise AnswerRejected("selected_option must be one of A, B, C, D.")
+
+    try:
+        time_taken = float(data.get("time_taken_seconds", 0)) or 0.0
+    except Exception:
+        time_taken = 0.0
+
+    question = snapshot.question(question_id)
+    if question is None:
+        raise AnswerRejected("Not found.", 404)
+
+    # 8PQ questions score the selected option's piston weights
+    score = score_answer(question, selected_option)
+
+    if settings.PQ_ANSWER_INGEST_MODE == "buffered":
+        # Completion and stats are applied when the batch is flushed.
+        answer = buffer_answer(
+            snapshot, participant, question, selected_option, time_taken, score
+        )
+        return answer, participant.pk
+
+    answer = save_answer(
+        participant,
+        question,
+        selected_option,
+        time_taken,
+        score,
+        question_count=len(snapshot.question_ids),
+    )
+
+    schedule_stats_update(snapshot.session_code, snapshot.session_id, question.id)
+
+    return answer, participant.pk
+
+
+def save_answer(participant, question, selected_option, time_taken, score, question_count):
+    """
+    Insert or replace a participant's answer and keep the stats counters and
+    leaderboard in step with it (the replaced answer is subtracted before the
+    new one counts). A first answer to the question also bumps the
+    participant's answered count, completing them at `question_count`.
+    """
+    fields = {
+        "selected_option": selected_option,
+        "time_taken_seconds": time_taken,
+        "within_time": True,
+        "score": score,
+    }
+    # In flight until apply_counters runs, so cold rebuilds can't race it
+    begin_answers(participant.session_id, question.id)
+    begin_scores(participant.session_id)
+    try:
+        with transaction.atomic():
+            answer = (
+                AnswerRecord.objects.select_for_update()
+                .filter(participant=participant, question=question)
+                .first()
+            )
+            created = False
+            if answer is None:
+                try:
+                    with transaction.atomic():
+                        answer = AnswerRecord.objects.create(
+                            participant=participant,
+                            session_id=participant.session_id,
+                            question=question,
+                            **fields,
+                        )
+                    created = True
+                except IntegrityError:
+                    # A concurrent first submission won the insert; replace it below.
+                    answer = AnswerRecord.objects.select_for_update().get(
+                        participant=participant, question=question
+                    )
+
+            # Reuse the caller's instances so serializing the answer needs no lookups
+            answer.participant = participant
+            answer.question = question
+
+            previous = previous_score = None
+            if created:
+                count_answered([participant.pk], 1, question_count)
+            else:
+                previous = (answer.selected_option, answer.time_taken_seconds)
+                previous_score = (answer.score, answer.time_taken_seconds)
+                for name, value in fields.items():
+                    setattr(answer, name, value)
+                answer.save(update_fields=list(fields))
+
+            def apply_counters():
+                record_answer(
+                    participant.session_id, question.id, selected_option, time_taken, previous
+                )
+                record_score(
+                    participant.session_id, participant.pk, score, time_taken, previous_score
+                )
+
+            transaction.on_commit(apply_counters)
+    except Exception:
+        abort_answers(participant.session_id, question.id)
+        abort_scores(participant.session_id)
+        raise
+    return answer
@@ -5,3 +5,7 @@ from django.apps import AppConfig
 class PqTestConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "pq_test"
+
+    def ready(self):
+        # Import signals so they get registered
+        from . import signals  # noqa: F401
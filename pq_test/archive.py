@@ -0,0 +1,239 @@
+# backend/pq_test/archive.py
+"""
+Archived answers of long-ended sessions.
+
+AnswerRecord only needs to be fast for live and recent sessions. Once a
+session has been ended for PQ_ANSWER_ARCHIVE_AFTER_DAYS, `archive_session`
+moves its answers into one AnswerArchive row: every ARCHIVE_FIELDS column
+as a numpy array, saved with `np.savez_compressed`, so the hot table and
+its indexes only hold live and recent sessions.
+
+Everything that reads the answers of a session or participant goes
+through this module (`session_answer_values`, `participant_answers`,
+`participant_answer_values`) or falls back to `archived_values` when the
+hot table has nothing, so archived sessions keep their results, reports,
+exports and rescoring. `restore_session` moves answers back (rescoring
+does this before updating scores).
+
+Run by the `archive_ended_sessions` Celery task (daily beat entry) or the
+`archive_answers` command.
+"""
+import io
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import AnswerArchive, AnswerRecord, ParticipantSession, Question, QuizSession
+
+ARCHIVE_FIELDS = (
+    "id",
+    "participant_id",
+    "question_id",
+    "selected_option",
+    "time_taken_seconds",
+    "submitted_at",
+    "within_time",
+    "score",
+)
+
+# submitted_at is stored as microseconds since the epoch
+_DTYPES = {
+    "id": "i8",
+    "participant_id": "i8",
+    "question_id": "i8",
+    "selected_option": "U1",
+    "time_taken_seconds": "f8",
+    "submitted_at": "i8",
+    "within_time": "?",
+    "score": "f8",
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+ANSWER_CHUNK_SIZE = 5000
+RESTORE_BATCH_SIZE = 2000
+
+
+def _pack(rows) -> bytes:
+    columns = dict(zip(ARCHIVE_FIELDS, zip(*rows)))
+    columns["submitted_at"] = [(value - _EPOCH) // _MICROSECOND for value in columns["submitted_at"]]
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        **{name: np.array(columns[name], dtype=_DTYPES[name]) for name in ARCHIVE_FIELDS},
+    )
+    return buffer.getvalue()
+
+
+def _unpack(data) -> dict:
+    with np.load(io.BytesIO(bytes(data))) as arrays:
+        return {name: arrays[name] for name in ARCHIVE_FIELDS}
+
+
+def _values(columns, name):
+    if name == "submitted_at":
+        return [_EPOCH + timedelta(microseconds=value) for value in columns[name].tolist()]
+    return columns[name].tolist()
+
+
+def load_archive(session_id):
+    """
+    The archived columns of a session ({field: array}), or None while its
+    answers are in AnswerRecord.
+    """
+    data = AnswerArchive.objects.filter(session_id=session_id).values_list("data", flat=True).first()
+    return None if data is None else _unpack(data)
+
+
+def archived_values(session_id, fields):
+    """
+    Tuples of `fields` (from ARCHIVE_FIELDS) for the archived answers of a
+    session, in id order; None if the session is not archived.
+    """
+    columns = load_archive(session_id)
+    if columns is None:
+        return None
+    return zip(*(_values(columns, name) for name in fields))
+
+
+def session_answer_values(session_id, fields):
+    """
+    Tuples of `fields` (from ARCHIVE_FIELDS) for every answer of a session,
+    whether hot or archived.
+    """
+    rows = archived_values(session_id, fields)
+    if rows is None:
+        rows = (
+            AnswerRecord.objects.filter(session_id=session_id)
+            .order_by()
+            .values_list(*fields)
+            .iterator(chunk_size=ANSWER_CHUNK_SIZE)
+        )
+    return rows
+
+
+def _participant_rows(participant, fields):
+    columns = load_archive(participant.session_id)
+    if columns is None:
+        return []
+    mine = columns["participant_id"] == participant.pk
+    selected = {name: columns[name][mine] for name in fields}
+    return list(zip(*(_values(selected, name) for name in fields)))
+
+
+def participant_answer_values(participant, *fields):
+    """
+    `participant.answers.values(*fields)` as a list, hot or archived.
+    """
+    answers = list(participant.answers.values(*fields))
+    if answers:
+        return answers
+    return [dict(zip(fields, row)) for row in _participant_rows(participant, fields)]
+
+
+def participant_answers(participant):
+    """
+    A participant's AnswerRecords with `question` loaded. Archived answers
+    come back as unsaved instances; answers to questions deleted since are
+    left out, as a join would.
+    """
+    answers = list(participant.answers.select_related("question"))
+    if answers:
+        return answers
+    rows = _participant_rows(participant, ARCHIVE_FIELDS)
+    questions = Question.objects.in_bulk({row[2] for row in rows})
+    answers = []
+    for row in rows:
+        values = dict(zip(ARCHIVE_FIELDS, row))
+        question = questions.get(values.pop("question_id"))
+        if question is None:
+            continue
+        values.pop("participant_id")
+        answers.append(
+            AnswerRecord(
+                participant=participant,
+                session_id=participant.session_id,
+                question=question,
+                **values,
+            )
+        )
+    return answers
+
+
+def archive_candidates(days=None):
+    """
+    Ended sessions older than `days` (PQ_ANSWER_ARCHIVE_AFTER_DAYS) that
+    still have hot answers.
+    """
+    if days is None:
+        days = settings.PQ_ANSWER_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    return QuizSession.objects.filter(
+        Exists(AnswerRecord.objects.filter(session_id=OuterRef("pk"))),
+        status=QuizSession.STATUS_ENDED,
+        ended_at__lt=cutoff,
+    )
+
+
+def archive_session(session_id):
+    """
+    Move an ended session's answers into an AnswerArchive. Returns the
+    archive, or None when the session has not ended, has no hot answers or
+    is archived already.
+    """
+    with transaction.atomic():
+        session = QuizSession.objects.select_for_update().filter(pk=session_id).first()
+        if session is None or session.status != QuizSession.STATUS_ENDED:
+            return None
+        if AnswerArchive.objects.filter(session_id=session_id).exists():
+            return None
+        rows = list(
+            AnswerRecord.objects.filter(session_id=session_id)
+            .order_by("id")
+            .values_list(*ARCHIVE_FIELDS)
+        )
+        if not rows:
+            return None
+        archive = AnswerArchive.objects.create(
+            session_id=session_id, row_count=len(rows), data=_pack(rows)
+        )
+        AnswerRecord.objects.filter(session_id=session_id).delete()
+    return archive
+
+
+def restore_session(session_id):
+    """
+    Move archived answers back into AnswerRecord (dropping the ones whose
+    participant or question has been deleted since). Returns how many.
+    """
+    with transaction.atomic():
+        archive = AnswerArchive.objects.select_for_update().filter(session_id=session_id).first()
+        if archive is None:
+            return 0
+        columns = _unpack(archive.data)
+        participant_ids = set(
+            ParticipantSession.objects.filter(session_id=session_id).values_list("id", flat=True)
+        )
+        question_ids = set(
+            Question.objects.filter(id__in=np.unique(columns["question_id"]).tolist()).values_list(
+                "id", flat=True
+            )
+        )
+        answers = [
+            AnswerRecord(session_id=session_id, **dict(zip(ARCHIVE_FIELDS, row)))
+            for row in zip(*(_values(columns, name) for name in ARCHIVE_FIELDS))
+            if row[1] in participant_ids and row[2] in question_ids
+        ]
+        submitted = [answer.submitted_at for answer in answers]
+        AnswerRecord.objects.bulk_create(answers, batch_size=RESTORE_BATCH_SIZE)
+        # bulk_create stamps auto_now_add fields; put the original times back
+        for answer, submitted_at in zip(answers, submitted):
+            answer.submitted_at = submitted_at
+        AnswerRecord.objects.bulk_update(answers, ["submitted_at"], batch_size=RESTORE_BATCH_SIZE)
+        archive.delete()
+    return len(answers)
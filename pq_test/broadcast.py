@@ -0,0 +1,258 @@
+# backend/pq_test/broadcast.py
+"""
+Coalesced `stats_update` / `leaderboard_update` / `presence_update` broadcasting.
+
+Answers only mark a session/question as dirty; a per-session ticker sends at
+most one `stats_update` per PQ_STATS_BROADCAST_INTERVAL_MS, always carrying
+the latest counters, followed by one `leaderboard_update` when the session
+shows a leaderboard. Connect/disconnect changes ride the same ticker as one
+`presence_update`. Question changes and session end flush immediately.
+
+Throttling is per process: with several ASGI workers each one sends at most
+one update per interval for the sessions it has seen answers for.
+
+The broadcaster is a process-wide singleton used from the ASGI loop
+(consumers), request threads, the ingest flusher thread and Celery. Its
+state and tickers live on one event loop it owns: the first running loop it
+is used from (the ASGI server's), or a private loop on a daemon thread when
+sync code gets there first. Every other caller hands its call over to that
+loop, so a ticker never lands on a short-lived async_to_sync loop and the
+dicts below are only ever touched from one thread.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections
+
+from .events import publish_event
+from .leaderboard import leaderboard_event
+from .stats import question_stats
+
+
+def _read_updates(pending, leaderboard_session):
+    close_old_connections()
+    updates = [question_stats(session_id, question_id) for session_id, question_id in pending]
+    leaderboard = None
+    if leaderboard_session is not None:
+        leaderboard = leaderboard_event(leaderboard_session)
+    return updates, leaderboard
+
+
+def _copy_outcome(task, future):
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class StatsBroadcaster:
+    def __init__(self, interval=None, channel_layer=None):
+        if interval is None:
+            interval = settings.PQ_STATS_BROADCAST_INTERVAL_MS / 1000.0
+        self.interval = interval
+        self._channel_layer = channel_layer
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._reader = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pq-stats-reader"
+        )
+        # Only touched on self._loop
+        self._dirty = {}
+        self._leaderboards = {}
+        self._presence = {}
+        self._last_sent = {}
+        self._tickers = {}
+
+    @property
+    def channel_layer(self):
+        return self._channel_layer or get_channel_layer()
+
+    # Entry points: coroutines for async callers, *_threadsafe for threads
+
+    async def mark_dirty(self, session_code, session_id, question_id):
+        await self._on_loop(self._mark_dirty, session_code, session_id, question_id)
+
+    def mark_dirty_threadsafe(self, session_code, session_id, question_id):
+        # Nothing to wait for: the answer path doesn't block on the loop
+        self._submit(self._owner_loop(), self._mark_dirty, session_code, session_id, question_id)
+
+    async def mark_presence(self, session_code, count):
+        """
+        Coalesce a `presence_update` carrying the latest connected count.
+        """
+        await self._on_loop(self._mark_presence, session_code, count)
+
+    async def flush(self, session_code, session_id=None, question_id=None):
+        """
+        Send pending stats now (plus the given question's, if any) and cancel
+        the pending tick for this session.
+        """
+        await self._on_loop(self._flush, session_code, session_id, question_id)
+
+    def flush_threadsafe(self, session_code, session_id=None, question_id=None):
+        """
+        flush() from a thread without a running loop; returns once sent.
+        """
+        loop = self._owner_loop()
+        self._submit(loop, self._flush, session_code, session_id, question_id).result()
+
+    def forget(self, session_code):
+        self._submit(self._owner_loop(), self._forget, session_code)
+
+    # Loop ownership
+
+    def _owner_loop(self, running=None):
+        """
+        The loop the state lives on. `running` (the caller's loop) is adopted
+        when there is none yet; sync callers get a private loop instead. A
+        loop that has stopped is replaced, dropping its state.
+        """
+        with self._loop_lock:
+            loop = self._loop
+            if loop is None or loop.is_closed() or not loop.is_running():
+                if loop is not None:
+                    self._dirty, self._leaderboards, self._presence = {}, {}, {}
+                    self._tickers = {}
+                loop = running or self._start_loop()
+                self._loop = loop
+            return loop
+
+    @staticmethod
+    def _start_loop():
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        loop.call_soon(started.set)
+        threading.Thread(target=loop.run_forever, name="pq-stats-broadcaster", daemon=True).start()
+        started.wait()
+        return loop
+
+    async def _on_loop(self, func, *args):
+        running = asyncio.get_running_loop()
+        loop = self._owner_loop(running)
+        if loop is running:
+            return await func(*args)
+        return await asyncio.wrap_future(self._submit(loop, func, *args))
+
+    @staticmethod
+    def _submit(loop, func, *args):
+        """
+        Run the coroutine function on `loop` from any thread; returns a
+        concurrent Future. The task gets a fresh context so it never waits
+        on the caller's thread-sensitive executor.
+        """
+        future = concurrent.futures.Future()
+
+        def start():
+            task = loop.create_task(func(*args))
+            task.add_done_callback(lambda task: _copy_outcome(task, future))
+
+        loop.call_soon_threadsafe(start, context=contextvars.Context())
+        return future
+
+    # On the owner loop
+
+    async def _mark_dirty(self, session_code, session_id, question_id):
+        self._dirty.setdefault(session_code, set()).add((session_id, question_id))
+        self._leaderboards[session_code] = session_id
+        self._schedule(session_code)
+
+    async def _mark_presence(self, session_code, count):
+        self._presence[session_code] = count
+        self._schedule(session_code)
+
+    def _schedule(self, session_code):
+        ticker = self._tickers.get(session_code)
+        if ticker is not None and not ticker.done():
+            return
+
+        wait = self._last_sent.get(session_code, 0.0) + self.interval - time.monotonic()
+        # Fresh context: a ticker started from a handed-over call must not
+        # depend on the caller's thread-sensitive executor.
+        self._tickers[session_code] = asyncio.get_running_loop().create_task(
+            self._flush_later(session_code, max(wait, 0.0)),
+            context=contextvars.Context(),
+        )
+
+    async def _flush(self, session_code, session_id=None, question_id=None):
+        ticker = self._tickers.pop(session_code, None)
+        if ticker is not None:
+            ticker.cancel()
+        if question_id is not None:
+            self._dirty.setdefault(session_code, set()).add((session_id, question_id))
+        await self._send(session_code)
+
+    async def _flush_later(self, session_code, wait):
+        # Cancelled by _flush() (which sends itself) or _forget()
+        await asyncio.sleep(wait)
+        del self._tickers[session_code]
+        await self._send(session_code)
+
+    async def _send(self, session_code):
+        pending = self._dirty.pop(session_code, None) or ()
+        leaderboard_session = self._leaderboards.pop(session_code, None)
+        connected = self._presence.pop(session_code, None)
+        if not pending and connected is None:
+            return
+        self._last_sent[session_code] = time.monotonic()
+        if connected is not None:
+            await publish_event(
+                session_code, "presence_update", {"connected": connected}, self.channel_layer
+            )
+        if not pending:
+            return
+        # Own reader thread: a caller blocked in flush_threadsafe() may hold
+        # the shared thread-sensitive one
+        updates, leaderboard = await sync_to_async(
+            _read_updates, thread_sensitive=False, executor=self._reader
+        )(sorted(pending), leaderboard_session)
+        for stats in updates:
+            await publish_event(session_code, "stats_update", stats, self.channel_layer)
+        if leaderboard is not None:
+            await publish_event(
+                session_code, "leaderboard_update", leaderboard, self.channel_layer
+            )
+
+    async def _forget(self, session_code):
+        ticker = self._tickers.pop(session_code, None)
+        if ticker is not None:
+            ticker.cancel()
+        self._dirty.pop(session_code, None)
+        self._leaderboards.pop(session_code, None)
+        self._presence.pop(session_code, None)
+        self._last_sent.pop(session_code, None)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster() -> StatsBroadcaster:
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = StatsBroadcaster()
+    return _broadcaster
+
+
+def schedule_stats_update(session_code, session_id, question_id):
+    """
+    Sync entry point for views: coalesce a stats_update for this question.
+    """
+    get_broadcaster().mark_dirty_threadsafe(session_code, session_id, question_id)
+
+
+def flush_stats_updates(session_code, session_id=None, question_id=None):
+    """
+    Sync entry point for views: send pending stats (and optionally the given
+    question's) right away.
+    """
+    get_broadcaster().flush_threadsafe(session_code, session_id, question_id)
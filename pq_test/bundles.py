@@ -0,0 +1,93 @@
+# backend/pq_test/bundles.py
+"""
+Per-quiz question bundles: a quiz's questions serialized once
+(QuestionSerializer, ordered by order then id) and kept in the same
+backend as the session snapshots (PQ_STATS_BACKEND, PQ_SNAPSHOT_TTL_SECONDS).
+
+`by_code` and `projector_view` serve questions from the bundle. Saving or
+deleting a question, or saving the quiz (the default time limit feeds
+`effective_time_limit`), drops it; see signals.py. The memory backend only
+drops it in the process that saved, so its bundles expire after
+PQ_SNAPSHOT_LOCAL_TTL_SECONDS like the snapshots, and at most
+PQ_BUNDLE_LOCAL_MAX are kept.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Question
+from .serializers import QuestionSerializer
+from .utils import TTLCache
+
+
+class InMemoryBundleStore:
+    def __init__(self, ttl=None, maxsize=None):
+        self.ttl = ttl or settings.PQ_SNAPSHOT_LOCAL_TTL_SECONDS
+        self._bundles = TTLCache(maxsize or settings.PQ_BUNDLE_LOCAL_MAX)
+
+    def get(self, quiz_id):
+        return self._bundles.get(quiz_id)
+
+    def set(self, quiz_id, data):
+        self._bundles.set(quiz_id, data, time.time() + self.ttl)
+
+    def delete(self, quiz_id):
+        self._bundles.pop(quiz_id)
+
+
+class RedisBundleStore:
+    def __init__(self, client=None, ttl=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.ttl = ttl or settings.PQ_SNAPSHOT_TTL_SECONDS
+
+    def get(self, quiz_id):
+        raw = self.client.get(f"pq:questions:{quiz_id}")
+        return json.loads(raw) if raw else None
+
+    def set(self, quiz_id, data):
+        self.client.set(f"pq:questions:{quiz_id}", json.dumps(data), ex=self.ttl)
+
+    def delete(self, quiz_id):
+        self.client.delete(f"pq:questions:{quiz_id}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bundle_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.PQ_STATS_BACKEND == "redis":
+                    _store = RedisBundleStore()
+                else:
+                    _store = InMemoryBundleStore()
+    return _store
+
+
+def question_bundle(quiz):
+    """
+    Serialized questions of `quiz` (a list of dicts), built on a miss.
+    """
+    store = get_bundle_store()
+    data = store.get(quiz.id)
+    if data is None:
+        questions = list(Question.objects.filter(quiz_id=quiz.id).order_by("order", "id"))
+        for question in questions:
+            # effective_time_limit reads the quiz; don't load it per question
+            question.quiz = quiz
+        data = [dict(row) for row in QuestionSerializer(questions, many=True).data]
+        store.set(quiz.id, data)
+    return data
+
+
+def invalidate_question_bundle(quiz_id):
+    get_bundle_store().delete(quiz_id)
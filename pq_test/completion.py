@@ -0,0 +1,41 @@
+# backend/pq_test/completion.py
+"""
+Participant completion by counter.
+
+`ParticipantSession.answered_count` is bumped with an `F()` update whenever
+a participant's answer to a new question is stored (replacing an answer
+does not count). The same UPDATE marks the participant completed
+("answered_all") when the count reaches the quiz's question count, so
+completion costs one statement per answer instead of an anti-join over the
+quiz's questions and answers. `not_done_questions` is only worked out when
+a session's time runs out (timers.complete_expired_participants).
+"""
+from django.db.models import Case, F, JSONField, Value, When
+from django.utils import timezone
+
+from .models import ParticipantSession
+
+
+def count_answered(participant_ids, new_answers, question_count, now=None):
+    """
+    Add `new_answers` to the answered count of the given participants and
+    complete those that reach `question_count`. One UPDATE.
+    """
+    # Conditions read the pre-update count, so only the crossing update completes.
+    crossing = {
+        "answered_count__lt": question_count,
+        "answered_count__gte": question_count - new_answers,
+    }
+    return ParticipantSession.objects.filter(id__in=participant_ids).update(
+        completed=Case(When(then=Value(True), **crossing), default=F("completed")),
+        completed_reason=Case(
+            When(then=Value("answered_all"), **crossing), default=F("completed_reason")
+        ),
+        not_done_questions=Case(
+            When(then=Value([], output_field=JSONField()), **crossing),
+            default=F("not_done_questions"),
+        ),
+        last_active_at=now or timezone.now(),
+        # Last, so backends that assign left to right still compare the old count
+        answered_count=F("answered_count") + new_answers,
+    )
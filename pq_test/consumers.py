@@ -1,61 +1,225 @@
 # backend/pq_test/consumers.py
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.contrib.auth.models import AnonymousUser
 
+from .answers import AnswerRejected, submit_answer
+from .broadcast import get_broadcaster
+from .events import (
+    get_event_log,
+    host_group_name,
+    participant_group_name,
+    publish_event,
+    question_event_data,
+)
 from .models import QuizSession, Question
-from .views import compute_question_stats
+from .presence import get_presence
+from .serializers import AnswerRecordSerializer
+from .snapshot import get_snapshot_cache
+from .stats import question_stats
+from .wire import JSON, MSGPACK, decode, encode, negotiate
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def resync_state(session_code):
+    """
+    Current state of a session for a client that cannot catch up from the
+    event log (also the first event of an SSE stream).
+    """
+    # Read the seq first: anything published while the state is built
+    # is delivered live afterwards.
+    seq = get_event_log().last_seq(session_code)
+    session = QuizSession.objects.select_related(
+        "quiz", "current_question__quiz"
+    ).get(session_code=session_code)
+    question = session.current_question
+    return {
+        "seq": seq,
+        "status": session.status,
+        "mode": session.mode,
+        "total_time_expires_at": _isoformat(session.total_time_expires_at),
+        "current_question_expires_at": _isoformat(session.current_question_expires_at),
+        "current_question": question_event_data(question) if question else None,
+        "stats": question_stats(session.id, question.id) if question else None,
+        "connected": get_presence().store.count(session_code),
+    }
 
 
 class QuizSessionConsumer(AsyncJsonWebsocketConsumer):
     """
     WebSocket for a live quiz session.
 
-    Group name: pq_session_<session_code>
+    Groups: pq_session_<session_code>_host for the host's sockets, otherwise
+    one of the session's participant shards (see pq_test.events).
 
     Incoming actions:
     - "join"                -> client says "I'm here"
+    - "heartbeat"           -> participant is still connected (no reply)
+    - "resume"              -> reconnecting client sends {"last_seq": n}
+    - "submit_answer"       -> participant answers (same rules as the HTTP endpoint)
     - "host_set_question"   -> host changes current question
     - "host_show_results"   -> host shows results without ending
     - "host_end"            -> host ends the session
 
+    Group events carry a per-session "seq" (see pq_test.events). A client
+    that reconnects sends `resume` with the last seq it applied and receives
+    the events it missed, in order; if they are no longer buffered it gets
+    one "resync" with the current state (and its seq) instead. Live events up
+    to the replayed seq are not sent twice.
+
+    Frames are JSON by default; the `pq.msgpack` subprotocol or
+    `?format=msgpack` switches the connection to MessagePack (see pq_test.wire).
+
     Outgoing events:
-    - event: "joined"
+    - event: "joined"           (with the session's current seq)
+    - event: "resync"
+    - event: "answer_accepted"  (only to the submitting socket)
     - event: "current_question_changed"
     - event: "stats_update"
+    - event: "leaderboard_update"
+    - event: "presence_update"  (connected participants count)
     - event: "session_ended"
     """
 
     async def connect(self):
         self.session_code = self.scope["url_route"]["kwargs"]["session_code"]
-        self.group_name = f"pq_session_{self.session_code}"
+        self.group_name = None
+        self.participant_id = None
+        self.resumed_seq = 0
+        self.wire_format, subprotocol = negotiate(self.scope)
 
         user = self.scope.get("user")
         if not user or isinstance(user, AnonymousUser) or not user.is_authenticated:
             await self.close(code=4401)
             return
 
+        self.presence_session_id = None
+        snapshot = await self._get_snapshot()
+        self.is_host = snapshot is not None and snapshot.data["host_id"] == user.id
+        if self.is_host:
+            self.group_name = host_group_name(self.session_code)
+        else:
+            self.group_name = participant_group_name(self.session_code, self.channel_name)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept(subprotocol)
+
+        # Presence counts participants only; unknown codes are not tracked.
+        if snapshot is not None and not self.is_host:
+            self.presence_session_id = snapshot.session_id
+            count = await get_presence().connected(
+                self.session_code, self.presence_session_id, user.id
+            )
+            await get_broadcaster().mark_presence(self.session_code, count)
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if getattr(self, "presence_session_id", None) is not None:
+            count = await get_presence().disconnected(
+                self.session_code, self.presence_session_id, self.scope["user"].id
+            )
+            await get_broadcaster().mark_presence(self.session_code, count)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        try:
+            if text_data is not None:
+                content = await self.decode_json(text_data)
+            elif bytes_data is not None and self.wire_format == MSGPACK:
+                content = decode(bytes_data)
+            else:
+                raise ValueError("Binary frames need the msgpack format")
+            if not isinstance(content, dict):
+                raise ValueError("Expected an object")
+        except ValueError as exc:
+            # Malformed input gets an error, not a dropped connection
+            await self.send_json(
+                {"event": "error", "data": {"detail": f"Malformed frame: {exc}"}}
+            )
+            return
+        await self.receive_json(content, **kwargs)
+
+    async def send_json(self, content, close=False):
+        if self.wire_format == JSON:
+            await super().send_json(content, close=close)
+            return
+        frame = encode(self.wire_format, content["event"], content.get("data", {}), content.get("seq"))
+        await self.send(bytes_data=frame, close=close)
 
     async def receive_json(self, content, **kwargs):
         action = content.get("action")
         user = self.scope.get("user")
 
         if action == "join":
-            await self.send_json({"event": "joined", "data": {"user_id": user.id}})
+            seq = await sync_to_async(get_event_log().last_seq, thread_sensitive=False)(
+                self.session_code
+            )
+            await self.send_json(
+                {"event": "joined", "data": {"user_id": user.id, "seq": seq}}
+            )
             return
 
-        if action == "host_set_question":
+        if action == "resume":
+            await self._handle_resume(content)
+            return
+
+        if action == "heartbeat":
+            if self.presence_session_id is not None:
+                await get_presence().heartbeat(
+                    self.session_code, self.presence_session_id, user.id
+                )
+            return
+
+        if action == "submit_answer":
+            await self._handle_submit_answer(user, content)
+        elif action == "host_set_question":
             await self._handle_host_set_question(user, content)
         elif action == "host_show_results":
             await self._handle_host_show_results(user)
         elif action == "host_end":
             await self._handle_host_end(user)
 
+    async def _handle_submit_answer(self, user, content):
+        try:
+            data = await self._submit_answer(user, content)
+        except AnswerRejected as exc:
+            await self.send_json(
+                {"event": "error", "data": {"detail": exc.detail, "action": "submit_answer"}}
+            )
+            return
+
+        await self.send_json({"event": "answer_accepted", "data": data})
+
+    async def _handle_resume(self, content):
+        try:
+            last_seq = int(content.get("last_seq"))
+        except (TypeError, ValueError):
+            last_seq = -1
+        if last_seq < 0:
+            await self.send_json(
+                {"event": "error", "data": {"detail": "last_seq required", "action": "resume"}}
+            )
+            return
+
+        missed = await sync_to_async(get_event_log().since, thread_sensitive=False)(
+            self.session_code, last_seq
+        )
+        if missed is None:
+            state = await self._get_resync_state()
+            await self.send_json({"event": "resync", "data": state, "seq": state["seq"]})
+            self.resumed_seq = state["seq"]
+            return
+
+        for event in missed:
+            if event.get("hosts_only") and not self.is_host:
+                continue
+            await self.send_json({"event": event["event"], "data": event["data"], "seq": event["seq"]})
+        # Group messages queued meanwhile may repeat the replayed events
+        self.resumed_seq = missed[-1]["seq"] if missed else last_seq
+
     async def _handle_host_set_question(self, user, content):
         session = await self._get_session()
 
@@ -79,37 +243,18 @@ class QuizSessionConsumer(AsyncJsonWebsocketConsumer):
 
         await self._set_current_question(session, question)
 
+        # Deliver pending stats of the previous question before switching
+        await get_broadcaster().flush(self.session_code)
+
         # compute time limit inside sync context to avoid async DB access
-        time_limit = await database_sync_to_async(lambda: question.effective_time_limit())()
-
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "broadcast_event",
-                "event": "current_question_changed",
-                "data": {
-                    "question_id": question.id,
-                    "question_text": question.text,
-                    "option_a": question.option_a,
-                    "option_b": question.option_b,
-                    "option_c": question.option_c,
-                    "option_d": question.option_d,
-                    "time_limit": time_limit,
-                    "order": question.order,
-                },
-            },
-        )
+        payload = await database_sync_to_async(question_event_data)(question)
 
-        stats = await self._compute_stats(session, question)
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "broadcast_event",
-                "event": "stats_update",
-                "data": stats,
-            },
+        await publish_event(
+            self.session_code, "current_question_changed", payload, self.channel_layer
         )
 
+        await get_broadcaster().flush(self.session_code, session.id, question.id)
+
     async def _handle_host_end(self, user):
         session = await self._get_session()
 
@@ -118,15 +263,10 @@ class QuizSessionConsumer(AsyncJsonWebsocketConsumer):
             return
 
         await self._end_session(session)
+        await get_broadcaster().flush(self.session_code)
+        get_broadcaster().forget(self.session_code)
 
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "broadcast_event",
-                "event": "session_ended",
-                "data": {},
-            },
-        )
+        await publish_event(self.session_code, "session_ended", {}, self.channel_layer)
 
     async def _handle_host_show_results(self, user):
         session = await self._get_session()
@@ -135,22 +275,21 @@ class QuizSessionConsumer(AsyncJsonWebsocketConsumer):
             await self.send_json({"event": "error", "data": {"detail": "Not host"}})
             return
 
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "broadcast_event",
-                "event": "session_results",
-                "data": {},
-            },
-        )
+        await publish_event(self.session_code, "session_results", {}, self.channel_layer)
 
     async def broadcast_event(self, event):
-        await self.send_json(
-            {
-                "event": event["event"],
-                "data": event.get("data", {}),
-            }
-        )
+        seq = event.get("seq")
+        if seq is not None and seq <= self.resumed_seq:
+            return
+        frames = event.get("frames")
+        if frames is None:
+            await self.send_json(
+                {"event": event["event"], "data": event.get("data", {}), "seq": seq}
+            )
+        elif self.wire_format == MSGPACK:
+            await self.send(bytes_data=frames[MSGPACK])
+        else:
+            await self.send(text_data=frames[JSON])
 
     @database_sync_to_async
     def _get_session(self):
@@ -158,6 +297,17 @@ class QuizSessionConsumer(AsyncJsonWebsocketConsumer):
             session_code=self.session_code
         )
 
+    @database_sync_to_async
+    def _get_snapshot(self):
+        try:
+            return get_snapshot_cache().get(self.session_code)
+        except QuizSession.DoesNotExist:
+            return None
+
+    @database_sync_to_async
+    def _get_resync_state(self):
+        return resync_state(self.session_code)
+
     @database_sync_to_async
     def _get_question(self, session, question_id):
         try:
@@ -171,13 +321,15 @@ class QuizSessionConsumer(AsyncJsonWebsocketConsumer):
 
     @database_sync_to_async
     def _set_current_question(self, session, question):
-        session.current_question = question
-        session.save(update_fields=["current_question"])
+        session.set_current_question(question)
 
     @database_sync_to_async
     def _end_session(self, session):
         session.end()
 
     @database_sync_to_async
-    def _compute_stats(self, session, question):
-        return compute_question_stats(session, question)
+    def _submit_answer(self, user, content):
+        answer, self.participant_id = submit_answer(
+            self.session_code, user, content, participant_id=self.participant_id
+        )
+        return AnswerRecordSerializer(answer).data
@@ -0,0 +1,186 @@
+# backend/pq_test/deletion.py
+"""
+Background deletion of quizzes and sessions.
+
+Deleting a busy quiz through the ORM collects every related row in memory
+(to cascade and send signals) inside one request transaction. Instead:
+
+1. `hide_quiz` / `hide_session` set `deleted_at` (the default managers leave
+   hidden rows out), drop the caches and access rows that point at them and
+   create a DeletionJob, all within the request.
+2. `run_deletion_job` (Celery task `run_deletion_job`, or the
+   `run_deletion_jobs` command) deletes the rows children first, in
+   id-ordered batches of DELETE_BATCH_SIZE with a raw
+   `DELETE ... WHERE id IN (...)`, one short transaction per batch, and
+   records progress on the job. A job that stopped half way can simply be
+   run again.
+"""
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .access import revoke_host
+from .bundles import invalidate_question_bundle
+from .events import get_event_log
+from .leaderboard import invalidate_leaderboard
+from .models import (
+    AnswerArchive,
+    AnswerRecord,
+    DeletionJob,
+    ParticipantSession,
+    Question,
+    Quiz,
+    QuizAccess,
+    QuizSession,
+    SessionReport,
+)
+from .snapshot import invalidate_session_snapshot
+from .stats import invalidate_stats
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 2000
+
+
+def hide_quiz(quiz, user):
+    """
+    Hide a quiz and its sessions right away and queue their deletion.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Quiz.all_objects.filter(pk=quiz.pk).update(deleted_at=now)
+        sessions = list(
+            QuizSession.all_objects.filter(quiz_id=quiz.pk).values_list("id", "session_code")
+        )
+        QuizSession.all_objects.filter(quiz_id=quiz.pk).update(deleted_at=now)
+        QuizAccess.objects.filter(quiz_id=quiz.pk).delete()
+        job = DeletionJob.objects.create(
+            kind=DeletionJob.KIND_QUIZ, object_id=quiz.pk, label=quiz.title, requested_by=user
+        )
+        transaction.on_commit(lambda: _forget_sessions(sessions))
+        transaction.on_commit(lambda: invalidate_question_bundle(quiz.pk))
+        transaction.on_commit(lambda: _enqueue(job.pk))
+    return job
+
+
+def hide_session(session, user):
+    """
+    Hide a session right away and queue its deletion.
+    """
+    with transaction.atomic():
+        QuizSession.all_objects.filter(pk=session.pk).update(deleted_at=timezone.now())
+        if session.host_id is not None:
+            # Hidden sessions no longer count as hosting the quiz
+            revoke_host(session.host_id, session.quiz_id)
+        job = DeletionJob.objects.create(
+            kind=DeletionJob.KIND_SESSION,
+            object_id=session.pk,
+            label=session.session_code,
+            requested_by=user,
+        )
+        sessions = [(session.pk, session.session_code)]
+        transaction.on_commit(lambda: _forget_sessions(sessions))
+        transaction.on_commit(lambda: _enqueue(job.pk))
+    return job
+
+
+def _forget_sessions(sessions):
+    for session_id, session_code in sessions:
+        invalidate_session_snapshot(session_code)
+        invalidate_stats(session_id)
+        invalidate_leaderboard(session_id)
+        get_event_log().forget(session_code)
+
+
+def _enqueue(job_id):
+    from .tasks import run_deletion_job
+
+    try:
+        run_deletion_job.delay(job_id)
+    except Exception:
+        # Stays pending; `run_deletion_jobs` picks it up
+        logger.exception("Could not queue deletion job %s", job_id)
+
+
+def deletion_steps(job):
+    """
+    (model, queryset) pairs in deletion order: children before parents,
+    the hidden quiz or session itself last.
+    """
+    if job.kind == DeletionJob.KIND_QUIZ:
+        return [
+            (AnswerRecord, AnswerRecord.objects.filter(question__quiz_id=job.object_id)),
+            (ParticipantSession, ParticipantSession.objects.filter(session__quiz_id=job.object_id)),
+            (SessionReport, SessionReport.objects.filter(session__quiz_id=job.object_id)),
+            (AnswerArchive, AnswerArchive.objects.filter(session__quiz_id=job.object_id)),
+            (QuizSession, QuizSession.all_objects.filter(quiz_id=job.object_id)),
+            (QuizAccess, QuizAccess.objects.filter(quiz_id=job.object_id)),
+            (Question, Question.objects.filter(quiz_id=job.object_id)),
+            (Quiz, Quiz.all_objects.filter(pk=job.object_id)),
+        ]
+    return [
+        (AnswerRecord, AnswerRecord.objects.filter(session_id=job.object_id)),
+        (ParticipantSession, ParticipantSession.objects.filter(session_id=job.object_id)),
+        (SessionReport, SessionReport.objects.filter(session_id=job.object_id)),
+        (AnswerArchive, AnswerArchive.objects.filter(session_id=job.object_id)),
+        (QuizSession, QuizSession.all_objects.filter(pk=job.object_id)),
+    ]
+
+
+def _raw_delete(model, ids):
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", ids)
+        return cursor.rowcount
+
+
+def run_deletion_job(job_id, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete everything under a DeletionJob. Returns the job.
+    """
+    job = DeletionJob.objects.get(pk=job_id)
+    if job.status == DeletionJob.STATUS_DONE:
+        return job
+    job.status = DeletionJob.STATUS_RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.error = ""
+    job.save(update_fields=["status", "started_at", "error"])
+
+    try:
+        steps = deletion_steps(job)
+        for model, queryset in steps:
+            name = model._meta.model_name
+            entry = job.progress.setdefault(name, {"total": 0, "deleted": 0})
+            # What is left now (a rerun has already deleted `deleted` rows)
+            entry["total"] = entry["deleted"] + queryset.count()
+        job.save(update_fields=["progress"])
+
+        for model, queryset in steps:
+            entry = job.progress[model._meta.model_name]
+            last_id = 0
+            while True:
+                ids = list(
+                    queryset.filter(pk__gt=last_id)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                with transaction.atomic():
+                    entry["deleted"] += _raw_delete(model, ids)
+                    job.save(update_fields=["progress"])
+                last_id = ids[-1]
+    except Exception as exc:
+        logger.exception("Deletion job %s failed", job.pk)
+        job.status = DeletionJob.STATUS_FAILED
+        job.error = str(exc)
+        job.save(update_fields=["status", "error"])
+        raise
+
+    job.status = DeletionJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+    return job
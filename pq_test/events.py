@@ -0,0 +1,236 @@
+# backend/pq_test/events.py
+"""
+Sequenced session events and session groups.
+
+A session's sockets are spread over channel groups: hosts (projector) sockets
+join `pq_session_<code>_host`, participant sockets one of
+PQ_SESSION_GROUP_SHARDS shards `pq_session_<code>_<n>` picked by a hash of
+the channel name. A broadcast goes to the host group first, then to all shards
+concurrently, so no single group_send expands the whole class and projectors
+are not queued behind participants.
+
+Every event sent to a session goes through `publish_event`, which gives
+it the next per-session `seq` and keeps the last PQ_EVENT_LOG_SIZE events in a
+ring buffer. A reconnecting client sends `resume {last_seq}` and receives only
+what it missed; when those events have already been evicted it gets a full
+`resync` state instead (see QuizSessionConsumer).
+"""
+import asyncio
+import json
+import threading
+import zlib
+from collections import deque
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .wire import encode_frames
+
+
+def _missed(current, oldest, events, last_seq):
+    """
+    Events after last_seq, [] if up to date, or None if some were evicted
+    (or the log was reset since the client last saw it).
+    """
+    if last_seq == current:
+        return []
+    if last_seq > current or oldest is None or oldest > last_seq + 1:
+        return None
+    return events
+
+
+class InMemoryEventLog:
+    """
+    Process-local log (see InMemoryStatsStore).
+    """
+
+    def __init__(self, size=None):
+        self.size = size or settings.PQ_EVENT_LOG_SIZE
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def append(self, session_code, event, data, hosts_only=False):
+        with self._lock:
+            log = self._sessions.setdefault(
+                session_code, {"seq": 0, "events": deque(maxlen=self.size)}
+            )
+            log["seq"] += 1
+            entry = {"seq": log["seq"], "event": event, "data": data}
+            if hosts_only:
+                entry["hosts_only"] = True
+            log["events"].append(entry)
+            return log["seq"]
+
+    def last_seq(self, session_code):
+        with self._lock:
+            log = self._sessions.get(session_code)
+            return log["seq"] if log else 0
+
+    def since(self, session_code, last_seq):
+        with self._lock:
+            log = self._sessions.get(session_code)
+            if log is None:
+                return _missed(0, None, [], last_seq)
+            events = log["events"]
+            oldest = events[0]["seq"] if events else None
+            return _missed(
+                log["seq"], oldest, [e for e in events if e["seq"] > last_seq], last_seq
+            )
+
+    def forget(self, session_code):
+        with self._lock:
+            self._sessions.pop(session_code, None)
+
+
+# KEYS: event sorted set (score = seq), seq counter.
+_APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[2])
+redis.call('ZADD', KEYS[1], seq, seq .. '|' .. ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[2]) + 1))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
+
+
+class RedisEventLog:
+    """
+    Shared log: `pq:events:<code>` sorted set of "<seq>|<json>" members and
+    `pq:events:<code>:seq` counter.
+    """
+
+    def __init__(self, client=None, size=None, ttl=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.size = size or settings.PQ_EVENT_LOG_SIZE
+        self.ttl = ttl or settings.PQ_STATS_TTL_SECONDS
+        self._append = client.register_script(_APPEND_SCRIPT)
+
+    @staticmethod
+    def keys(session_code):
+        return [f"pq:events:{session_code}", f"pq:events:{session_code}:seq"]
+
+    def append(self, session_code, event, data, hosts_only=False):
+        entry = {"event": event, "data": data}
+        if hosts_only:
+            entry["hosts_only"] = True
+        payload = json.dumps(entry, cls=DjangoJSONEncoder)
+        return self._append(
+            keys=self.keys(session_code), args=[payload, self.size, self.ttl]
+        )
+
+    def last_seq(self, session_code):
+        return int(self.client.get(self.keys(session_code)[1]) or 0)
+
+    def since(self, session_code, last_seq):
+        events_key, seq_key = self.keys(session_code)
+        pipe = self.client.pipeline()
+        pipe.get(seq_key)
+        pipe.zrange(events_key, 0, 0, withscores=True)
+        pipe.zrangebyscore(events_key, f"({last_seq}", "+inf")
+        current, oldest, members = pipe.execute()
+        events = []
+        for member in members:
+            seq, payload = member.split("|", 1)
+            events.append({"seq": int(seq), **json.loads(payload)})
+        return _missed(
+            int(current or 0), int(oldest[0][1]) if oldest else None, events, last_seq
+        )
+
+    def forget(self, session_code):
+        self.client.delete(*self.keys(session_code))
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log():
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                if settings.PQ_STATS_BACKEND == "redis":
+                    _log = RedisEventLog()
+                else:
+                    _log = InMemoryEventLog()
+    return _log
+
+
+def question_event_data(question) -> dict:
+    """
+    `current_question_changed` payload (also used in `resync`).
+    """
+    return {
+        "question_id": question.id,
+        "question_text": question.text,
+        "option_a": question.option_a,
+        "option_b": question.option_b,
+        "option_c": question.option_c,
+        "option_d": question.option_d,
+        "order": question.order,
+        "time_limit": question.effective_time_limit(),
+    }
+
+
+def host_group_name(session_code: str) -> str:
+    return f"pq_session_{session_code}_host"
+
+
+def shard_group_name(session_code: str, shard: int) -> str:
+    return f"pq_session_{session_code}_{shard}"
+
+
+def participant_group_name(session_code: str, channel_name: str) -> str:
+    shard = zlib.crc32(channel_name.encode()) % settings.PQ_SESSION_GROUP_SHARDS
+    return shard_group_name(session_code, shard)
+
+
+async def send_to_session(session_code, message, channel_layer=None, hosts_only=False):
+    """
+    group_send to the host group, then to every participant shard at once.
+    """
+    layer = channel_layer or get_channel_layer()
+    await layer.group_send(host_group_name(session_code), message)
+    if not hosts_only:
+        await asyncio.gather(
+            *(
+                layer.group_send(shard_group_name(session_code, shard), message)
+                for shard in range(settings.PQ_SESSION_GROUP_SHARDS)
+            )
+        )
+
+
+async def publish_event(session_code, event, data, channel_layer=None, hosts_only=False):
+    """
+    Record an event in the session's log and send it to the session's sockets
+    (only the host group with hosts_only). Returns its seq.
+    """
+    seq = await sync_to_async(get_event_log().append, thread_sensitive=False)(
+        session_code, event, data, hosts_only
+    )
+    # Encoded once per wire format here instead of once per socket
+    await send_to_session(
+        session_code,
+        {
+            "type": "broadcast_event",
+            "event": event,
+            "seq": seq,
+            "frames": encode_frames(event, data, seq),
+        },
+        channel_layer,
+        hosts_only,
+    )
+    return seq
+
+
+def publish_event_sync(session_code, event, data, hosts_only=False):
+    """
+    Sync entry point for views and tasks.
+    """
+    return async_to_sync(publish_event)(session_code, event, data, hosts_only=hosts_only)
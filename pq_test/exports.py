@@ -0,0 +1,236 @@
+# backend/pq_test/exports.py
+"""
+Answer-level result exports (CSV, XLSX, Parquet).
+
+Hot answers come from one joined query read with `.iterator(chunk_size=...)`
+(a server-side cursor on PostgreSQL), so memory stays flat however many
+answers a session or quiz has; archived sessions (pq_test.archive) are
+added one session at a time:
+
+- CSV is streamed row by row;
+- XLSX (openpyxl write-only) and Parquet (pyarrow, one row group per chunk)
+  are written to a temporary file, which is then streamed and removed.
+
+The site is served by ASGI, where Django buffers a synchronous streaming
+iterator whole before sending it, so the response gets an async iterator
+that pulls each chunk with sync_to_async (`_async_chunks`).
+"""
+import csv
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from .archive import archived_values
+from .models import AnswerArchive, AnswerRecord, ParticipantSession, Question, QuizSession
+
+EXPORT_CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+
+COLUMNS = (
+    "session_code",
+    "participant_id",
+    "participant",
+    "question_id",
+    "question_order",
+    "question_text",
+    "selected_option",
+    "score",
+    "time_taken_seconds",
+    "within_time",
+    "submitted_at",
+)
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def answer_rows(answers):
+    """
+    Export rows (tuples in COLUMNS order) for an AnswerRecord queryset.
+    """
+    rows = answers.order_by(
+        "session_id", "participant_id", "question_id"
+    ).values_list(
+        "session__session_code",
+        "participant_id",
+        "participant__user__username",
+        "participant__guest_name",
+        "question_id",
+        "question__order",
+        "question__text",
+        "selected_option",
+        "score",
+        "time_taken_seconds",
+        "within_time",
+        "submitted_at",
+    )
+    for code, pid, username, guest, *rest in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (code, pid, username or guest or "Guest", *rest)
+
+
+def archived_answer_rows(session_id, session_code):
+    """
+    Export rows for an archived session, ordered like `answer_rows`.
+    """
+    rows = archived_values(
+        session_id,
+        (
+            "participant_id",
+            "question_id",
+            "selected_option",
+            "score",
+            "time_taken_seconds",
+            "within_time",
+            "submitted_at",
+        ),
+    )
+    if rows is None:
+        return
+    rows = sorted(rows, key=lambda row: (row[0], row[1]))
+    names = {
+        pid: username or guest or "Guest"
+        for pid, username, guest in ParticipantSession.objects.filter(
+            session_id=session_id
+        ).values_list("id", "user__username", "guest_name")
+    }
+    questions = {
+        qid: (order, text)
+        for qid, order, text in Question.objects.filter(
+            id__in={row[1] for row in rows}
+        ).values_list("id", "order", "text")
+    }
+    for pid, qid, *rest in rows:
+        # Joined like the hot query: skip deleted participants and questions
+        if pid in names and qid in questions:
+            yield (session_code, pid, names[pid], qid, *questions[qid], *rest)
+
+
+def session_answers(session):
+    if AnswerArchive.objects.filter(session_id=session.id).exists():
+        return archived_answer_rows(session.id, session.session_code)
+    return answer_rows(AnswerRecord.objects.filter(session_id=session.id))
+
+
+def quiz_answers(quiz_id):
+    # Archived sessions have no hot answers left
+    yield from answer_rows(AnswerRecord.objects.filter(session__quiz_id=quiz_id))
+    archived = QuizSession.objects.filter(quiz_id=quiz_id, answer_archive__isnull=False)
+    for session_id, session_code in archived.order_by("id").values_list("id", "session_code"):
+        yield from archived_answer_rows(session_id, session_code)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _file_chunks(write):
+    """
+    Run `write(file)` into a temporary file, then yield its bytes.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        write(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+async def _async_chunks(chunks):
+    """
+    Iterate a sync chunk generator from async code, one chunk per
+    thread-sensitive call (the same thread as the view, so its cursor is
+    used from one thread).
+    """
+    try:
+        while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def _write_xlsx(rows, tmp):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("answers")
+    sheet.append(COLUMNS)
+    for row in rows:
+        # Excel has no timezone-aware datetimes
+        *values, submitted_at = row
+        sheet.append([*values, submitted_at.replace(tzinfo=None) if submitted_at else None])
+    workbook.save(tmp)
+
+
+def _write_parquet(rows, tmp, pa, pq):
+    schema = pa.schema(
+        [
+            ("session_code", pa.string()),
+            ("participant_id", pa.int64()),
+            ("participant", pa.string()),
+            ("question_id", pa.int64()),
+            ("question_order", pa.int64()),
+            ("question_text", pa.string()),
+            ("selected_option", pa.string()),
+            ("score", pa.float64()),
+            ("time_taken_seconds", pa.float64()),
+            ("within_time", pa.bool_()),
+            ("submitted_at", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+
+    def table(batch):
+        columns = zip(*batch)
+        return pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+    with pq.ParquetWriter(tmp, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_CHUNK_SIZE:
+                writer.write_table(table(batch))
+                batch = []
+        if batch:
+            writer.write_table(table(batch))
+
+
+def export_response(rows, file_format, filename):
+    """
+    StreamingHttpResponse with export rows (`session_answers`,
+    `quiz_answers`) in the given format. Raises ExportUnavailable for
+    Parquet when pyarrow is not installed.
+    """
+    if file_format == "csv":
+        content = _csv_chunks(rows)
+    elif file_format == "xlsx":
+        content = _file_chunks(lambda tmp: _write_xlsx(rows, tmp))
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportUnavailable("Parquet export needs the pyarrow package.")
+        content = _file_chunks(lambda tmp: _write_parquet(rows, tmp, pa, pq))
+
+    response = StreamingHttpResponse(
+        _async_chunks(content), content_type=CONTENT_TYPES[file_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
@@ -0,0 +1,462 @@
+# backend/pq_test/ingest.py
+"""
+Write-behind ingestion for AnswerRecord (PQ_ANSWER_INGEST_MODE = "buffered").
+
+Answers are validated and scored as usual, pushed into a bounded queue and
+acknowledged immediately. A flusher writes them in batches with one upsert
+(`bulk_create(update_conflicts=True)`) when PQ_ANSWER_BATCH_SIZE answers are
+waiting or every PQ_ANSWER_FLUSH_INTERVAL_MS, whichever comes first.
+
+Delivery is at-least-once: with the Redis queue a batch is moved atomically
+to a per-worker in-flight list and only dropped after the DB commit, and
+in-flight lists of dead workers are pushed back and replayed. Replays are
+harmless because the upsert is idempotent per (participant, question).
+The in-memory queue is for single-process dev and does not survive a crash.
+
+A batch that fails for any reason but the database being unreachable is
+retried in halves down to single answers, so the rest of it is written; an
+answer that keeps failing on its own (e.g. its question was deleted) is
+moved to a dead-letter list after PQ_ANSWER_MAX_ATTEMPTS flushes instead of
+blocking everything queued behind it.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .broadcast import schedule_stats_update
+from .completion import count_answered
+from .leaderboard import abort_scores, begin_scores, record_score
+from .models import AnswerRecord, ParticipantSession
+from .stats import abort_answers, begin_answers, record_answer
+
+logger = logging.getLogger(__name__)
+
+ANSWER_UPDATE_FIELDS = ["selected_option", "time_taken_seconds", "within_time", "score"]
+
+
+class InMemoryAnswerQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._inflight = []
+        self._dead = []
+
+    def push(self, entry):
+        with self._lock:
+            self._pending.append(entry)
+            return len(self._pending)
+
+    def take(self, limit):
+        with self._lock:
+            while self._pending and len(self._inflight) < limit:
+                self._inflight.append(self._pending.popleft())
+            return list(self._inflight)
+
+    def ack(self):
+        with self._lock:
+            self._inflight = []
+
+    def requeue(self):
+        with self._lock:
+            self._pending.extendleft(reversed(self._inflight))
+            self._inflight = []
+
+    def settle(self, retry, dead):
+        """
+        Drop the in-flight batch, putting `retry` back at the head of pending
+        and `dead` on the dead-letter list.
+        """
+        with self._lock:
+            self._pending.extendleft(reversed(retry))
+            self._dead.extend(dead)
+            self._inflight = []
+
+    def dead_letters(self):
+        with self._lock:
+            return list(self._dead)
+
+    def heartbeat(self):
+        pass
+
+    def recover(self):
+        return 0
+
+
+# Move up to ARGV[1] entries from pending to this worker's in-flight list.
+_TAKE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+  redis.call('LTRIM', KEYS[1], #items, -1)
+  redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return redis.call('LRANGE', KEYS[2], 0, -1)
+"""
+
+# Put an in-flight list back at the head of pending, preserving order.
+_REQUEUE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+  redis.call('LPUSH', KEYS[1], items[i])
+end
+redis.call('DEL', KEYS[2])
+return #items
+"""
+
+# Drop the in-flight list; ARGV[1] entries (JSON) go back to the head of
+# pending, the rest to the dead-letter list.
+_SETTLE_SCRIPT = """
+local retry = tonumber(ARGV[1])
+for i = retry + 1, 2, -1 do
+  redis.call('LPUSH', KEYS[1], ARGV[i])
+end
+for i = retry + 2, #ARGV do
+  redis.call('RPUSH', KEYS[3], ARGV[i])
+end
+redis.call('DEL', KEYS[2])
+"""
+
+
+class RedisAnswerQueue:
+    pending_key = "pq:answers:pending"
+    inflight_prefix = "pq:answers:inflight:"
+    worker_prefix = "pq:answers:worker:"
+    dead_key = "pq:answers:dead"
+
+    def __init__(self, client=None, worker_id=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.inflight_key = f"{self.inflight_prefix}{self.worker_id}"
+        self._take = client.register_script(_TAKE_SCRIPT)
+        self._requeue = client.register_script(_REQUEUE_SCRIPT)
+        self._settle = client.register_script(_SETTLE_SCRIPT)
+        self.heartbeat()
+
+    def push(self, entry):
+        return self.client.rpush(self.pending_key, json.dumps(entry))
+
+    def take(self, limit):
+        items = self._take(keys=[self.pending_key, self.inflight_key], args=[limit])
+        return [json.loads(item) for item in items]
+
+    def ack(self):
+        self.client.delete(self.inflight_key)
+
+    def requeue(self):
+        self._requeue(keys=[self.pending_key, self.inflight_key])
+
+    def settle(self, retry, dead):
+        self._settle(
+            keys=[self.pending_key, self.inflight_key, self.dead_key],
+            args=[len(retry), *(json.dumps(entry) for entry in [*retry, *dead])],
+        )
+
+    def dead_letters(self):
+        return [json.loads(item) for item in self.client.lrange(self.dead_key, 0, -1)]
+
+    def heartbeat(self):
+        ttl = max(int(settings.PQ_ANSWER_FLUSH_INTERVAL_MS / 1000 * 10), 10)
+        self.client.set(f"{self.worker_prefix}{self.worker_id}", 1, ex=ttl)
+
+    def recover(self):
+        """
+        Replay in-flight batches of workers whose heartbeat has expired.
+        """
+        recovered = 0
+        for key in self.client.scan_iter(match=f"{self.inflight_prefix}*"):
+            worker_id = key[len(self.inflight_prefix):]
+            if worker_id == self.worker_id or self.client.exists(f"{self.worker_prefix}{worker_id}"):
+                continue
+            recovered += self._requeue(keys=[self.pending_key, key])
+        if recovered:
+            logger.warning("Replaying %s buffered answers from dead workers", recovered)
+        return recovered
+
+
+class AnswerBuffer:
+    def __init__(self, queue, batch_size=None, interval=None, max_pending=None):
+        self.queue = queue
+        self.batch_size = batch_size or settings.PQ_ANSWER_BATCH_SIZE
+        self.interval = interval or settings.PQ_ANSWER_FLUSH_INTERVAL_MS / 1000.0
+        self.max_pending = max_pending or settings.PQ_ANSWER_BUFFER_MAX
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+
+    def accept(self, entry):
+        pending = self.queue.push(entry)
+        self._ensure_flusher()
+        if pending >= self.max_pending:
+            # Bounded: the caller pays for the flush instead of growing the queue.
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Write everything currently pending. Returns the number of answers
+        written; stops early when some answers failed, which are retried on
+        the next flush.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                entries = self.queue.take(self.batch_size)
+                if not entries:
+                    return written
+                try:
+                    write_answer_batch(entries)
+                except (OperationalError, InterfaceError):
+                    # The database is unreachable; not the answers' fault
+                    self.queue.requeue()
+                    raise
+                except Exception:
+                    entries = latest_answers(entries)
+                    try:
+                        retry, dead = self._isolate(entries)
+                    except (OperationalError, InterfaceError):
+                        self.queue.requeue()
+                        raise
+                    self.queue.settle(retry, dead)
+                    if dead:
+                        logger.error("Dead-lettered %s buffered answers: %s", len(dead), dead)
+                    if retry:
+                        logger.warning("%s buffered answers failed; will retry", len(retry))
+                    return written + len(entries) - len(retry) - len(dead)
+                self.queue.ack()
+                written += len(entries)
+
+    def _isolate(self, entries):
+        """
+        Write what can be written of a failed batch by retrying it in halves.
+        Returns the answers that failed on their own: (to retry, dead).
+        """
+        if len(entries) == 1:
+            entry = {**entries[0], "attempts": entries[0].get("attempts", 0) + 1}
+            if entry["attempts"] >= settings.PQ_ANSWER_MAX_ATTEMPTS:
+                return [], [entry]
+            return [entry], []
+        retry, dead = [], []
+        middle = len(entries) // 2
+        for half in (entries[:middle], entries[middle:]):
+            try:
+                write_answer_batch(half)
+            except (OperationalError, InterfaceError):
+                raise
+            except Exception:
+                half_retry, half_dead = self._isolate(half)
+                retry.extend(half_retry)
+                dead.extend(half_dead)
+        return retry, dead
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._flusher_lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(
+                    target=self._run, name="pq-answer-flusher", daemon=True
+                )
+                self._flusher.start()
+
+    def _run(self):
+        last_recover = 0.0
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.queue.heartbeat()
+                if time.monotonic() - last_recover > self.interval * 20:
+                    last_recover = time.monotonic()
+                    self.queue.recover()
+                self.flush()
+            except Exception:
+                logger.exception("Buffered answer flush failed; will retry")
+            finally:
+                close_old_connections()
+
+
+def latest_answers(entries):
+    """
+    The last entry per (participant, question), in order: last write wins.
+    """
+    latest = {}
+    for entry in entries:
+        latest[(entry["participant_id"], entry["question_id"])] = entry
+    return list(latest.values())
+
+
+def write_answer_batch(entries):
+    """
+    Upsert a batch of buffered answers and apply them to stats counters, the
+    leaderboard and participant completion.
+    """
+    latest = {(e["participant_id"], e["question_id"]): e for e in latest_answers(entries)}
+    entries = list(latest.values())
+
+    # The batch's exact (participant, question) pairs, as one condition per question
+    by_question = {}
+    for pid, qid in latest:
+        by_question.setdefault(qid, []).append(pid)
+    pairs = Q()
+    for qid, pids in by_question.items():
+        pairs |= Q(question_id=qid, participant_id__in=pids)
+
+    # In flight until applied below, so a cold rebuild can't race the batch
+    per_question = Counter((e["session_id"], e["question_id"]) for e in entries)
+    per_session = Counter(e["session_id"] for e in entries)
+    for (session_id, question_id), count in per_question.items():
+        begin_answers(session_id, question_id, count)
+    for session_id, count in per_session.items():
+        begin_scores(session_id, count)
+    try:
+        with transaction.atomic():
+            # Workers flushing the same participants take turns from here, so
+            # each sees the other's rows as `previous` and nothing counts twice
+            list(
+                ParticipantSession.objects.select_for_update()
+                .filter(pk__in={pid for pid, _ in latest})
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            previous = {
+                (row["participant_id"], row["question_id"]): row
+                for row in AnswerRecord.objects.filter(pairs).values(
+                    "participant_id", "question_id", "selected_option", "time_taken_seconds", "score"
+                )
+            }
+            AnswerRecord.objects.bulk_create(
+                [
+                    AnswerRecord(
+                        participant_id=e["participant_id"],
+                        session_id=e["session_id"],
+                        question_id=e["question_id"],
+                        selected_option=e["selected_option"],
+                        time_taken_seconds=e["time_taken_seconds"],
+                        within_time=e["within_time"],
+                        score=e["score"],
+                    )
+                    for e in entries
+                ],
+                update_conflicts=True,
+                unique_fields=["participant", "question"],
+                update_fields=ANSWER_UPDATE_FIELDS,
+            )
+            _count_answered(entries, previous)
+    except Exception:
+        for (session_id, question_id), count in per_question.items():
+            abort_answers(session_id, question_id, count)
+        for session_id, count in per_session.items():
+            abort_scores(session_id, count)
+        raise
+
+    for e in entries:
+        prev = previous.get((e["participant_id"], e["question_id"]))
+        record_answer(
+            e["session_id"],
+            e["question_id"],
+            e["selected_option"],
+            e["time_taken_seconds"],
+            (prev["selected_option"], prev["time_taken_seconds"]) if prev else None,
+        )
+        record_score(
+            e["session_id"],
+            e["participant_id"],
+            e["score"],
+            e["time_taken_seconds"],
+            (prev["score"], prev["time_taken_seconds"]) if prev else None,
+        )
+    for session_code, session_id, question_id in {
+        (e["session_code"], e["session_id"], e["question_id"]) for e in entries
+    }:
+        schedule_stats_update(session_code, session_id, question_id)
+
+
+def _count_answered(entries, previous):
+    """
+    Bump answered counts for the batch's first-time answers: one UPDATE per
+    distinct (new answers, question count), usually one or two.
+    """
+    new_answers = {}
+    for e in entries:
+        if (e["participant_id"], e["question_id"]) in previous:
+            continue
+        key = (e["participant_id"], e["question_count"])
+        new_answers[key] = new_answers.get(key, 0) + 1
+
+    groups = {}
+    for (participant_id, question_count), n in new_answers.items():
+        groups.setdefault((n, question_count), []).append(participant_id)
+    now = timezone.now()
+    for (n, question_count), participant_ids in groups.items():
+        count_answered(participant_ids, n, question_count, now)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_answer_buffer() -> AnswerBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                if settings.PQ_STATS_BACKEND == "redis":
+                    queue = RedisAnswerQueue()
+                else:
+                    queue = InMemoryAnswerQueue()
+                _buffer = AnswerBuffer(queue)
+                atexit.register(_flush_at_exit)
+    return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception("Could not flush buffered answers at exit")
+
+
+def buffer_answer(snapshot, participant, question, selected_option, time_taken, score):
+    """
+    Queue an answer for write-behind and return an unsaved AnswerRecord as
+    the acknowledgement.
+    """
+    get_answer_buffer().accept(
+        {
+            "session_code": snapshot.session_code,
+            "session_id": snapshot.session_id,
+            "participant_id": participant.pk,
+            "question_id": question.id,
+            "question_count": len(snapshot.question_ids),
+            "selected_option": selected_option,
+            "time_taken_seconds": time_taken,
+            "within_time": True,
+            "score": score,
+        }
+    )
+    return AnswerRecord(
+        participant=participant,
+        session_id=snapshot.session_id,
+        question=question,
+        selected_option=selected_option,
+        time_taken_seconds=time_taken,
+        within_time=True,
+        score=score,
+        submitted_at=timezone.now(),
+    )
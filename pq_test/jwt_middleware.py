@@ -1,28 +1,139 @@
 # backend/pq_test/jwt_middleware.py
+import time
 import urllib.parse
 
-from channels.auth import AuthMiddlewareStack
+from channels.auth import AuthMiddleware
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
+from channels.sessions import CookieMiddleware, SessionMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .utils import TTLCache
+
+_auth = JWTAuthentication()
+
+# token -> user id, until the token's own `exp`
+_tokens = TTLCache(settings.PQ_WS_AUTH_CACHE_SIZE)
+# user id -> (pk, username, is_active, is_staff, is_superuser), for
+# PQ_WS_AUTH_CACHE_TTL_SECONDS (evicted early when the user is saved)
+_principals = TTLCache(settings.PQ_WS_AUTH_CACHE_SIZE)
+
+_PRINCIPAL_FIELDS = ("is_active", "is_staff", "is_superuser")
+
+
+class WSPrincipal:
+    """
+    Authenticated socket user built from cached fields. Exposes what the
+    consumers use (id, username, staff flags); the full User is loaded on
+    first access to `.user` (from sync code, e.g. inside database_sync_to_async).
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk, username, is_active, is_staff, is_superuser):
+        self.pk = self.id = pk
+        self.username = username
+        self.is_active = is_active
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self._user = None
+
+    def get_username(self):
+        return self.username
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = get_user_model()._default_manager.get(pk=self.pk)
+        return self._user
+
+    def __str__(self):
+        return self.username
+
+
+def forget_user(user_id):
+    """
+    Drop a cached principal (e.g. after the user was edited).
+    """
+    _principals.pop(str(user_id))
+
+
+def _token_user_id(token):
+    user_id = _tokens.get(token)
+    if user_id is not None:
+        return user_id
+    validated = _auth.get_validated_token(token)
+    # Claims may carry the id as a string; normalise so forget_user(pk) matches
+    user_id = str(validated[api_settings.USER_ID_CLAIM])
+    _tokens.set(token, user_id, validated["exp"])
+    return user_id
+
+
+def _principal(fields):
+    # A fresh object per socket; only the field values are shared.
+    if api_settings.CHECK_USER_IS_ACTIVE and not fields[2]:
+        return AnonymousUser()
+    return WSPrincipal(*fields)
+
+
+def _load_principal_fields(user_id):
+    fields = _principals.get(user_id)
+    if fields is not None:
+        return fields
+    User = get_user_model()
+    row = (
+        User._default_manager.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .values_list("pk", User.USERNAME_FIELD, *_PRINCIPAL_FIELDS)
+        .first()
+    )
+    if row is None:
+        return None
+    _principals.set(user_id, row, time.time() + settings.PQ_WS_AUTH_CACHE_TTL_SECONDS)
+    return row
+
+
+def _cached_user(token):
+    """
+    User for a token without touching the DB, or None if the token still has
+    to be validated or the principal loaded.
+    """
+    user_id = _tokens.get(token)
+    fields = _principals.get(user_id) if user_id is not None else None
+    return _principal(fields) if fields is not None else None
 
 
 @database_sync_to_async
 def _get_user_for_token(token: str):
     try:
-        auth = JWTAuthentication()
-        validated = auth.get_validated_token(token)
-        return auth.get_user(validated)
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash: keep simplejwt's full lookup
+            validated = _auth.get_validated_token(token)
+            return _auth.get_user(validated)
+        fields = _load_principal_fields(_token_user_id(token))
     except Exception:
         return AnonymousUser()
+    return _principal(fields) if fields is not None else AnonymousUser()
 
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
     WS middleware that authenticates with JWT (header or ?token=).
+
+    Validated tokens and user principals are cached per process, so a class
+    reconnecting at once costs no thread hop or DB query per socket while the
+    cache is warm. Only sockets without a usable token fall back to the
+    Django session cookie (channels' AuthMiddleware).
     """
 
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.session_auth = AuthMiddleware(inner)
+
     async def __call__(self, scope, receive, send):
         token = None
 
@@ -44,7 +155,13 @@ class JWTAuthMiddleware(BaseMiddleware):
                 qs = urllib.parse.parse_qs(query_string)
                 token = qs.get("token", [None])[0]
 
-        user = await _get_user_for_token(token) if token else AnonymousUser()
+        user = AnonymousUser()
+        if token:
+            user = None if api_settings.CHECK_REVOKE_TOKEN else _cached_user(token)
+            if user is None:
+                user = await _get_user_for_token(token)
+        if not user.is_authenticated and scope.get("cookies", {}).get(settings.SESSION_COOKIE_NAME):
+            return await self.session_auth(scope, receive, send)
         scope = dict(scope)
         scope["user"] = user
 
@@ -52,4 +169,4 @@ class JWTAuthMiddleware(BaseMiddleware):
 
 
 def JWTAuthMiddlewareStack(inner):
-    return JWTAuthMiddleware(AuthMiddlewareStack(inner))
+    return CookieMiddleware(SessionMiddleware(JWTAuthMiddleware(inner)))
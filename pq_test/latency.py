@@ -0,0 +1,88 @@
+# backend/pq_test/latency.py
+"""
+Answer-time percentiles from fixed buckets.
+
+Every (session, question) keeps a count per SKETCH_EDGES bucket next to its
+option counters (see stats.py). The buckets are fixed and roughly 20% wide,
+so sketches from any number of workers merge by adding counts (the Redis
+store increments one shared hash) and p50/p90/p99 come out within a bucket
+without reading the answers. The coarser display histogram (HISTOGRAM_EDGES,
+also used by reports) is a sum of sketch buckets.
+"""
+import bisect
+import math
+
+# Display histogram edges in seconds; the last bucket is open-ended
+HISTOGRAM_EDGES = (0, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+
+# Quarter seconds below 2s, then each display bucket split into steps of
+# about 20% (up to 25%) of their lower edge; open-ended from 600s
+_TAIL_EDGES = (150, 180, 240, 300, 450, 600)
+
+
+def _sketch_edges():
+    edges = [i / 4 for i in range(8)]
+    bounds = HISTOGRAM_EDGES[1:] + _TAIL_EDGES
+    for low, high in zip(bounds, bounds[1:]):
+        parts = math.ceil(math.log(high / low) / math.log(1.2))
+        edges.extend(round(low + (high - low) * i / parts, 3) for i in range(parts))
+    edges.append(float(bounds[-1]))
+    return tuple(edges)
+
+
+SKETCH_EDGES = _sketch_edges()
+
+# Counter field names of the buckets
+BUCKET_FIELDS = tuple(f"t{i}" for i in range(len(SKETCH_EDGES)))
+
+# Sketch bucket -> display bucket
+_HISTOGRAM_INDEX = tuple(
+    bisect.bisect_right(HISTOGRAM_EDGES, edge) - 1 for edge in SKETCH_EDGES
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_field(seconds) -> str:
+    """
+    Counter field of the bucket an answer time falls into.
+    """
+    return BUCKET_FIELDS[max(bisect.bisect_right(SKETCH_EDGES, seconds) - 1, 0)]
+
+
+def bucket_ranges():
+    """
+    (field, low, high) per sketch bucket; high is None for the last one.
+    """
+    highs = SKETCH_EDGES[1:] + (None,)
+    return zip(BUCKET_FIELDS, SKETCH_EDGES, highs)
+
+
+def percentile(counts, q) -> float:
+    """
+    The q-th percentile (0-100) of the times counted in `counts` (per
+    sketch bucket), interpolated within its bucket; 0.0 without answers.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = max(math.ceil(total * q / 100), 1)
+    seen = 0
+    for i, count in enumerate(counts):
+        if seen + count >= rank:
+            if i + 1 == len(SKETCH_EDGES):
+                return float(SKETCH_EDGES[i])
+            low, high = SKETCH_EDGES[i], SKETCH_EDGES[i + 1]
+            return round(low + (high - low) * (rank - seen) / count, 3)
+        seen += count
+    return float(SKETCH_EDGES[-1])
+
+
+def histogram(counts) -> list:
+    """
+    Sketch bucket counts summed into the HISTOGRAM_EDGES buckets.
+    """
+    result = [0] * len(HISTOGRAM_EDGES)
+    for index, count in zip(_HISTOGRAM_INDEX, counts):
+        result[index] += count
+    return result
@@ -0,0 +1,453 @@
+# backend/pq_test/leaderboard.py
+"""
+Live leaderboard: per-session running totals kept in a sorted set.
+
+Each participant has a total score and a total answer time; ranking is by
+score (highest first), ties broken by the smaller total time. Both are folded
+into one sort key so the store can answer top-K and "my rank" in O(log n).
+Totals are updated incrementally on every saved answer (with the replaced
+answer subtracted) and rebuilt from SQL once when cold, like the stats
+counters, with the same guard against answers landing during a rebuild
+(per session here): `begin_scores` before the write, `record_score` or
+`abort_scores` after it, and a rebuild only primes when the session's
+generation is unchanged and nothing is in flight (see pq_test.stats).
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .archive import archived_values
+from .models import AnswerRecord, ParticipantSession, QuizSession
+from .stats import WRITE_TIMEOUT
+
+# Total times are far below this many seconds, so score dominates the key.
+TIME_SCALE = 10_000_000
+
+
+def sort_key(score, time_taken) -> float:
+    return score * TIME_SCALE - time_taken
+
+
+class InMemoryLeaderboardStore:
+    """
+    Process-local store (see InMemoryStatsStore). Rank lookups are binary
+    searches over a sorted list; updates shift the list, which is fine at
+    classroom sizes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+        # Rebuild guard: session_id -> [generation, in flight, deadline]
+        self._writes = {}
+
+    def generation(self, session_id):
+        with self._lock:
+            return self._writes.get(session_id, (0,))[0]
+
+    def prime(self, session_id, totals, generation):
+        with self._lock:
+            if session_id in self._boards:
+                return False
+            current, in_flight, deadline = self._writes.get(session_id, (0, 0, 0.0))
+            if current != generation or (in_flight and deadline > time.monotonic()):
+                return False
+            order = sorted(
+                (-sort_key(score, time_taken), pid)
+                for pid, (score, time_taken) in totals.items()
+            )
+            self._boards[session_id] = {"order": order, "totals": dict(totals)}
+            return True
+
+    def begin_writes(self, session_id, count=1):
+        with self._lock:
+            writes = self._writes.setdefault(session_id, [0, 0, 0.0])
+            writes[1] += count
+            writes[2] = time.monotonic() + WRITE_TIMEOUT
+
+    def end_writes(self, session_id, count=1):
+        with self._lock:
+            self._end_writes(session_id, count)
+
+    def _end_writes(self, session_id, count):
+        writes = self._writes.setdefault(session_id, [0, 0, 0.0])
+        writes[0] += 1
+        writes[1] = max(writes[1] - count, 0)
+
+    def record(self, session_id, participant_id, score_delta, time_delta):
+        with self._lock:
+            self._end_writes(session_id, 1)
+            board = self._boards.get(session_id)
+            if board is None:
+                return False
+            order, totals = board["order"], board["totals"]
+            if participant_id in totals:
+                score, time_taken = totals[participant_id]
+                del order[bisect.bisect_left(order, (-sort_key(score, time_taken), participant_id))]
+            else:
+                score, time_taken = 0.0, 0.0
+            score, time_taken = score + score_delta, time_taken + time_delta
+            totals[participant_id] = (score, time_taken)
+            bisect.insort(order, (-sort_key(score, time_taken), participant_id))
+            return True
+
+    def top(self, session_id, limit):
+        with self._lock:
+            board = self._boards.get(session_id)
+            if board is None:
+                return None
+            return [(pid, *board["totals"][pid]) for _, pid in board["order"][:limit]]
+
+    def rank(self, session_id, participant_id):
+        with self._lock:
+            board = self._boards.get(session_id)
+            if board is None:
+                return None
+            if participant_id not in board["totals"]:
+                return (None, 0.0, 0.0)
+            score, time_taken = board["totals"][participant_id]
+            position = bisect.bisect_left(
+                board["order"], (-sort_key(score, time_taken), participant_id)
+            )
+            return (position, score, time_taken)
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._boards.pop(session_id, None)
+            self._writes.setdefault(session_id, [0, 0, 0.0])[0] += 1
+
+
+# KEYS: sorted set, totals hash, writes hash (rebuild guard). Totals carry a
+# __warm__ marker so an empty board is not mistaken for a cold one.
+_END_WRITES = """
+redis.call('HINCRBY', KEYS[3], 'gen', 1)
+if redis.call('HINCRBY', KEYS[3], 'inflight', -count) < 0 then
+  redis.call('HSET', KEYS[3], 'inflight', 0)
+end
+redis.call('EXPIRE', KEYS[3], ttl)
+"""
+
+_RECORD_SCRIPT = """
+local count, ttl = 1, ARGV[4]
+""" + _END_WRITES + """
+if redis.call('HEXISTS', KEYS[2], '__warm__') == 0 then
+  return 0
+end
+local score = redis.call('HINCRBYFLOAT', KEYS[2], ARGV[1] .. ':score', ARGV[2])
+local time = redis.call('HINCRBYFLOAT', KEYS[2], ARGV[1] .. ':time', ARGV[3])
+redis.call('ZADD', KEYS[1], tonumber(score) * tonumber(ARGV[5]) - tonumber(time), ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+_END_WRITES_SCRIPT = """
+local count, ttl = tonumber(ARGV[1]), ARGV[2]
+""" + _END_WRITES
+
+_PRIME_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], '__warm__') == 1 then
+  return 0
+end
+local w = redis.call('HMGET', KEYS[3], 'gen', 'inflight', 'until')
+if tonumber(w[1] or 0) ~= tonumber(ARGV[3]) then
+  return 0
+end
+if tonumber(w[2] or 0) > 0 and tonumber(w[3] or 0) > tonumber(ARGV[4]) then
+  return 0
+end
+redis.call('HSET', KEYS[2], '__warm__', 1)
+for i = 5, #ARGV, 3 do
+  redis.call('HSET', KEYS[2], ARGV[i] .. ':score', ARGV[i + 1], ARGV[i] .. ':time', ARGV[i + 2])
+  redis.call('ZADD', KEYS[1], tonumber(ARGV[i + 1]) * tonumber(ARGV[2]) - tonumber(ARGV[i + 2]), ARGV[i])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+# nil when cold, otherwise a flat list of id, score, time
+_TOP_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], '__warm__') == 0 then
+  return false
+end
+local out = {}
+for _, id in ipairs(redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)) do
+  table.insert(out, id)
+  table.insert(out, redis.call('HGET', KEYS[2], id .. ':score'))
+  table.insert(out, redis.call('HGET', KEYS[2], id .. ':time'))
+end
+return out
+"""
+
+# nil when cold, {} when the participant has no answers, else {rank, score, time}
+_RANK_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], '__warm__') == 0 then
+  return false
+end
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+  return {}
+end
+return {rank, redis.call('HGET', KEYS[2], ARGV[1] .. ':score'), redis.call('HGET', KEYS[2], ARGV[1] .. ':time')}
+"""
+
+
+class RedisLeaderboardStore:
+    """
+    Shared store: `pq:lb:<session_id>` sorted set keyed by participant id and
+    `pq:lb:<session_id>:totals` hash with `<participant_id>:score|time`; the
+    rebuild guard is `pq:lb:<session_id>:writes` (`gen`, `inflight`, `until`).
+    """
+
+    def __init__(self, client=None, ttl=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.ttl = ttl or settings.PQ_STATS_TTL_SECONDS
+        self._record = client.register_script(_RECORD_SCRIPT)
+        self._end_writes = client.register_script(_END_WRITES_SCRIPT)
+        self._prime = client.register_script(_PRIME_SCRIPT)
+        self._top = client.register_script(_TOP_SCRIPT)
+        self._rank = client.register_script(_RANK_SCRIPT)
+
+    @staticmethod
+    def keys(session_id):
+        return [f"pq:lb:{session_id}", f"pq:lb:{session_id}:totals"]
+
+    @staticmethod
+    def writes_key(session_id):
+        return f"pq:lb:{session_id}:writes"
+
+    def generation(self, session_id):
+        return int(self.client.hget(self.writes_key(session_id), "gen") or 0)
+
+    def prime(self, session_id, totals, generation):
+        args = [self.ttl, TIME_SCALE, generation, time.time()]
+        for pid, (score, time_taken) in totals.items():
+            args.extend([pid, score, time_taken])
+        return bool(
+            self._prime(keys=[*self.keys(session_id), self.writes_key(session_id)], args=args)
+        )
+
+    def begin_writes(self, session_id, count=1):
+        key = self.writes_key(session_id)
+        pipe = self.client.pipeline()
+        pipe.hincrby(key, "inflight", count)
+        pipe.hset(key, "until", time.time() + WRITE_TIMEOUT)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def end_writes(self, session_id, count=1):
+        self._end_writes(
+            keys=[*self.keys(session_id), self.writes_key(session_id)],
+            args=[count, self.ttl],
+        )
+
+    def record(self, session_id, participant_id, score_delta, time_delta):
+        return bool(
+            self._record(
+                keys=[*self.keys(session_id), self.writes_key(session_id)],
+                args=[participant_id, score_delta, time_delta, self.ttl, TIME_SCALE],
+            )
+        )
+
+    def top(self, session_id, limit):
+        values = self._top(keys=self.keys(session_id), args=[limit])
+        if values is None:
+            return None
+        return [
+            (int(values[i]), float(values[i + 1]), float(values[i + 2]))
+            for i in range(0, len(values), 3)
+        ]
+
+    def rank(self, session_id, participant_id):
+        values = self._rank(keys=self.keys(session_id), args=[participant_id])
+        if values is None:
+            return None
+        if not values:
+            return (None, 0.0, 0.0)
+        return (int(values[0]), float(values[1]), float(values[2]))
+
+    def invalidate(self, session_id):
+        pipe = self.client.pipeline()
+        pipe.delete(*self.keys(session_id))
+        pipe.hincrby(self.writes_key(session_id), "gen", 1)
+        pipe.expire(self.writes_key(session_id), self.ttl)
+        pipe.execute()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_leaderboard_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.PQ_STATS_BACKEND == "redis":
+                    _store = RedisLeaderboardStore()
+                else:
+                    _store = InMemoryLeaderboardStore()
+    return _store
+
+
+def aggregate_totals(session_id) -> dict:
+    """
+    SQL fallback used to (re)build a cold leaderboard: one GROUP BY.
+    """
+    rows = list(
+        AnswerRecord.objects.filter(session_id=session_id)
+        .values("participant_id")
+        .annotate(score=Sum("score"), time=Sum("time_taken_seconds"))
+        .order_by()
+    )
+    if not rows:
+        # Nothing hot: the session may have been archived
+        archived = archived_values(session_id, ("participant_id", "score", "time_taken_seconds"))
+        totals = {}
+        for participant_id, score, time_taken in archived or ():
+            total_score, total_time = totals.get(participant_id, (0.0, 0.0))
+            totals[participant_id] = (total_score + score, total_time + time_taken)
+        return totals
+    return {
+        row["participant_id"]: (row["score"] or 0.0, row["time"] or 0.0)
+        for row in rows
+    }
+
+
+def _warm(store, session_id):
+    """
+    Rebuild a cold board; returns the totals, or None once it is primed
+    (a rebuild that lost the race is only served to this caller).
+    """
+    generation = store.generation(session_id)
+    totals = aggregate_totals(session_id)
+    return None if store.prime(session_id, totals, generation) else totals
+
+
+def _ranked(totals):
+    return sorted(
+        ((pid, score, time_taken) for pid, (score, time_taken) in totals.items()),
+        key=lambda entry: (-sort_key(entry[1], entry[2]), entry[0]),
+    )
+
+
+def top_entries(session_id, limit=None):
+    """
+    Best `limit` participants as [(participant_id, score, time_taken_seconds)].
+    """
+    limit = limit or settings.PQ_LEADERBOARD_SIZE
+    store = get_leaderboard_store()
+    entries = store.top(session_id, limit)
+    if entries is None:
+        totals = _warm(store, session_id)
+        if totals is not None:
+            return _ranked(totals)[:limit]
+        entries = store.top(session_id, limit) or []
+    return entries
+
+
+def participant_rank(session_id, participant_id):
+    """
+    (rank, score, time_taken_seconds) with 1-based rank, or rank None if the
+    participant has not answered yet.
+    """
+    store = get_leaderboard_store()
+    result = store.rank(session_id, participant_id)
+    if result is None:
+        totals = _warm(store, session_id)
+        if totals is not None:
+            ranked = [pid for pid, _, _ in _ranked(totals)]
+            score, time_taken = totals.get(participant_id, (0.0, 0.0))
+            position = ranked.index(participant_id) if participant_id in totals else None
+            result = (position, score, time_taken)
+        else:
+            result = store.rank(session_id, participant_id) or (None, 0.0, 0.0)
+    position, score, time_taken = result
+    return (position + 1 if position is not None else None, score, time_taken)
+
+
+def leaderboard_payload(session_id, participant_id=None, limit=None, show_names=True) -> dict:
+    entries = top_entries(session_id, limit)
+    names = {}
+    if show_names and entries:
+        for participant in ParticipantSession.objects.filter(
+            id__in=[pid for pid, _, _ in entries]
+        ).select_related("user"):
+            names[participant.id] = participant.display_name()
+
+    payload = {
+        "session_id": session_id,
+        "top": [
+            {
+                "rank": i + 1,
+                "participant_id": pid,
+                "display_name": names.get(pid),
+                "score": score,
+                "total_time": time_taken,
+            }
+            for i, (pid, score, time_taken) in enumerate(entries)
+        ],
+    }
+    if participant_id is not None:
+        rank, score, time_taken = participant_rank(session_id, participant_id)
+        payload["me"] = {
+            "rank": rank,
+            "participant_id": participant_id,
+            "score": score,
+            "total_time": time_taken,
+        }
+    return payload
+
+
+def leaderboard_event(session_id):
+    """
+    Data for a `leaderboard_update` broadcast, or None when the session does
+    not show a leaderboard.
+    """
+    flags = (
+        QuizSession.objects.filter(pk=session_id)
+        .values("show_leaderboard", "show_names_on_projector")
+        .first()
+    )
+    if not flags or not flags["show_leaderboard"]:
+        return None
+    return leaderboard_payload(session_id, show_names=flags["show_names_on_projector"])
+
+
+def begin_scores(session_id, count=1):
+    """
+    Mark answers of a session as being written; call before the DB write.
+    Each one ends with record_score after commit, or abort_scores.
+    """
+    get_leaderboard_store().begin_writes(session_id, count)
+
+
+def abort_scores(session_id, count=1):
+    """
+    End begun answers whose write failed.
+    """
+    get_leaderboard_store().end_writes(session_id, count)
+
+
+def record_score(session_id, participant_id, score, time_taken, previous=None):
+    """
+    Apply one saved answer to the running totals and end its write.
+    `previous` is the (score, time_taken_seconds) of the answer it replaced,
+    if any.
+    """
+    prev_score, prev_time = previous or (0.0, 0.0)
+    return get_leaderboard_store().record(
+        session_id, participant_id, score - prev_score, time_taken - prev_time
+    )
+
+
+def invalidate_leaderboard(session_id):
+    get_leaderboard_store().invalidate(session_id)
@@ -0,0 +1,49 @@
+# backend/pq_test/management/commands/archive_answers.py
+from django.core.management.base import BaseCommand
+
+from pq_test.archive import archive_candidates, archive_session, restore_session
+from pq_test.models import QuizSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the answers of sessions ended more than PQ_ANSWER_ARCHIVE_AFTER_DAYS "
+        "ago into compressed per-session archives (or --restore them)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Override PQ_ANSWER_ARCHIVE_AFTER_DAYS")
+        parser.add_argument("--session", action="append", default=[], help="Session code (repeatable)")
+        parser.add_argument("--restore", action="store_true", help="Move archived answers back instead")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            sessions = QuizSession.objects.filter(answer_archive__isnull=False)
+        else:
+            sessions = archive_candidates(options["days"])
+        if options["session"]:
+            sessions = sessions.filter(session_code__in=options["session"])
+        sessions = list(sessions.order_by("id").values_list("id", "session_code"))
+
+        if options["dry_run"]:
+            verb = "restore" if options["restore"] else "archive"
+            self.stdout.write(self.style.SUCCESS(f"Would {verb} {len(sessions)} sessions."))
+            return
+
+        total = 0
+        for session_id, session_code in sessions:
+            if options["restore"]:
+                restored = restore_session(session_id)
+                self.stdout.write(f"{session_code}: {restored} answers restored")
+                total += restored
+                continue
+            archive = archive_session(session_id)
+            if archive is None:
+                continue
+            self.stdout.write(
+                f"{session_code}: {archive.row_count} answers archived "
+                f"({len(archive.data) / 1024:.1f} KiB)"
+            )
+            total += archive.row_count
+        self.stdout.write(self.style.SUCCESS(f"{len(sessions)} sessions, {total} answers."))
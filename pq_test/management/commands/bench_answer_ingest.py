@@ -0,0 +1,80 @@
+# backend/pq_test/management/commands/bench_answer_ingest.py
+import random
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from pq_test.answers import submit_answer
+from pq_test.ingest import get_answer_buffer
+from pq_test.models import AnswerRecord, ParticipantSession, Question, Quiz, QuizSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare answers/second of direct AnswerRecord writes vs buffered "
+        "write-behind ingestion. Creates and removes its own throwaway data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, default=300)
+        parser.add_argument("--questions", type=int, default=10)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        host = User.objects.create_user(email=f"bench-host-{tag}@example.com", username=f"bench-host-{tag}")
+        users = User.objects.bulk_create(
+            [
+                User(email=f"bench-{tag}-{i}@example.com", username=f"bench-{tag}-{i}")
+                for i in range(options["participants"])
+            ]
+        )
+        quiz = Quiz.objects.create(title=f"bench {tag}", owner=host)
+        Question.objects.bulk_create(
+            [
+                Question(quiz=quiz, text=f"Q{i}", option_a="A", option_b="B", correct_option="A", order=i)
+                for i in range(options["questions"])
+            ]
+        )
+        question_ids = list(quiz.questions.values_list("id", flat=True))
+
+        try:
+            for mode in ("direct", "buffered"):
+                session = QuizSession.objects.create(quiz=quiz, host=host)
+                session.start()
+                participant_ids = {
+                    p.user_id: p.id
+                    for p in ParticipantSession.objects.bulk_create(
+                        [ParticipantSession(session=session, user=u) for u in users]
+                    )
+                }
+                answers = [(u, qid) for qid in question_ids for u in users]
+
+                with override_settings(PQ_ANSWER_INGEST_MODE=mode):
+                    started = time.perf_counter()
+                    for user, qid in answers:
+                        submit_answer(
+                            session.session_code,
+                            user,
+                            {
+                                "question_id": qid,
+                                "selected_option": random.choice("ABCD"),
+                                "time_taken_seconds": random.random() * 10,
+                            },
+                            participant_id=participant_ids[user.id],
+                        )
+                    if mode == "buffered":
+                        get_answer_buffer().flush()
+                    elapsed = time.perf_counter() - started
+
+                stored = AnswerRecord.objects.filter(session=session).count()
+                self.stdout.write(
+                    f"{mode:>8}: {len(answers)} answers in {elapsed:.2f}s "
+                    f"({len(answers) / elapsed:.0f} answers/s, {stored} rows stored)"
+                )
+        finally:
+            quiz.delete()
+            User.objects.filter(pk__in=[host.pk] + [u.pk for u in users]).delete()
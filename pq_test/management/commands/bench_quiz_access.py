@@ -0,0 +1,177 @@
+# backend/pq_test/management/commands/bench_quiz_access.py
+import random
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from pq_test.access import QUIZ_LIST_SOURCES, accessible_quiz_ids, sync_quiz_access
+from pq_test.management.commands.loadtest_quiz import percentile
+from pq_test.models import Classroom, Question, Quiz, QuizAccess, QuizSession
+
+CHUNK_SIZE = 1000
+
+
+class Rollback(Exception):
+    pass
+
+
+def previous_quiz_queryset(user):
+    return Quiz.objects.filter(
+        Q(owner=user) | Q(classroom__members=user) | Q(classroom__owner=user)
+    ).distinct()
+
+
+def previous_question_queryset(user):
+    return Question.objects.filter(
+        Q(quiz__owner=user)
+        | Q(quiz__classroom__members=user)
+        | Q(quiz__classroom__owner=user)
+        | Q(quiz__sessions__host=user)
+    ).distinct()
+
+
+class Command(BaseCommand):
+    help = (
+        "Quiz/question visibility with ORed joins + DISTINCT (previous) vs the "
+        "QuizAccess semi-join, on a generated dataset that is rolled back "
+        "afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--classrooms", type=int, default=10_000)
+        parser.add_argument("--memberships", type=int, default=3, help="Classrooms per user")
+        parser.add_argument("--quizzes", type=int, default=2, help="Quizzes per classroom")
+        parser.add_argument("--questions", type=int, default=5, help="Questions per quiz")
+        parser.add_argument("--samples", type=int, default=200, help="Users queried")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, options):
+        started = time.perf_counter()
+        users = self._generate(options)
+        self.stdout.write(
+            f"Generated {options['users']} users, {options['classrooms']} classrooms, "
+            f"{Quiz.objects.count()} quizzes, {Question.objects.count()} questions "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        started = time.perf_counter()
+        quiz_ids = list(Quiz.objects.order_by("id").values_list("id", flat=True))
+        for start in range(0, len(quiz_ids), CHUNK_SIZE):
+            sync_quiz_access(quiz_ids[start : start + CHUNK_SIZE])
+        self.stdout.write(
+            f"Rebuilt {QuizAccess.objects.count()} QuizAccess rows in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+
+        sample = random.sample(users, min(options["samples"], len(users)))
+        rows = (
+            ("quizzes, previous", lambda u: previous_quiz_queryset(u)),
+            (
+                "quizzes, access table",
+                lambda u: Quiz.objects.filter(id__in=accessible_quiz_ids(u, QUIZ_LIST_SOURCES)),
+            ),
+            ("questions, previous", lambda u: previous_question_queryset(u)),
+            (
+                "questions, access table",
+                lambda u: Question.objects.filter(quiz_id__in=accessible_quiz_ids(u)),
+            ),
+        )
+        results = {}
+        for name, queryset in rows:
+            times = []
+            for user in sample:
+                t0 = time.perf_counter()
+                ids = list(queryset(user).values_list("id", flat=True))
+                times.append((time.perf_counter() - t0) * 1000)
+                results.setdefault(user.pk, {})[name] = sorted(ids)
+            times.sort()
+            self.stdout.write(
+                f"  {name:>24}: p50 {percentile(times, 50):7.2f} ms, "
+                f"p99 {percentile(times, 99):7.2f} ms, mean {sum(times) / len(times):7.2f} ms"
+            )
+        mismatched = sum(
+            1
+            for r in results.values()
+            if r["quizzes, previous"] != r["quizzes, access table"]
+            or r["questions, previous"] != r["questions, access table"]
+        )
+        self.stdout.write(f"  users whose results differ: {mismatched}")
+
+        classrooms = list(Classroom.objects.order_by("?")[: len(sample)])
+        times = []
+        for user, classroom in zip(sample, classrooms):
+            t0 = time.perf_counter()
+            classroom.members.add(user)
+            times.append((time.perf_counter() - t0) * 1000)
+        times.sort()
+        self.stdout.write(
+            f"  {'join classroom (signals)':>24}: p50 {percentile(times, 50):7.2f} ms, "
+            f"p99 {percentile(times, 99):7.2f} ms"
+        )
+
+    def _generate(self, options):
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create(
+            [
+                User(email=f"bench-{tag}-{i}@example.com", username=f"bench-{tag}-{i}")
+                for i in range(options["users"])
+            ],
+            batch_size=5000,
+        )
+        # bulk_create skips the access signals; the rebuild fills the table
+        classrooms = Classroom.objects.bulk_create(
+            [
+                Classroom(name=f"bench {i}", owner=random.choice(users), join_code=f"B{tag[:3]}{i:07d}")
+                for i in range(options["classrooms"])
+            ],
+            batch_size=5000,
+        )
+        Membership = Classroom.members.through
+        Membership.objects.bulk_create(
+            [
+                Membership(classroom_id=classroom.id, user_id=user.id)
+                for user in users
+                for classroom in random.sample(classrooms, options["memberships"])
+            ],
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        quizzes = Quiz.objects.bulk_create(
+            [
+                Quiz(title=f"bench {i}", owner=classroom.owner, classroom=classroom)
+                for i, classroom in enumerate(classrooms)
+                for _ in range(options["quizzes"])
+            ],
+            batch_size=5000,
+        )
+        Question.objects.bulk_create(
+            [
+                Question(quiz=quiz, text=f"Q{i}", option_a="A", option_b="B", option_c="C", option_d="D", order=i)
+                for quiz in quizzes
+                for i in range(options["questions"])
+            ],
+            batch_size=5000,
+        )
+        QuizSession.objects.bulk_create(
+            [
+                QuizSession(quiz=quiz, host=random.choice(users), session_code=f"B{tag[:3]}{i:08d}")
+                for i, quiz in enumerate(random.sample(quizzes, len(quizzes) // 2))
+            ],
+            batch_size=5000,
+        )
+        return users
@@ -0,0 +1,79 @@
+# backend/pq_test/management/commands/bench_scoring.py
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from pq_test.scoring import OPTIONS, PISTONS, QuizWeights, option_weights, score_answer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark 8PQ scoring of a whole session: per-answer Python loop vs the "
+        "vectorized QuizWeights engine, on synthetic data (no database)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, default=10_000)
+        parser.add_argument("--questions", type=int, default=64)
+        parser.add_argument("--answer-rate", type=float, default=0.9, help="Share of questions answered")
+
+    def handle(self, *args, **options):
+        rng = random.Random(8)
+        questions = [
+            SimpleNamespace(
+                id=i + 1,
+                correct_option="",
+                weights={
+                    option: {piston: rng.randint(0, 3) for piston in rng.sample(PISTONS, 3)}
+                    for option in OPTIONS
+                },
+            )
+            for i in range(options["questions"])
+        ]
+        rows = [
+            (pid, q.id, rng.choice(OPTIONS))
+            for pid in range(1, options["participants"] + 1)
+            for q in questions
+            if rng.random() < options["answer_rate"]
+        ]
+        self.stdout.write(
+            f"{options['participants']} participants x {options['questions']} questions "
+            f"({len(rows)} answers)"
+        )
+
+        by_id = {q.id: q for q in questions}
+        started = time.perf_counter()
+        loop_scores = {}
+        loop_profiles = {}
+        for pid, qid, option in rows:
+            question = by_id[qid]
+            loop_scores[pid] = loop_scores.get(pid, 0.0) + score_answer(question, option)
+            profile = loop_profiles.setdefault(pid, [0.0] * len(PISTONS))
+            for i, weight in enumerate(option_weights(question.weights, option)):
+                profile[i] += weight
+        loop_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        compiled = QuizWeights.compile(questions)
+        compile_seconds = time.perf_counter() - started
+        participant_ids, matrix = compiled.answer_matrix(rows)
+        matrix_seconds = time.perf_counter() - started - compile_seconds
+        started = time.perf_counter()
+        totals = compiled.scores(matrix).sum(axis=1)
+        profiles = compiled.profiles(matrix)
+        vector_seconds = time.perf_counter() - started
+
+        expected = np.array([loop_scores[pid] for pid in participant_ids])
+        expected_profiles = np.array([loop_profiles[pid] for pid in participant_ids])
+        if not (np.allclose(totals, expected) and np.allclose(profiles, expected_profiles)):
+            self.stderr.write("Vectorized results differ from the loop!")
+
+        self.stdout.write(f"  python loop:  {loop_seconds * 1000:8.1f} ms")
+        self.stdout.write(
+            f"  vectorized:   {vector_seconds * 1000:8.1f} ms "
+            f"(+ compile {compile_seconds * 1000:.1f} ms, answer matrix {matrix_seconds * 1000:.1f} ms)"
+        )
+        self.stdout.write(f"  speedup (scoring only): {loop_seconds / vector_seconds:.0f}x")
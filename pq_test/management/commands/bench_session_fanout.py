@@ -0,0 +1,145 @@
+# backend/pq_test/management/commands/bench_session_fanout.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from pq_test.consumers import QuizSessionConsumer
+from pq_test.events import publish_event
+from pq_test.management.commands.loadtest_quiz import percentile
+
+BENCH_SESSION_CODE = "BENCHFANOUT"
+HOST_ID = 1
+
+STATS = {
+    "question_id": 1,
+    "total_responses": 4000,
+    "average_time": 6.5,
+    "option_a_count": 1000,
+    "option_b_count": 1000,
+    "option_c_count": 1000,
+    "option_d_count": 1000,
+    "option_a_pct": 25.0,
+    "option_b_pct": 25.0,
+    "option_c_pct": 25.0,
+    "option_d_pct": 25.0,
+    "p50_time": 5.75,
+    "p90_time": 12.5,
+    "p99_time": 24.0,
+    "time_histogram": [400, 1300, 1400, 550, 200, 100, 40, 10, 0, 0, 0],
+}
+
+
+class FanoutConsumer(QuizSessionConsumer):
+    """
+    Only the host gets a snapshot (no DB, no presence traffic in the way).
+    """
+
+    async def _get_snapshot(self):
+        if self.scope["user"].id != HOST_ID:
+            return None
+        return SimpleNamespace(data={"host_id": HOST_ID}, session_id=-1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure one session broadcast to many sockets for several participant "
+        "shard counts (PQ_SESSION_GROUP_SHARDS): host latency, time until every "
+        "participant has it, and time spent in the channel layer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=5000)
+        parser.add_argument("--shards", default="1,8,32", help="Comma-separated shard counts")
+        parser.add_argument("--broadcasts", type=int, default=5)
+        parser.add_argument("--layer", choices=["memory", "redis"], default="memory")
+        parser.add_argument(
+            "--redis-url",
+            default="redis://127.0.0.1:6379/0",
+            help="Redis (or a local stand-in) for --layer redis",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            shard_counts = [int(n) for n in options["shards"].split(",")]
+        except ValueError:
+            raise CommandError("--shards must be comma-separated integers")
+        if options["layer"] == "redis":
+            layer = {
+                "BACKEND": "channels_redis.core.RedisChannelLayer",
+                "CONFIG": {"hosts": [options["redis_url"]], "capacity": 1000},
+            }
+        else:
+            layer = {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"capacity": 1000}}
+
+        self.stdout.write(
+            f"{options['members']} participants + 1 host, {options['layer']} layer, "
+            f"{options['broadcasts']} broadcasts per row"
+        )
+        with override_settings(CHANNEL_LAYERS={"default": layer}, PQ_STATS_BACKEND="memory"):
+            asyncio.run(self._run_all(shard_counts, options))
+
+    async def _run_all(self, shard_counts, options):
+        for shards in shard_counts:
+            with override_settings(PQ_SESSION_GROUP_SHARDS=shards):
+                host, publish, last, p50, p99 = await self._run(options["members"], options["broadcasts"])
+            self.stdout.write(
+                f"  {shards:>3} shards: host {host:7.1f} ms, layer calls {publish:7.1f} ms, "
+                f"participants p50 {p50:7.1f} ms / p99 {p99:7.1f} ms / last {last:7.1f} ms"
+            )
+            await get_channel_layer().flush()
+
+    async def _run(self, members, broadcasts):
+        app = FanoutConsumer.as_asgi()
+        clients = []
+        for user_id in range(HOST_ID, members + 2):
+            client = ApplicationCommunicator(
+                app,
+                {
+                    "type": "websocket",
+                    "path": f"/ws/pq/sessions/{BENCH_SESSION_CODE}/",
+                    "headers": [],
+                    "query_string": b"",
+                    "subprotocols": [],
+                    "url_route": {"args": (), "kwargs": {"session_code": BENCH_SESSION_CODE}},
+                    "user": SimpleNamespace(id=user_id, is_authenticated=True),
+                },
+            )
+            await client.send_input({"type": "websocket.connect"})
+            await client.receive_output(timeout=30)
+            clients.append(client)
+
+        async def delivered(client):
+            await client.output_queue.get()
+            return time.perf_counter()
+
+        host_ms, publish_ms, last_ms, participant_ms = [], [], [], []
+        for _ in range(broadcasts):
+            waiters = [asyncio.ensure_future(delivered(client)) for client in clients]
+            started = time.perf_counter()
+            await publish_event(BENCH_SESSION_CODE, "stats_update", STATS)
+            publish_ms.append((time.perf_counter() - started) * 1000)
+            times = [(t - started) * 1000 for t in await asyncio.gather(*waiters)]
+            host_ms.append(times[0])
+            participant_ms.extend(times[1:])
+            last_ms.append(max(times[1:]))
+
+        for client in clients:
+            await client.send_input({"type": "websocket.disconnect", "code": 1000})
+        for client in clients:
+            try:
+                await client.wait(timeout=30)
+            except Exception:
+                pass  # a receive still blocked in the layer may fail on shutdown
+        participant_ms.sort()
+        return (
+            sum(host_ms) / broadcasts,
+            sum(publish_ms) / broadcasts,
+            sum(last_ms) / broadcasts,
+            percentile(participant_ms, 50),
+            percentile(participant_ms, 99),
+        )
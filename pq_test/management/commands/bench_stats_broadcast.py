@@ -0,0 +1,118 @@
+# backend/pq_test/management/commands/bench_stats_broadcast.py
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from pq_test.broadcast import StatsBroadcaster
+from pq_test.consumers import QuizSessionConsumer
+from pq_test.events import send_to_session
+from pq_test.stats import empty_counters, get_stats_store, question_stats
+
+BENCH_SESSION_ID = -1
+BENCH_QUESTION_ID = -1
+BENCH_SESSION_CODE = "BENCHSTATS"
+
+
+class CountingConsumer(QuizSessionConsumer):
+    delivered = 0
+
+    async def broadcast_event(self, event):
+        CountingConsumer.delivered += 1
+        await super().broadcast_event(event)
+
+
+class Command(BaseCommand):
+    help = (
+        "Count stats_update messages delivered to QuizSessionConsumer.broadcast_event "
+        "with one broadcast per answer vs the coalesced broadcaster."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, default=200)
+        parser.add_argument("--window", type=float, default=2.0, help="Seconds over which all answers arrive")
+        parser.add_argument("--interval-ms", type=int, default=250)
+
+    def handle(self, *args, **options):
+        participants = options["participants"]
+        layers = {
+            "default": {
+                "BACKEND": "channels.layers.InMemoryChannelLayer",
+                "CONFIG": {"capacity": participants * 2 + 100},
+            }
+        }
+        with override_settings(CHANNEL_LAYERS=layers):
+            for mode in ("per-answer", "coalesced"):
+                delivered, elapsed = asyncio.run(
+                    self._run(mode, participants, options["window"], options["interval_ms"] / 1000.0)
+                )
+                self.stdout.write(
+                    f"{mode:>10}: {delivered} messages delivered to {participants} sockets "
+                    f"({delivered // participants} broadcasts) in {elapsed:.2f}s"
+                )
+
+    async def _run(self, mode, participants, window, interval):
+        store = get_stats_store()
+        store.invalidate(BENCH_SESSION_ID)
+        generation = store.generation(BENCH_SESSION_ID, [BENCH_QUESTION_ID])[BENCH_QUESTION_ID]
+        store.prime(BENCH_SESSION_ID, BENCH_QUESTION_ID, empty_counters(), generation)
+        CountingConsumer.delivered = 0
+
+        app = CountingConsumer.as_asgi()
+        clients = []
+        for i in range(participants):
+            client = ApplicationCommunicator(
+                app,
+                {
+                    "type": "websocket",
+                    "path": f"/ws/pq/sessions/{BENCH_SESSION_CODE}/",
+                    "headers": [],
+                    "query_string": b"",
+                    "subprotocols": [],
+                    "url_route": {"args": (), "kwargs": {"session_code": BENCH_SESSION_CODE}},
+                    "user": SimpleNamespace(id=i + 1, is_authenticated=True),
+                },
+            )
+            await client.send_input({"type": "websocket.connect"})
+            await client.receive_output(timeout=5)
+            clients.append(client)
+
+        broadcaster = StatsBroadcaster(interval=interval)
+        started = time.perf_counter()
+        for _ in range(participants):
+            store.record_answer(
+                BENCH_SESSION_ID, BENCH_QUESTION_ID, random.choice("ABCD"), random.random() * 10
+            )
+            if mode == "coalesced":
+                await broadcaster.mark_dirty(BENCH_SESSION_CODE, BENCH_SESSION_ID, BENCH_QUESTION_ID)
+            else:
+                await send_to_session(
+                    BENCH_SESSION_CODE,
+                    {
+                        "type": "broadcast_event",
+                        "event": "stats_update",
+                        "data": question_stats(BENCH_SESSION_ID, BENCH_QUESTION_ID),
+                    },
+                    broadcaster.channel_layer,
+                )
+            await asyncio.sleep(window / participants)
+
+        if mode == "coalesced":
+            await broadcaster.flush(BENCH_SESSION_CODE)
+
+        # Wait for consumers to drain their channels
+        last = -1
+        while last != CountingConsumer.delivered:
+            last = CountingConsumer.delivered
+            await asyncio.sleep(0.2)
+        elapsed = time.perf_counter() - started
+
+        for client in clients:
+            await client.send_input({"type": "websocket.disconnect", "code": 1000})
+            await client.wait(timeout=5)
+        store.invalidate(BENCH_SESSION_ID)
+        return CountingConsumer.delivered, elapsed
@@ -0,0 +1,140 @@
+# backend/pq_test/management/commands/bench_wire_format.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from pq_test.consumers import QuizSessionConsumer
+from pq_test.events import publish_event, send_to_session
+from pq_test.wire import JSON, MSGPACK_SUBPROTOCOL, encode, encode_frames
+
+BENCH_SESSION_CODE = "BENCHWIRE"
+
+SAMPLE_EVENTS = {
+    "stats_update": {
+        "question_id": 1234,
+        "total_responses": 987,
+        "average_time": 7.42,
+        "option_a_count": 301,
+        "option_b_count": 244,
+        "option_c_count": 259,
+        "option_d_count": 183,
+        "option_a_pct": 30.5,
+        "option_b_pct": 24.72,
+        "option_c_pct": 26.24,
+        "option_d_pct": 18.54,
+        "p50_time": 6.125,
+        "p90_time": 14.2,
+        "p99_time": 27.5,
+        "time_histogram": [96, 312, 341, 147, 52, 27, 9, 3, 0, 0, 0],
+    },
+    "current_question_changed": {
+        "question_id": 1235,
+        "question_text": "Which of these matters most to you this year?",
+        "option_a": "Health",
+        "option_b": "Family",
+        "option_c": "Travel",
+        "option_d": "Learning",
+        "order": 12,
+        "time_limit": 30,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bytes on the wire and CPU per broadcast for one session group: JSON encoded "
+        "per socket (previous behaviour) vs frames encoded once per format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=1000)
+        parser.add_argument("--broadcasts", type=int, default=20, help="Per event type and mode")
+
+    def handle(self, *args, **options):
+        members = options["members"]
+        layers = {
+            "default": {
+                "BACKEND": "channels.layers.InMemoryChannelLayer",
+                "CONFIG": {"capacity": options["broadcasts"] * 2 + 100},
+            }
+        }
+        self.stdout.write(f"{members} sockets, {options['broadcasts']} broadcasts per row")
+        self.stdout.write("Encoding only:")
+        for event, data in SAMPLE_EVENTS.items():
+            per_socket = self._cpu_ms(
+                lambda: [encode(JSON, event, data, 1) for _ in range(members)], options["broadcasts"]
+            )
+            once = self._cpu_ms(lambda: encode_frames(event, data, 1), options["broadcasts"])
+            self.stdout.write(
+                f"  {event:>24}: json per socket {per_socket:7.3f} ms, "
+                f"once per format {once:7.3f} ms"
+            )
+        self.stdout.write("End to end (in-memory channel layer, consumers included):")
+        with override_settings(CHANNEL_LAYERS=layers, PQ_STATS_BACKEND="memory"):
+            for mode, fmt in (
+                ("json per socket", "json"),
+                ("json once", "json"),
+                ("msgpack once", "msgpack"),
+            ):
+                results = asyncio.run(self._run(mode, fmt, members, options["broadcasts"]))
+                for event, (bytes_per_socket, cpu_ms) in results.items():
+                    self.stdout.write(
+                        f"  {mode:>15} {event:>24}: {bytes_per_socket:6.0f} B/socket, "
+                        f"{bytes_per_socket * members / 1024:8.1f} KiB/broadcast, "
+                        f"{cpu_ms:7.2f} ms CPU/broadcast"
+                    )
+
+    async def _run(self, mode, fmt, members, broadcasts):
+        app = QuizSessionConsumer.as_asgi()
+        clients = []
+        for i in range(members):
+            client = ApplicationCommunicator(
+                app,
+                {
+                    "type": "websocket",
+                    "path": f"/ws/pq/sessions/{BENCH_SESSION_CODE}/",
+                    "headers": [],
+                    "query_string": b"",
+                    "subprotocols": [MSGPACK_SUBPROTOCOL] if fmt == "msgpack" else [],
+                    "url_route": {"args": (), "kwargs": {"session_code": BENCH_SESSION_CODE}},
+                    "user": SimpleNamespace(id=i + 1, is_authenticated=True),
+                },
+            )
+            await client.send_input({"type": "websocket.connect"})
+            await client.receive_output(timeout=5)
+            clients.append(client)
+
+        results = {}
+        for event, data in SAMPLE_EVENTS.items():
+            wire_bytes = 0
+            started = time.process_time()
+            for seq in range(1, broadcasts + 1):
+                if mode == "json per socket":
+                    await send_to_session(
+                        BENCH_SESSION_CODE,
+                        {"type": "broadcast_event", "event": event, "data": data, "seq": seq},
+                    )
+                else:
+                    await publish_event(BENCH_SESSION_CODE, event, data)
+                for client in clients:
+                    message = await client.output_queue.get()
+                    text = message.get("text")
+                    wire_bytes += len(text.encode()) if text is not None else len(message["bytes"])
+            cpu = time.process_time() - started
+            results[event] = (wire_bytes / (members * broadcasts), cpu * 1000 / broadcasts)
+
+        for client in clients:
+            await client.send_input({"type": "websocket.disconnect", "code": 1000})
+            await client.wait(timeout=5)
+        return results
+
+    @staticmethod
+    def _cpu_ms(fn, repeat):
+        started = time.process_time()
+        for _ in range(repeat):
+            fn()
+        return (time.process_time() - started) * 1000 / repeat
@@ -0,0 +1,355 @@
+# backend/pq_test/management/commands/loadtest_quiz.py
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from pq_test.models import Question, Quiz, QuizSession
+from pq_test.stats import invalidate_stats
+
+HOST = "loadtest"
+
+
+class QueryCounter:
+    """
+    Counts queries on every DB connection (views and consumers run their ORM
+    calls in worker threads, so one connection is not enough).
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self, connection):
+        if self in connection.execute_wrappers:
+            connection.execute_wrappers.remove(self)
+
+
+class Inbox:
+    """
+    Timestamps of the events delivered to all simulated sockets.
+    """
+
+    def __init__(self):
+        self.received = defaultdict(list)
+        self.messages = 0
+        self.changed = asyncio.Condition()
+
+    async def read(self, client, label):
+        # Read the output queue directly: receive_output() cancels the app on timeout.
+        while True:
+            message = await client.output_queue.get()
+            if message["type"] != "websocket.send":
+                return
+            event = json.loads(message["text"]).get("event")
+            async with self.changed:
+                self.messages += 1
+                self.received[event].append((time.perf_counter(), label))
+                self.changed.notify_all()
+
+    async def wait_for(self, event, count, timeout):
+        async with self.changed:
+            await asyncio.wait_for(
+                self.changed.wait_for(lambda: len(self.received[event]) >= count),
+                timeout,
+            )
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a live quiz in-process: runs config.asgi.application with "
+        "simulated authenticated WebSocket clients (no network) through "
+        "join/question/answer/end and reports broadcast latency, messages/s "
+        "and DB queries per answer. Creates and removes its own throwaway data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, default=500)
+        parser.add_argument("--questions", type=int, default=5)
+        parser.add_argument(
+            "--answer-via",
+            choices=("ws", "http"),
+            default="ws",
+            help="Submit answers over the quiz socket or SubmitAnswerView",
+        )
+        parser.add_argument(
+            "--http-concurrency",
+            type=int,
+            help=(
+                "Concurrent HTTP requests; each runs in its own thread. Defaults to 20, "
+                "or 1 on SQLite, whose read-then-write transactions fail with "
+                "'database is locked' when they overlap."
+            ),
+        )
+        parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait per phase")
+
+    def handle(self, *args, **options):
+        from config.asgi import application
+
+        participants = options["participants"]
+        layers = {
+            "default": {
+                "BACKEND": "channels.layers.InMemoryChannelLayer",
+                "CONFIG": {"capacity": 1000, "group_expiry": 3600},
+            }
+        }
+
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        host = User.objects.create_user(email=f"load-host-{tag}@example.com", username=f"load-host-{tag}")
+        users = User.objects.bulk_create(
+            [
+                User(email=f"load-{tag}-{i}@example.com", username=f"load-{tag}-{i}")
+                for i in range(participants)
+            ]
+        )
+        quiz = Quiz.objects.create(title=f"load test {tag}", owner=host)
+        Question.objects.bulk_create(
+            [
+                Question(quiz=quiz, text=f"Q{i}", option_a="A", option_b="B", option_c="C", option_d="D", correct_option="A", order=i)
+                for i in range(options["questions"])
+            ]
+        )
+        question_ids = list(quiz.questions.values_list("id", flat=True))
+        session = QuizSession.objects.create(quiz=quiz, host=host, is_public=True)
+        self.tokens = {u.id: str(AccessToken.for_user(u)) for u in [host] + users}
+
+        counter = QueryCounter()
+        connection_created.connect(counter.install)
+        for conn in connections.all():
+            counter.install(conn)
+        try:
+            with override_settings(CHANNEL_LAYERS=layers, ALLOWED_HOSTS=[HOST], SECURE_SSL_REDIRECT=False):
+                results = asyncio.run(
+                    self._run(application, session, question_ids, host, users, counter, options)
+                )
+        finally:
+            connection_created.disconnect(counter.install)
+            for conn in connections.all():
+                counter.uninstall(conn)
+            invalidate_stats(session.id)
+            quiz.delete()
+            User.objects.filter(pk__in=[host.pk] + [u.pk for u in users]).delete()
+
+        self._report(results, participants, options)
+
+    async def _run(self, app, session, question_ids, host, users, counter, options):
+        timeout = options["timeout"]
+        code = session.session_code
+        inbox = Inbox()
+        results = {"latency": defaultdict(list), "phases": {}}
+        http_concurrency = options["http_concurrency"]
+        if http_concurrency is None:
+            http_concurrency = 1 if connection.vendor == "sqlite" else 20
+        self.http_slots = asyncio.Semaphore(http_concurrency)
+
+        # Join over HTTP, then open one socket per participant plus the host
+        started = time.perf_counter()
+        statuses = await asyncio.gather(
+            *(self._http(app, "POST", f"/api/pq/sessions/{code}/join/", u.id, timeout=timeout) for u in users)
+        )
+        if any(s != 200 for s in statuses):
+            raise CommandError(f"Join failed: {sorted(set(statuses))}")
+        results["phases"]["join"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        sockets = {}
+        for user in [host] + users:
+            client = ApplicationCommunicator(
+                app,
+                {
+                    "type": "websocket",
+                    "path": f"/ws/pq/sessions/{code}/",
+                    "raw_path": f"/ws/pq/sessions/{code}/".encode(),
+                    "query_string": f"token={self.tokens[user.id]}".encode(),
+                    "headers": [(b"host", HOST.encode())],
+                    "subprotocols": [],
+                    "client": ("127.0.0.1", 0),
+                    "server": (HOST, 80),
+                },
+            )
+            await client.send_input({"type": "websocket.connect"})
+            accepted = await client.receive_output(timeout=timeout)
+            if accepted["type"] != "websocket.accept":
+                raise CommandError(f"Socket for user {user.id} was not accepted: {accepted}")
+            sockets[user.id] = client
+        readers = [
+            asyncio.ensure_future(inbox.read(client, user_id))
+            for user_id, client in sockets.items()
+        ]
+        results["phases"]["connect"] = time.perf_counter() - started
+
+        status = await self._http(app, "POST", f"/api/pq/sessions/{session.id}/start/", host.id, timeout=timeout)
+        if status != 200:
+            raise CommandError(f"Start failed: {status}")
+
+        run_started = time.perf_counter()
+        messages_before = inbox.messages
+        host_socket = sockets[host.id]
+        answers = 0
+        answer_queries = 0
+        answer_seconds = 0.0
+
+        for qid in question_ids:
+            expected = len(inbox.received["current_question_changed"]) + len(sockets)
+            sent_at = time.perf_counter()
+            await self._send(host_socket, {"action": "host_set_question", "question_id": qid})
+            await inbox.wait_for("current_question_changed", expected, timeout)
+            results["latency"]["current_question_changed"] += [
+                at - sent_at for at, _ in inbox.received["current_question_changed"][-len(sockets):]
+            ]
+
+            queries_before = counter.count
+            answer_started = time.perf_counter()
+            if options["answer_via"] == "ws":
+                expected = len(inbox.received["answer_accepted"]) + len(users)
+                sent = {}
+                for user in users:
+                    sent[user.id] = time.perf_counter()
+                    await self._send(
+                        sockets[user.id],
+                        {
+                            "action": "submit_answer",
+                            "question_id": qid,
+                            "selected_option": random.choice("ABCD"),
+                            "time_taken_seconds": round(random.random() * 10, 2),
+                        },
+                    )
+                await inbox.wait_for("answer_accepted", expected, timeout)
+                results["latency"]["answer_accepted"] += [
+                    at - sent[label] for at, label in inbox.received["answer_accepted"][-len(users):]
+                ]
+            else:
+                statuses = await asyncio.gather(
+                    *(
+                        self._http(
+                            app,
+                            "POST",
+                            f"/api/pq/sessions/{code}/answer/",
+                            user.id,
+                            {"question_id": qid, "selected_option": random.choice("ABCD")},
+                            timeout=timeout,
+                        )
+                        for user in users
+                    )
+                )
+                if any(s != 200 for s in statuses):
+                    raise CommandError(f"Answer failed: {sorted(set(statuses))}")
+            answer_seconds += time.perf_counter() - answer_started
+            answer_queries += counter.count - queries_before
+            answers += len(users)
+
+        expected = len(sockets)
+        sent_at = time.perf_counter()
+        await self._send(host_socket, {"action": "host_end"})
+        await inbox.wait_for("session_ended", expected, timeout)
+        results["latency"]["session_ended"] = [
+            at - sent_at for at, _ in inbox.received["session_ended"]
+        ]
+        elapsed = time.perf_counter() - run_started
+
+        for client in sockets.values():
+            await client.send_input({"type": "websocket.disconnect", "code": 1000})
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        for client in sockets.values():
+            await client.wait(timeout=timeout)
+
+        results.update(
+            elapsed=elapsed,
+            messages=inbox.messages - messages_before,
+            stats_updates=len(inbox.received["stats_update"]),
+            answers=answers,
+            answer_seconds=answer_seconds,
+            answer_queries=answer_queries,
+        )
+        return results
+
+    async def _send(self, client, content):
+        await client.send_input({"type": "websocket.receive", "text": json.dumps(content)})
+
+    async def _http(self, app, method, path, user_id, data=None, timeout=60):
+        async with self.http_slots:
+            return await self._http_request(app, method, path, user_id, data, timeout)
+
+    async def _http_request(self, app, method, path, user_id, data, timeout):
+        body = json.dumps(data or {}).encode()
+        client = ApplicationCommunicator(
+            app,
+            {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": method,
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", HOST.encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"authorization", f"Bearer {self.tokens[user_id]}".encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": (HOST, 80),
+            },
+        )
+        await client.send_input({"type": "http.request", "body": body, "more_body": False})
+        start = await client.receive_output(timeout)
+        while (await client.receive_output(timeout)).get("more_body"):
+            pass
+        await client.wait(timeout)
+        return start["status"]
+
+    def _report(self, results, participants, options):
+        self.stdout.write(
+            f"{participants} participants, {options['questions']} questions, "
+            f"answers via {options['answer_via']}"
+        )
+        self.stdout.write(
+            f"  join {results['phases']['join']:.2f}s, connect {results['phases']['connect']:.2f}s"
+        )
+        for event, values in results["latency"].items():
+            self.stdout.write(
+                f"  {event:>24}: p50 {percentile(values, 50) * 1000:.1f} ms, "
+                f"p99 {percentile(values, 99) * 1000:.1f} ms, "
+                f"mean {statistics.fmean(values) * 1000:.1f} ms ({len(values)} deliveries)"
+            )
+        self.stdout.write(
+            f"  {results['messages']} messages delivered in {results['elapsed']:.2f}s "
+            f"({results['messages'] / results['elapsed']:.0f} messages/s, "
+            f"{results['stats_updates']} stats_update)"
+        )
+        answers = results["answers"] or 1
+        self.stdout.write(
+            f"  {results['answers']} answers at {results['answers'] / results['answer_seconds']:.0f} answers/s, "
+            f"{results['answer_queries'] / answers:.2f} DB queries per answer"
+        )
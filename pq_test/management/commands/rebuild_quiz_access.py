@@ -0,0 +1,37 @@
+# backend/pq_test/management/commands/rebuild_quiz_access.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pq_test.access import sync_quiz_access
+from pq_test.models import Quiz
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the QuizAccess visibility rows from quiz owners, classrooms "
+        "and session hosts (all quizzes by default), a chunk of quizzes per "
+        "transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quiz", action="append", type=int, default=[], help="Quiz id (repeatable)")
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.order_by("id")
+        if options["quiz"]:
+            quizzes = quizzes.filter(id__in=options["quiz"])
+        quiz_ids = list(quizzes.values_list("id", flat=True))
+
+        added = removed = 0
+        for start in range(0, len(quiz_ids), CHUNK_SIZE):
+            with transaction.atomic():
+                a, r = sync_quiz_access(quiz_ids[start : start + CHUNK_SIZE])
+            added += a
+            removed += r
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(quiz_ids)} quizzes checked: {added} access rows added, {removed} removed."
+            )
+        )
@@ -0,0 +1,29 @@
+# backend/pq_test/management/commands/rebuild_session_reports.py
+from django.core.management.base import BaseCommand
+
+from pq_test.models import QuizSession
+from pq_test.reports import build_session_report
+
+
+class Command(BaseCommand):
+    help = "Build the materialized SessionReport of ended sessions (all of them by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--session", action="append", default=[], help="Session code (repeatable)")
+        parser.add_argument("--quiz", action="append", type=int, default=[], help="Quiz id (repeatable)")
+        parser.add_argument("--missing", action="store_true", help="Only sessions without a report")
+
+    def handle(self, *args, **options):
+        sessions = QuizSession.objects.filter(status=QuizSession.STATUS_ENDED)
+        if options["session"]:
+            sessions = sessions.filter(session_code__in=options["session"])
+        if options["quiz"]:
+            sessions = sessions.filter(quiz_id__in=options["quiz"])
+        if options["missing"]:
+            sessions = sessions.filter(report__isnull=True)
+
+        built = 0
+        for session_id in sessions.order_by("id").values_list("id", flat=True).iterator():
+            build_session_report(session_id)
+            built += 1
+        self.stdout.write(self.style.SUCCESS(f"{built} session reports built."))
@@ -0,0 +1,72 @@
+# backend/pq_test/management/commands/rescore_sessions.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pq_test.archive import restore_session, session_answer_values
+from pq_test.leaderboard import invalidate_leaderboard
+from pq_test.models import AnswerRecord, QuizSession
+from pq_test.reports import build_session_report
+from pq_test.scoring import QuizWeights
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-score stored answers with the current Question.weights / correct_option "
+        "(vectorized per session). Defaults to all ended sessions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--session", action="append", default=[], help="Session code (repeatable)")
+        parser.add_argument("--quiz", action="append", type=int, default=[], help="Quiz id (repeatable)")
+        parser.add_argument("--include-live", action="store_true", help="Also re-score sessions that have not ended")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        sessions = QuizSession.objects.all()
+        if options["session"]:
+            sessions = sessions.filter(session_code__in=options["session"])
+        if options["quiz"]:
+            sessions = sessions.filter(quiz_id__in=options["quiz"])
+        if not options["include_live"] and not options["session"]:
+            sessions = sessions.filter(status=QuizSession.STATUS_ENDED)
+
+        compiled = {}
+        total_sessions = total_changed = 0
+        for session in sessions.only("id", "quiz_id", "session_code", "status").order_by("id").iterator():
+            if session.quiz_id not in compiled:
+                compiled[session.quiz_id] = QuizWeights.for_quiz(session.quiz_id)
+            changed = self._rescore(session, compiled[session.quiz_id], options)
+            total_sessions += 1
+            total_changed += changed
+            if changed:
+                self.stdout.write(f"{session.session_code}: {changed} answers re-scored")
+
+        verb = "would change" if options["dry_run"] else "changed"
+        self.stdout.write(
+            self.style.SUCCESS(f"{total_sessions} sessions checked, {total_changed} answer scores {verb}.")
+        )
+
+    def _rescore(self, session, weights, options):
+        rows = list(
+            session_answer_values(session.id, ("id", "question_id", "selected_option", "score"))
+        )
+        if not rows:
+            return 0
+        ids, question_ids, selected, current = zip(*rows)
+        scores = weights.rescore(question_ids, selected)
+        updates = [
+            AnswerRecord(id=answer_id, score=score)
+            for answer_id, score, old in zip(ids, scores, current)
+            if score is not None and abs(score - old) > 1e-9
+        ]
+        if updates and not options["dry_run"]:
+            with transaction.atomic():
+                # Archived answers are re-scored in AnswerRecord; the next
+                # archive run moves them back
+                restore_session(session.id)
+                AnswerRecord.objects.bulk_update(updates, ["score"], batch_size=options["batch_size"])
+            invalidate_leaderboard(session.id)
+            if session.status == QuizSession.STATUS_ENDED:
+                build_session_report(session.id)
+        return len(updates)
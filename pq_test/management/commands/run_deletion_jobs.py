@@ -0,0 +1,25 @@
+# backend/pq_test/management/commands/run_deletion_jobs.py
+from django.core.management.base import BaseCommand
+
+from pq_test.deletion import run_deletion_job
+from pq_test.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Run deletion jobs that are not done (never queued, interrupted or "
+        "failed). Jobs resume where they stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", action="append", type=int, default=[], help="Job id (repeatable)")
+
+    def handle(self, *args, **options):
+        jobs = DeletionJob.objects.exclude(status=DeletionJob.STATUS_DONE)
+        if options["job"]:
+            jobs = jobs.filter(id__in=options["job"])
+        for job_id in jobs.order_by("id").values_list("id", flat=True):
+            job = run_deletion_job(job_id)
+            deleted = sum(entry["deleted"] for entry in job.progress.values())
+            self.stdout.write(f"Job {job.pk} ({job.kind} {job.label}): {deleted} rows deleted")
+        self.stdout.write(self.style.SUCCESS("Deletion jobs done."))
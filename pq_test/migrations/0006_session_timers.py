@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pq_test', '0005_alter_quizsession_quiz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='current_question_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text="Cleared by the timer once the question's time is up.", null=True),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='current_question_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='time_expired_at',
+            field=models.DateTimeField(blank=True, help_text='When the total-time expiry was processed (set once by the timer).', null=True),
+        ),
+        migrations.AlterField(
+            model_name='quizsession',
+            name='total_time_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the total quiz time ends for everyone.', null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_answered_count(apps, schema_editor):
+    ParticipantSession = apps.get_model("pq_test", "ParticipantSession")
+    AnswerRecord = apps.get_model("pq_test", "AnswerRecord")
+    answered = (
+        AnswerRecord.objects.filter(participant=OuterRef("pk"))
+        .order_by()
+        .values("participant")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    ParticipantSession.objects.update(answered_count=Coalesce(Subquery(answered), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pq_test', '0007_session_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participantsession',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_answered_count, migrations.RunPython.noop),
+    ]
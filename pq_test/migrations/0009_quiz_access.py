@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_quiz_access(apps, schema_editor):
+    # Same rows as pq_test.access.expected_access, for every quiz
+    Quiz = apps.get_model("pq_test", "Quiz")
+    QuizSession = apps.get_model("pq_test", "QuizSession")
+    QuizAccess = apps.get_model("pq_test", "QuizAccess")
+
+    def rows():
+        for quiz_id, owner_id, classroom_owner_id in Quiz.objects.values_list(
+            "id", "owner_id", "classroom__owner_id"
+        ).iterator():
+            yield QuizAccess(user_id=owner_id, quiz_id=quiz_id, source="owner")
+            if classroom_owner_id is not None:
+                yield QuizAccess(user_id=classroom_owner_id, quiz_id=quiz_id, source="classroom_owner")
+        for quiz_id, member_id in (
+            Quiz.objects.filter(classroom__members__isnull=False)
+            .values_list("id", "classroom__members")
+            .iterator()
+        ):
+            yield QuizAccess(user_id=member_id, quiz_id=quiz_id, source="classroom_member")
+        for quiz_id, host_id in (
+            QuizSession.objects.filter(host__isnull=False)
+            .values_list("quiz_id", "host_id")
+            .distinct()
+            .iterator()
+        ):
+            yield QuizAccess(user_id=host_id, quiz_id=quiz_id, source="host")
+
+    batch = []
+    for row in rows():
+        batch.append(row)
+        if len(batch) >= 5000:
+            QuizAccess.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    QuizAccess.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pq_test', '0008_participant_answered_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('owner', 'Quiz owner'), ('classroom_owner', 'Classroom owner'), ('classroom_member', 'Classroom member'), ('host', 'Session host')], max_length=20)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='pq_test.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'quiz', 'source'), name='unique_quiz_access')],
+            },
+        ),
+        migrations.RunPython(backfill_quiz_access, migrations.RunPython.noop),
+    ]
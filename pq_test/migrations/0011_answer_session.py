@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import Max, Min, OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def backfill_answer_session(apps, schema_editor):
+    """
+    Fill session_id a window of ids at a time, each window in its own
+    transaction, so only those rows are locked while it runs.
+    """
+    AnswerRecord = apps.get_model("pq_test", "AnswerRecord")
+    ParticipantSession = apps.get_model("pq_test", "ParticipantSession")
+    db = schema_editor.connection.alias
+    answers = AnswerRecord.objects.using(db)
+    bounds = answers.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None:
+        return
+    session_id = Subquery(
+        ParticipantSession.objects.using(db)
+        .filter(pk=OuterRef("participant_id"))
+        .values("session_id")[:1]
+    )
+    for start in range(bounds["low"], bounds["high"] + 1, BACKFILL_BATCH_SIZE):
+        with transaction.atomic(using=db):
+            answers.filter(
+                id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE, session__isnull=True
+            ).update(session_id=session_id)
+
+
+class Migration(migrations.Migration):
+    # Not atomic, so the backfill commits window by window instead of
+    # holding locks on the whole answer table until the end
+    atomic = False
+
+    dependencies = [
+        ('pq_test', '0010_background_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answerrecord',
+            name='session',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='pq_test.quizsession'),
+        ),
+        migrations.RunPython(backfill_answer_session, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='AnswerArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='answer_archive', to='pq_test.quizsession')),
+            ],
+        ),
+    ]
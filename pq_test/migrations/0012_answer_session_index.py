@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0011: on PostgreSQL the backfill leaves deferred
+    # constraint checks pending, which blocks ALTER TABLE in the same
+    # transaction.
+
+    dependencies = [
+        ('pq_test', '0011_answer_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answerrecord',
+            name='session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='pq_test.quizsession'),
+        ),
+        migrations.AddIndex(
+            model_name='answerrecord',
+            index=models.Index(fields=['session', 'question'], name='pq_answer_session_question'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pq_test', '0012_answer_session_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='paused_at',
+            field=models.DateTimeField(blank=True, help_text='When the session was paused; resume() pushes the question timer back by the pause.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='quizsession',
+            name='current_question_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text="Cleared by the timer once the question's time is up (live mode only).", null=True),
+        ),
+    ]
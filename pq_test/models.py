@@ -1,4 +1,6 @@
 # backend/pq_test/models.py
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -14,6 +16,16 @@ def generate_join_code(length: int = 8) -> str:
     return "".join(secrets.choice(chars) for _ in range(length))
 
 
+class VisibleManager(models.Manager):
+    """
+    Default manager that leaves out rows hidden while a background deletion
+    removes them (see pq_test.deletion); `all_objects` still sees them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Classroom(models.Model):
     """
     Any user can create a classroom and invite others via join_code.
@@ -104,6 +116,15 @@ class Quiz(models.Model):
         help_text="Optional total time limit for the whole quiz in seconds; 0 = no limit.",
     )
 
+    deleted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Set when deletion is requested; rows are removed in the background.",
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
     def __str__(self) -> str:
         return self.title
 
@@ -111,7 +132,8 @@ class Quiz(models.Model):
 class Question(models.Model):
     """
     Multiple-choice single-answer question.
-    For 8PQ you can use `weights` JSON to map options to piston scores.
+    For 8PQ you can use `weights` JSON to map options to piston scores
+    (see pq_test.scoring for the format).
     """
 
     OPTION_A = "A"
@@ -259,8 +281,14 @@ class QuizSession(models.Model):
     total_time_expires_at = models.DateTimeField(
         null=True,
         blank=True,
+        db_index=True,
         help_text="When the total quiz time ends for everyone.",
     )
+    time_expired_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the total-time expiry was processed (set once by the timer).",
+    )
 
     current_question = models.ForeignKey(
         Question,
@@ -269,10 +297,30 @@ class QuizSession(models.Model):
         blank=True,
         related_name="+",
     )
+    current_question_started_at = models.DateTimeField(blank=True, null=True)
+    current_question_expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text="Cleared by the timer once the question's time is up (live mode only).",
+    )
+    paused_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the session was paused; resume() pushes the question timer back by the pause.",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(blank=True, null=True)
     ended_at = models.DateTimeField(blank=True, null=True)
+    deleted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Set when deletion is requested; rows are removed in the background.",
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     def start(self):
         if self.status == self.STATUS_NOT_STARTED:
@@ -283,12 +331,24 @@ class QuizSession(models.Model):
     def pause(self):
         if self.status == self.STATUS_LIVE:
             self.status = self.STATUS_PAUSED
-            self.save(update_fields=["status"])
+            self.paused_at = timezone.now()
+            self.save(update_fields=["status", "paused_at"])
 
     def resume(self):
         if self.status == self.STATUS_PAUSED:
+            if self.paused_at is not None:
+                # The question clock stood still while paused. A conditional
+                # UPDATE, so a timer that fired meanwhile stays fired.
+                QuizSession.objects.filter(
+                    pk=self.pk, current_question_expires_at__isnull=False
+                ).update(
+                    current_question_expires_at=models.F("current_question_expires_at")
+                    + (timezone.now() - self.paused_at)
+                )
+                self.refresh_from_db(fields=["current_question_expires_at"])
             self.status = self.STATUS_LIVE
-            self.save(update_fields=["status"])
+            self.paused_at = None
+            self.save(update_fields=["status", "paused_at"])
 
     def end(self):
         if self.status in {self.STATUS_LIVE, self.STATUS_PAUSED}:
@@ -296,6 +356,25 @@ class QuizSession(models.Model):
             self.ended_at = timezone.now()
             self.save(update_fields=["status", "ended_at"])
 
+    def set_current_question(self, question):
+        now = timezone.now()
+        time_limit = question.effective_time_limit()
+        self.current_question = question
+        self.current_question_started_at = now
+        # Async sessions are self-paced: no shared question clock
+        self.current_question_expires_at = (
+            now + timedelta(seconds=time_limit)
+            if time_limit > 0 and self.mode == self.MODE_LIVE
+            else None
+        )
+        self.save(
+            update_fields=[
+                "current_question",
+                "current_question_started_at",
+                "current_question_expires_at",
+            ]
+        )
+
     def __str__(self) -> str:
         return f"{self.quiz.title} ({self.session_code})"
 
@@ -333,6 +412,8 @@ class ParticipantSession(models.Model):
     completed = models.BooleanField(default=False)
     completed_reason = models.CharField(max_length=64, blank=True)
     not_done_questions = models.JSONField(default=list, blank=True)
+    # Questions answered so far, maintained by completion.count_answered
+    answered_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         constraints = [
@@ -369,6 +450,15 @@ class AnswerRecord(models.Model):
         related_name="answers",
     )
 
+    # Denormalized participant.session, so per-session reads skip the join;
+    # indexed by the (session, question) index below
+    session = models.ForeignKey(
+        QuizSession,
+        on_delete=models.CASCADE,
+        related_name="answers",
+        db_index=False,
+    )
+
     question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE,
@@ -392,6 +482,152 @@ class AnswerRecord(models.Model):
 
     class Meta:
         unique_together = ("participant", "question")
+        indexes = [
+            models.Index(fields=["session", "question"], name="pq_answer_session_question"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.participant} - Q{self.question_id} ({self.selected_option})"
+
+
+class SessionReport(models.Model):
+    """
+    Aggregated results of an ended session (see pq_test.reports).
+
+    Built once when the session ends, since its answers no longer change;
+    the read endpoints serve `data` instead of re-aggregating.
+    """
+
+    session = models.OneToOneField(
+        QuizSession,
+        on_delete=models.CASCADE,
+        related_name="report",
+    )
+    data = models.JSONField(default=dict)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Report {self.session_id}"
+
+
+class AnswerArchive(models.Model):
+    """
+    The answers of a long-ended session, moved out of AnswerRecord (see
+    pq_test.archive). `data` holds the archived columns as compressed
+    numpy arrays; readers go through pq_test.archive, which serves hot and
+    archived sessions alike.
+    """
+
+    session = models.OneToOneField(
+        QuizSession,
+        on_delete=models.CASCADE,
+        related_name="answer_archive",
+    )
+    row_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Archive {self.session_id} ({self.row_count} answers)"
+
+
+class QuizAccess(models.Model):
+    """
+    Denormalized "user can see quiz", one row per reason (see pq_test.access).
+
+    Kept in step by signals on quiz ownership/classroom, classroom owner and
+    membership, and session host changes, so visibility is one indexed
+    semi-join instead of ORed joins + DISTINCT. `rebuild_quiz_access`
+    recomputes it from scratch.
+    """
+
+    SOURCE_OWNER = "owner"
+    SOURCE_CLASSROOM_OWNER = "classroom_owner"
+    SOURCE_CLASSROOM_MEMBER = "classroom_member"
+    SOURCE_HOST = "host"
+
+    SOURCE_CHOICES = [
+        (SOURCE_OWNER, "Quiz owner"),
+        (SOURCE_CLASSROOM_OWNER, "Classroom owner"),
+        (SOURCE_CLASSROOM_MEMBER, "Classroom member"),
+        (SOURCE_HOST, "Session host"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="quiz_access",
+    )
+    quiz = models.ForeignKey(
+        Quiz,
+        on_delete=models.CASCADE,
+        related_name="access",
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+
+    class Meta:
+        constraints = [
+            # Leading user_id: serves the per-user visibility lookups
+            models.UniqueConstraint(
+                fields=["user", "quiz", "source"],
+                name="unique_quiz_access",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} -> {self.quiz_id} ({self.source})"
+
+
+class DeletionJob(models.Model):
+    """
+    Background removal of a hidden quiz or session and everything under it
+    (see pq_test.deletion). `progress` maps each table to its
+    {"total", "deleted"} row counts.
+    """
+
+    KIND_QUIZ = "quiz"
+    KIND_SESSION = "session"
+
+    KIND_CHOICES = [
+        (KIND_QUIZ, "Quiz"),
+        (KIND_SESSION, "Session"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    label = models.CharField(max_length=255, blank=True)
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="deletion_jobs",
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+    )
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f"Delete {self.kind} {self.object_id} ({self.status})"
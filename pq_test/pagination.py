@@ -0,0 +1,14 @@
+# backend/pq_test/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class SessionCursorPagination(CursorPagination):
+    """
+    Newest sessions first. Cursor pages stay cheap however deep the client
+    scrolls (no OFFSET, no COUNT).
+    """
+
+    ordering = "-created_at"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
@@ -0,0 +1,226 @@
+# backend/pq_test/presence.py
+"""
+Who is connected to a live session.
+
+QuizSessionConsumer reports connect / disconnect / `heartbeat` for every
+participant socket (the host is not counted). The store keeps, per session,
+each user's last-seen time and open socket count; users whose heartbeats
+stop for PQ_PRESENCE_TIMEOUT_SECONDS are dropped, which also cleans up after
+crashed workers.
+
+`last_active_at` is not written per heartbeat: each process collects the
+users it has seen and writes them every PQ_PRESENCE_FLUSH_SECONDS with one
+UPDATE.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ParticipantSession
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryPresenceStore:
+    """
+    Process-local store (see InMemoryStatsStore).
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or settings.PQ_PRESENCE_TIMEOUT_SECONDS
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def connect(self, session_code, user_id, now=None):
+        with self._lock:
+            users = self._sessions.setdefault(session_code, {})
+            sockets, _ = users.get(user_id, (0, 0.0))
+            users[user_id] = (sockets + 1, now or time.time())
+            return self._count(session_code, now)
+
+    def heartbeat(self, session_code, user_id, now=None):
+        with self._lock:
+            users = self._sessions.setdefault(session_code, {})
+            sockets, _ = users.get(user_id, (1, 0.0))
+            users[user_id] = (sockets, now or time.time())
+
+    def disconnect(self, session_code, user_id, now=None):
+        with self._lock:
+            users = self._sessions.get(session_code, {})
+            if user_id in users:
+                sockets, seen = users[user_id]
+                if sockets > 1:
+                    users[user_id] = (sockets - 1, seen)
+                else:
+                    del users[user_id]
+            return self._count(session_code, now)
+
+    def count(self, session_code, now=None):
+        with self._lock:
+            return self._count(session_code, now)
+
+    def _count(self, session_code, now=None):
+        users = self._sessions.get(session_code)
+        if not users:
+            self._sessions.pop(session_code, None)
+            return 0
+        cutoff = (now or time.time()) - self.timeout
+        for user_id in [uid for uid, (_, seen) in users.items() if seen < cutoff]:
+            del users[user_id]
+        return len(users)
+
+    def forget(self, session_code):
+        with self._lock:
+            self._sessions.pop(session_code, None)
+
+
+# KEYS: last-seen sorted set, socket-count hash. ARGV[1] is the stale cutoff.
+_PRUNE = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1])
+if #stale > 0 then
+  redis.call('ZREM', KEYS[1], unpack(stale))
+  redis.call('HDEL', KEYS[2], unpack(stale))
+end
+"""
+
+_CONNECT_SCRIPT = _PRUNE + """
+redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+_DISCONNECT_SCRIPT = _PRUNE + """
+if redis.call('HINCRBY', KEYS[2], ARGV[3], -1) <= 0 then
+  redis.call('HDEL', KEYS[2], ARGV[3])
+  redis.call('ZREM', KEYS[1], ARGV[3])
+end
+return redis.call('ZCARD', KEYS[1])
+"""
+
+_COUNT_SCRIPT = _PRUNE + """
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+class RedisPresenceStore:
+    """
+    Shared store: `pq:presence:<code>` sorted set (user id -> last seen) and
+    `pq:presence:<code>:sockets` hash (user id -> open sockets).
+    """
+
+    def __init__(self, client=None, timeout=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.timeout = timeout or settings.PQ_PRESENCE_TIMEOUT_SECONDS
+        self._connect = client.register_script(_CONNECT_SCRIPT)
+        self._disconnect = client.register_script(_DISCONNECT_SCRIPT)
+        self._count = client.register_script(_COUNT_SCRIPT)
+
+    @staticmethod
+    def keys(session_code):
+        return [f"pq:presence:{session_code}", f"pq:presence:{session_code}:sockets"]
+
+    def _args(self, user_id=None, now=None):
+        now = now or time.time()
+        return [now - self.timeout, now, user_id or "", self.timeout * 4]
+
+    def connect(self, session_code, user_id, now=None):
+        return self._connect(keys=self.keys(session_code), args=self._args(user_id, now))
+
+    def heartbeat(self, session_code, user_id, now=None):
+        self.client.zadd(self.keys(session_code)[0], {user_id: now or time.time()})
+
+    def disconnect(self, session_code, user_id, now=None):
+        return self._disconnect(keys=self.keys(session_code), args=self._args(user_id, now))
+
+    def count(self, session_code, now=None):
+        return self._count(keys=self.keys(session_code), args=self._args(now=now))
+
+    def forget(self, session_code):
+        self.client.delete(*self.keys(session_code))
+
+
+def flush_last_active(seen, now=None):
+    """
+    Set last_active_at for {session_id: {user_id, ...}} in one UPDATE.
+    """
+    condition = Q()
+    for session_id, user_ids in seen.items():
+        condition |= Q(session_id=session_id, user_id__in=user_ids)
+    if not condition:
+        return 0
+    return ParticipantSession.objects.filter(condition).update(
+        last_active_at=now or timezone.now()
+    )
+
+
+class PresenceTracker:
+    def __init__(self, store, interval=None):
+        self.store = store
+        self.interval = interval or settings.PQ_PRESENCE_FLUSH_SECONDS
+        self._seen = {}
+        self._flusher = None
+
+    async def connected(self, session_code, session_id, user_id):
+        self._touch(session_id, user_id)
+        return await sync_to_async(self.store.connect, thread_sensitive=False)(session_code, user_id)
+
+    async def heartbeat(self, session_code, session_id, user_id):
+        self._touch(session_id, user_id)
+        await sync_to_async(self.store.heartbeat, thread_sensitive=False)(session_code, user_id)
+
+    async def disconnected(self, session_code, session_id, user_id):
+        self._touch(session_id, user_id)
+        return await sync_to_async(self.store.disconnect, thread_sensitive=False)(session_code, user_id)
+
+    async def count(self, session_code):
+        return await sync_to_async(self.store.count, thread_sensitive=False)(session_code)
+
+    def _touch(self, session_id, user_id):
+        self._seen.setdefault(session_id, set()).add(user_id)
+        if self._flusher is None or self._flusher.done():
+            # Fresh context for the same reason as StatsBroadcaster's ticker
+            self._flusher = asyncio.get_running_loop().create_task(
+                self._flush_later(), context=contextvars.Context()
+            )
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            pass  # loop shutting down: write what we have
+        await self.flush()
+
+    async def flush(self):
+        seen, self._seen = self._seen, {}
+        if not seen:
+            return
+        try:
+            await sync_to_async(flush_last_active)(seen)
+        except Exception:
+            logger.exception("Could not write last_active_at for %s sessions", len(seen))
+
+
+_tracker = None
+
+
+def get_presence() -> PresenceTracker:
+    global _tracker
+    if _tracker is None:
+        if settings.PQ_STATS_BACKEND == "redis":
+            _tracker = PresenceTracker(RedisPresenceStore())
+        else:
+            _tracker = PresenceTracker(InMemoryPresenceStore())
+    return _tracker
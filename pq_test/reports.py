@@ -0,0 +1,200 @@
+# backend/pq_test/reports.py
+"""
+Materialized reports for ended sessions.
+
+When a session ends (see signals.py) the `build_session_report` Celery task
+aggregates everything the result endpoints show into one SessionReport row:
+per-question stats, answer-time histograms, the score distribution,
+participant completion summaries and 8PQ piston profiles. `by_code`,
+`analytics` and `projector_view` then read that row instead of
+re-aggregating the answers on every request.
+
+`rebuild_session_reports` rebuilds reports for historical sessions (or
+after `rescore_sessions`, which also rebuilds the ones it changes).
+"""
+import numpy as np
+from django.utils import timezone
+
+from .archive import session_answer_values
+from .latency import HISTOGRAM_EDGES
+from .models import ParticipantSession, QuizSession, SessionReport
+from .scoring import session_profiles
+from .stats import (
+    compute_session_stats,
+    empty_counters,
+    ended_session_counters,
+    stats_payload,
+)
+
+REPORT_VERSION = 2
+
+SCORE_BUCKETS = 10
+
+
+def _positions(known, values):
+    """
+    Index of each of `values` in the sorted array `known`, and a mask of the
+    ones found (an unknown value would land on a neighbour's index).
+    """
+    if not len(known):
+        return np.zeros(len(values), dtype="i8"), np.zeros(len(values), dtype=bool)
+    position = np.clip(np.searchsorted(known, values), 0, len(known) - 1)
+    return position, known[position] == values
+
+
+def _time_histograms(answers, question_ids):
+    buckets = len(HISTOGRAM_EDGES)
+    bucket = np.searchsorted(HISTOGRAM_EDGES, answers["time"], side="right") - 1
+    bucket = np.clip(bucket, 0, buckets - 1)
+    known = np.array(sorted(question_ids), dtype="i8")
+    # Answers to questions no longer in the quiz are left out
+    position, found = _positions(known, answers["qid"])
+    counts = np.bincount(
+        position[found] * buckets + bucket[found], minlength=len(known) * buckets
+    ).reshape(len(known), buckets)
+    row = {qid: i for i, qid in enumerate(known.tolist())}
+    return {
+        "edges": list(HISTOGRAM_EDGES),
+        "overall": counts.sum(axis=0).tolist() if len(known) else [0] * buckets,
+        "questions": {str(qid): counts[row[qid]].tolist() for qid in question_ids},
+    }
+
+
+def _score_distribution(totals):
+    if not len(totals):
+        return {
+            "participants": 0,
+            "min": 0.0,
+            "max": 0.0,
+            "mean": 0.0,
+            "median": 0.0,
+            "edges": [],
+            "counts": [],
+        }
+    low, high = float(totals.min()), float(totals.max())
+    counts, edges = np.histogram(
+        totals, bins=SCORE_BUCKETS, range=(low, high if high > low else low + 1)
+    )
+    return {
+        "participants": int(len(totals)),
+        "min": round(low, 4),
+        "max": round(high, 4),
+        "mean": round(float(totals.mean()), 4),
+        "median": round(float(np.median(totals)), 4),
+        "edges": [round(float(edge), 4) for edge in edges],
+        "counts": counts.tolist(),
+    }
+
+
+def build_report(session) -> dict:
+    """
+    Aggregate a session's answers into the report payload (a few queries,
+    answers streamed once).
+    """
+    question_ids = list(session.quiz.questions.values_list("id", flat=True))
+    counters = ended_session_counters(session.id, question_ids)
+
+    rows = session_answer_values(
+        session.id, ("participant_id", "question_id", "time_taken_seconds", "score")
+    )
+    answers = np.fromiter(
+        rows,
+        dtype=[("pid", "i8"), ("qid", "i8"), ("time", "f8"), ("score", "f8")],
+    )
+
+    participants = list(
+        ParticipantSession.objects.filter(session_id=session.id)
+        .order_by("id")
+        .values_list("id", "completed", "completed_reason")
+    )
+    pids = np.array([pid for pid, _, _ in participants], dtype="i8")
+    # Position of every answer's participant in `pids` (archived answers may
+    # outlive their participant)
+    index, found = _positions(pids, answers["pid"])
+    index, mine = index[found], answers[found]
+    answered = np.bincount(index, minlength=len(pids))
+    totals = np.bincount(index, weights=mine["score"], minlength=len(pids))
+    times = np.bincount(index, weights=mine["time"], minlength=len(pids))
+
+    by_reason = {}
+    summaries = []
+    for i, (pid, completed, reason) in enumerate(participants):
+        if completed:
+            by_reason[reason or "completed"] = by_reason.get(reason or "completed", 0) + 1
+        summaries.append(
+            {
+                "participant_id": pid,
+                "completed": completed,
+                "completed_reason": reason,
+                "answered": int(answered[i]),
+                "score": round(float(totals[i]), 4),
+                "total_time": round(float(times[i]), 3),
+            }
+        )
+
+    return {
+        "version": REPORT_VERSION,
+        "built_at": timezone.now().isoformat(),
+        "question_stats": [stats_payload(qid, counters[qid]) for qid in question_ids],
+        "time_histograms": _time_histograms(answers, question_ids),
+        "score_distribution": _score_distribution(totals),
+        "completion": {
+            "participants": len(participants),
+            "completed": sum(by_reason.values()),
+            "by_reason": by_reason,
+            "questions": len(question_ids),
+            "answered_all": int((answered >= len(question_ids)).sum()) if question_ids else 0,
+            "average_answered": round(float(answered.mean()), 3) if len(participants) else 0.0,
+        },
+        "participants": summaries,
+        "piston_profiles": {
+            str(pid): profile for pid, profile in session_profiles(session).items()
+        },
+    }
+
+
+def build_session_report(session_id):
+    """
+    (Re)build and store the report of one session. Returns the SessionReport,
+    or None if the session is gone.
+    """
+    session = QuizSession.objects.select_related("quiz").filter(pk=session_id).first()
+    if session is None:
+        return None
+    report, _ = SessionReport.objects.update_or_create(
+        session=session, defaults={"data": build_report(session)}
+    )
+    return report
+
+
+def session_report(session):
+    """
+    Report data of an ended session, built on the spot if the task has not
+    stored it yet. None for sessions that have not ended.
+    """
+    if session.status != QuizSession.STATUS_ENDED:
+        return None
+    report = SessionReport.objects.filter(session_id=session.id).only("data").first()
+    if report is None or report.data.get("version") != REPORT_VERSION:
+        report = build_session_report(session.id)
+    return report.data
+
+
+def report_question_stats(report, questions):
+    """
+    Report stats for the given questions, in their order (questions added to
+    the quiz after the session ended have no answers in it).
+    """
+    by_id = {stats["question_id"]: stats for stats in report["question_stats"]}
+    return [by_id.get(q.id) or stats_payload(q.id, empty_counters()) for q in questions]
+
+
+def session_question_stats(session, questions, report=None):
+    """
+    Stats for the given questions: from the report once the session has
+    ended, live otherwise.
+    """
+    report = report or session_report(session)
+    if report is None:
+        return compute_session_stats(session, questions)
+    return report_question_stats(report, questions)
@@ -2,6 +2,8 @@
 from django.urls import re_path
 
 from .consumers import QuizSessionConsumer
+from .jwt_middleware import JWTAuthMiddlewareStack
+from .sse import SessionEventStreamConsumer
 
 websocket_urlpatterns = [
     re_path(
@@ -9,3 +11,11 @@ websocket_urlpatterns = [
         QuizSessionConsumer.as_asgi(),
     ),
 ]
+
+# Long-lived HTTP endpoints served before Django (see config.asgi)
+http_urlpatterns = [
+    re_path(
+        r"^api/pq/sessions/(?P<session_code>[\w-]+)/events/$",
+        JWTAuthMiddlewareStack(SessionEventStreamConsumer.as_asgi()),
+    ),
+]
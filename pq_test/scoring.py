@@ -0,0 +1,185 @@
+# backend/pq_test/scoring.py
+"""
+8PQ scoring with `Question.weights`.
+
+A question's weights map each option to piston weights, either by name or
+as a list in PISTONS order:
+
+    {"A": {"health": 2, "wealth": 1}, "B": {"intellect": 3}, "C": [0, 0, 1, 0, 0, 0, 0, 0]}
+
+Picking an option adds its weights to the participant's piston profile and
+scores the sum of those weights. Questions without weights keep the plain
+`correct_option` scoring (1 for the right option, 0 otherwise).
+
+For whole sessions a quiz is compiled into a (questions x options x pistons)
+matrix and all answers are scored with one matrix product.
+"""
+import numpy as np
+
+from .archive import session_answer_values
+from .models import Question
+
+OPTIONS = ("A", "B", "C", "D")
+PISTONS = (
+    "health",
+    "wealth",
+    "intellect",
+    "family",
+    "travel",
+    "philosophy",
+    "self_mastery",
+    "philanthropy",
+)
+_PISTON_INDEX = {name: i for i, name in enumerate(PISTONS)}
+_OPTION_INDEX = {name: i for i, name in enumerate(OPTIONS)}
+
+# Column used for "no answer" in answer matrices; scores and weighs nothing.
+UNANSWERED = len(OPTIONS)
+
+
+def option_weights(weights, option) -> list:
+    """
+    Piston weights of one option as a list in PISTONS order.
+    """
+    vector = [0.0] * len(PISTONS)
+    value = (weights or {}).get(option) if isinstance(weights, dict) else None
+    if isinstance(value, dict):
+        for name, weight in value.items():
+            index = _PISTON_INDEX.get(str(name).lower())
+            if index is not None:
+                vector[index] = float(weight or 0)
+    elif isinstance(value, (list, tuple)):
+        for index, weight in enumerate(value[: len(PISTONS)]):
+            vector[index] = float(weight or 0)
+    return vector
+
+
+def has_weights(weights) -> bool:
+    return isinstance(weights, dict) and any(option in weights for option in OPTIONS)
+
+
+def score_answer(question, selected_option) -> float:
+    """
+    Score of one answer (the hot path; no NumPy needed for a single row).
+    """
+    if has_weights(question.weights):
+        return float(sum(option_weights(question.weights, selected_option)))
+    if question.correct_option and selected_option == question.correct_option:
+        return 1.0
+    return 0.0
+
+
+class QuizWeights:
+    """
+    A quiz compiled for vectorized scoring.
+
+    `weights` has shape (questions, options + 1, pistons); the extra option
+    row is the all-zero "unanswered" slot. `option_scores` has shape
+    (questions, options + 1) and holds the score of every possible answer.
+    """
+
+    def __init__(self, question_ids, weights, option_scores):
+        self.question_ids = list(question_ids)
+        self.index = {qid: i for i, qid in enumerate(self.question_ids)}
+        self.weights = weights
+        self.option_scores = option_scores
+
+    @classmethod
+    def compile(cls, questions):
+        questions = list(questions)
+        weights = np.zeros((len(questions), len(OPTIONS) + 1, len(PISTONS)), dtype=np.float64)
+        option_scores = np.zeros((len(questions), len(OPTIONS) + 1), dtype=np.float64)
+        for row, question in enumerate(questions):
+            if has_weights(question.weights):
+                for col, option in enumerate(OPTIONS):
+                    weights[row, col] = option_weights(question.weights, option)
+                option_scores[row, : len(OPTIONS)] = weights[row, : len(OPTIONS)].sum(axis=1)
+            elif question.correct_option in _OPTION_INDEX:
+                option_scores[row, _OPTION_INDEX[question.correct_option]] = 1.0
+        return cls([q.id for q in questions], weights, option_scores)
+
+    @classmethod
+    def for_quiz(cls, quiz_id):
+        return cls.compile(
+            Question.objects.filter(quiz_id=quiz_id)
+            .order_by("order", "id")
+            .only("id", "correct_option", "weights")
+        )
+
+    @property
+    def is_weighted(self) -> bool:
+        return bool(self.weights.any())
+
+    def answer_matrix(self, rows):
+        """
+        Build a (participants x questions) matrix of option columns from
+        (participant_id, question_id, selected_option) rows; unanswered cells
+        hold UNANSWERED. Rows for unknown questions or options are ignored.
+        Returns (participant_ids, matrix).
+        """
+        participant_ids = []
+        participant_index = {}
+        cells = []
+        for participant_id, question_id, option in rows:
+            q = self.index.get(question_id)
+            o = _OPTION_INDEX.get(option)
+            if q is None or o is None:
+                continue
+            p = participant_index.get(participant_id)
+            if p is None:
+                p = participant_index[participant_id] = len(participant_ids)
+                participant_ids.append(participant_id)
+            cells.append((p, q, o))
+
+        matrix = np.full((len(participant_ids), len(self.question_ids)), UNANSWERED, dtype=np.int8)
+        if cells:
+            p, q, o = np.array(cells, dtype=np.int64).T
+            matrix[p, q] = o
+        return participant_ids, matrix
+
+    def scores(self, matrix):
+        """
+        Per-answer scores, shape (participants x questions).
+        """
+        return self.option_scores[np.arange(matrix.shape[1])[None, :], matrix]
+
+    def profiles(self, matrix):
+        """
+        Piston profiles, shape (participants x pistons): one-hot answers
+        (participants x questions*options) times weights (questions*options x pistons).
+        """
+        n, q = matrix.shape
+        width = len(OPTIONS) + 1
+        onehot = np.zeros((n, q * width), dtype=np.float64)
+        onehot[np.arange(n)[:, None], np.arange(q)[None, :] * width + matrix] = 1.0
+        return onehot @ self.weights.reshape(q * width, len(PISTONS))
+
+    def rescore(self, question_ids, options):
+        """
+        Scores for parallel sequences of answered question ids and options
+        (None where the question is not part of the quiz).
+        """
+        q = np.array([self.index.get(qid, -1) for qid in question_ids], dtype=np.intp)
+        o = np.array([_OPTION_INDEX.get(option, UNANSWERED) for option in options], dtype=np.intp)
+        scores = self.option_scores[q, o]
+        return [None if qi < 0 else float(score) for qi, score in zip(q, scores)]
+
+
+def session_answer_rows(session_id):
+    return session_answer_values(session_id, ("participant_id", "question_id", "selected_option"))
+
+
+def session_profiles(session) -> dict:
+    """
+    {participant_id: {piston: total weight}} for a session, or {} when its
+    quiz has no weighted questions.
+    """
+    compiled = QuizWeights.for_quiz(session.quiz_id)
+    if not compiled.is_weighted:
+        return {}
+    participant_ids, matrix = compiled.answer_matrix(session_answer_rows(session.id))
+    profiles = compiled.profiles(matrix)
+    return {
+        pid: dict(zip(PISTONS, profiles[i].round(4).tolist()))
+        for i, pid in enumerate(participant_ids)
+    }
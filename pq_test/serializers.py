@@ -3,6 +3,7 @@ from rest_framework import serializers
 
 from .models import (
     Classroom,
+    DeletionJob,
     Quiz,
     Question,
     QuizSession,
@@ -62,6 +63,7 @@ class QuestionSerializer(serializers.ModelSerializer):
 class QuizSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.id")
     owner_username = serializers.SerializerMethodField()
+    question_count = serializers.SerializerMethodField()
     questions = QuestionSerializer(many=True, read_only=True)
 
     class Meta:
@@ -80,6 +82,7 @@ class QuizSerializer(serializers.ModelSerializer):
             "total_time_limit_seconds",
             "created_at",
             "updated_at",
+            "question_count",
             "questions",
         ]
         read_only_fields = [
@@ -93,6 +96,23 @@ class QuizSerializer(serializers.ModelSerializer):
     def get_owner_username(self, obj):
         return _display_username(obj.owner)
 
+    def get_question_count(self, obj):
+        # Annotated by QuizViewSet.get_queryset
+        if hasattr(obj, "question_count"):
+            return obj.question_count
+        return obj.questions.count()
+
+
+class QuizSummarySerializer(QuizSerializer):
+    """
+    Quiz without its questions (listings); `question_count` says how many.
+    """
+
+    questions = None
+
+    class Meta(QuizSerializer.Meta):
+        fields = [f for f in QuizSerializer.Meta.fields if f != "questions"]
+
 
 class QuizSessionSerializer(serializers.ModelSerializer):
     host = serializers.ReadOnlyField(source="host.id")
@@ -120,6 +140,8 @@ class QuizSessionSerializer(serializers.ModelSerializer):
             "is_public",
             "join_password",
             "current_question",
+            "current_question_started_at",
+            "current_question_expires_at",
             "total_time_limit_seconds",
             "total_time_expires_at",
             "created_at",
@@ -133,6 +155,8 @@ class QuizSessionSerializer(serializers.ModelSerializer):
             "host",
             "session_code",
             "status",
+            "current_question_started_at",
+            "current_question_expires_at",
             "total_time_limit_seconds",
             "total_time_expires_at",
             "created_at",
@@ -150,7 +174,9 @@ class QuizSessionSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if not request or not request.user.is_authenticated:
             return False
-        # Use prefetched relation if available
+        # Annotated by QuizSessionViewSet.get_queryset (an Exists subquery)
+        if hasattr(obj, "user_is_participant"):
+            return obj.user_is_participant
         return obj.participants.filter(user=request.user).exists()
 
     def get_host_username(self, obj):
@@ -175,6 +201,7 @@ class ParticipantSessionSerializer(serializers.ModelSerializer):
             "completed",
             "completed_reason",
             "not_done_questions",
+            "answered_count",
         ]
         read_only_fields = [
             "id",
@@ -186,6 +213,7 @@ class ParticipantSessionSerializer(serializers.ModelSerializer):
             "completed",
             "completed_reason",
             "not_done_questions",
+            "answered_count",
         ]
 
     def get_display_name(self, obj):
@@ -248,6 +276,31 @@ class AggregatedStatsSerializer(serializers.Serializer):
     option_b_pct = serializers.FloatField()
     option_c_pct = serializers.FloatField()
     option_d_pct = serializers.FloatField()
+    p50_time = serializers.FloatField()
+    p90_time = serializers.FloatField()
+    p99_time = serializers.FloatField()
+    # Counts per pq_test.latency.HISTOGRAM_EDGES bucket
+    time_histogram = serializers.ListField(child=serializers.IntegerField())
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeletionJob
+        fields = [
+            "id",
+            "kind",
+            "object_id",
+            "label",
+            "status",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+
 def _display_username(user):
     """
     Return a safe username for display; if the stored username looks like an email,
@@ -0,0 +1,159 @@
+# backend/pq_test/signals.py
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import access
+from .bundles import invalidate_question_bundle
+from .jwt_middleware import forget_user
+from .models import Classroom, Question, Quiz, QuizSession
+from .snapshot import invalidate_quiz_snapshots, invalidate_session_snapshot
+from .tasks import build_session_report
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=QuizSession)
+@receiver(post_delete, sender=QuizSession)
+def invalidate_snapshot_on_session_change(sender, instance, **kwargs):
+    """
+    start/pause/resume/end, current question and timer changes all save the
+    session, so any save drops its cached snapshot.
+    """
+    code = instance.session_code
+    transaction.on_commit(lambda: invalidate_session_snapshot(code))
+
+
+@receiver(post_save, sender=QuizSession)
+def build_report_on_session_end(sender, instance, update_fields=None, **kwargs):
+    # QuizSession.end() saves status + ended_at; ended sessions don't change
+    if instance.status != QuizSession.STATUS_ENDED:
+        return
+    if not update_fields or "status" not in update_fields:
+        return
+    session_id = instance.pk
+
+    def enqueue():
+        try:
+            build_session_report.delay(session_id)
+        except Exception:
+            # The first read builds it instead (reports.session_report)
+            logger.exception("Could not queue the report of session %s", session_id)
+
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_snapshots_on_question_change(sender, instance, **kwargs):
+    quiz_id = instance.quiz_id
+    transaction.on_commit(lambda: invalidate_quiz_snapshots(quiz_id))
+    transaction.on_commit(lambda: invalidate_question_bundle(quiz_id))
+
+
+@receiver(post_save, sender=Quiz)
+def invalidate_snapshots_on_quiz_change(sender, instance, created, **kwargs):
+    # default_time_limit_seconds feeds every question's effective time limit
+    if created:
+        return
+    quiz_id = instance.pk
+    transaction.on_commit(lambda: invalidate_quiz_snapshots(quiz_id))
+    transaction.on_commit(lambda: invalidate_question_bundle(quiz_id))
+
+
+def _touches(update_fields, *names):
+    return update_fields is None or bool(set(update_fields) & set(names))
+
+
+@receiver(post_save, sender=Quiz)
+def sync_access_on_quiz_save(sender, instance, created, update_fields=None, **kwargs):
+    if created or _touches(update_fields, "owner", "classroom"):
+        access.sync_quiz_access([instance.pk])
+
+
+@receiver(post_save, sender=Classroom)
+def sync_access_on_classroom_save(sender, instance, created, update_fields=None, **kwargs):
+    # A new classroom has no quizzes yet; otherwise the owner may have changed
+    if not created and _touches(update_fields, "owner"):
+        access.sync_quiz_access(instance.quizzes.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Classroom)
+def remember_classroom_quizzes(sender, instance, **kwargs):
+    # Quiz.classroom is SET_NULL by a plain UPDATE (no Quiz signals)
+    instance._access_quiz_ids = list(instance.quizzes.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Classroom)
+def sync_access_on_classroom_delete(sender, instance, **kwargs):
+    access.sync_quiz_access(getattr(instance, "_access_quiz_ids", []))
+
+
+@receiver(m2m_changed, sender=Classroom.members.through)
+def sync_access_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse: instance is the user and pk_set holds classroom ids
+    if action == "post_add" and pk_set:
+        if reverse:
+            access.grant_classroom_members(pk_set, [instance.pk])
+        else:
+            access.grant_classroom_members([instance.pk], pk_set)
+    elif action == "post_remove" and pk_set:
+        if reverse:
+            access.revoke_classroom_members(pk_set, [instance.pk])
+        else:
+            access.revoke_classroom_members([instance.pk], pk_set)
+    elif action == "pre_clear" and reverse:
+        instance._access_classroom_ids = list(
+            instance.joined_classrooms.values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        if reverse:
+            access.revoke_classroom_members(
+                getattr(instance, "_access_classroom_ids", []), [instance.pk]
+            )
+        else:
+            access.revoke_classroom_members([instance.pk])
+
+
+@receiver(pre_save, sender=QuizSession)
+def remember_session_host(sender, instance, update_fields=None, **kwargs):
+    # Control actions save other fields only; skip the lookup for them
+    if instance._state.adding or not _touches(update_fields, "host", "quiz"):
+        return
+    instance._access_previous = (
+        QuizSession.objects.filter(pk=instance.pk).values_list("host_id", "quiz_id").first()
+    )
+
+
+@receiver(post_save, sender=QuizSession)
+def sync_access_on_session_save(sender, instance, created, **kwargs):
+    if created:
+        if instance.host_id is not None:
+            access.grant_host(instance.host_id, instance.quiz_id)
+        return
+    previous = getattr(instance, "_access_previous", None)
+    instance._access_previous = None
+    if previous and previous != (instance.host_id, instance.quiz_id):
+        access.sync_quiz_access({previous[1], instance.quiz_id})
+
+
+@receiver(post_delete, sender=QuizSession)
+def revoke_access_on_session_delete(sender, instance, **kwargs):
+    if instance.host_id is not None:
+        access.revoke_host(instance.host_id, instance.quiz_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_ws_principal_on_user_change(sender, instance, **kwargs):
+    # is_active / is_staff changes apply to new sockets right away
+    forget_user(instance.pk)
@@ -0,0 +1,266 @@
+# backend/pq_test/snapshot.py
+"""
+Per-session_code snapshot used by the answer hot path.
+
+Holds everything submit_answer needs to validate and score an answer
+(session status, time limits, question ids, correct options, weights) so a
+cached submission only has to write the answer itself. Snapshots are
+invalidated by signals whenever the session, its quiz or a question changes
+(start/pause/resume/end, current question, question edits). The memory
+backend only sees invalidations of its own process, so its snapshots also
+expire after PQ_SNAPSHOT_LOCAL_TTL_SECONDS.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ParticipantSession, Question, QuizSession
+
+
+class SessionSnapshot:
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def build(cls, session_code):
+        session = QuizSession.objects.select_related("quiz").get(
+            session_code=session_code
+        )
+        quiz = session.quiz
+        questions = {}
+        for q in quiz.questions.all():
+            questions[str(q.id)] = {
+                "text": q.text,
+                "correct_option": q.correct_option,
+                "weights": q.weights,
+                "time_limit_seconds": q.time_limit_seconds,
+                "time_limit": q.time_limit_seconds or quiz.default_time_limit_seconds,
+                "order": q.order,
+                "active": q.active,
+            }
+        expires_at = session.total_time_expires_at
+        return cls(
+            {
+                "session_id": session.id,
+                "session_code": session.session_code,
+                "quiz_id": session.quiz_id,
+                "host_id": session.host_id,
+                "status": session.status,
+                "mode": session.mode,
+                "current_question_id": session.current_question_id,
+                "total_time_expires_at": expires_at.isoformat() if expires_at else None,
+                "question_ids": list(map(int, questions)),
+                "questions": questions,
+            }
+        )
+
+    @property
+    def session_id(self):
+        return self.data["session_id"]
+
+    @property
+    def session_code(self):
+        return self.data["session_code"]
+
+    @property
+    def quiz_id(self):
+        return self.data["quiz_id"]
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    @property
+    def current_question_id(self):
+        return self.data["current_question_id"]
+
+    @property
+    def question_ids(self):
+        return self.data["question_ids"]
+
+    @property
+    def total_time_expires_at(self):
+        value = self.data["total_time_expires_at"]
+        return parse_datetime(value) if value else None
+
+    def is_expired(self, now=None):
+        expires_at = self.total_time_expires_at
+        return bool(expires_at and (now or timezone.now()) > expires_at)
+
+    def question(self, question_id):
+        """
+        In-memory Question built from the snapshot (no DB access), or None
+        if the question is not part of this session's quiz.
+        """
+        data = self.data["questions"].get(str(question_id))
+        if data is None:
+            return None
+        return Question(
+            id=int(question_id),
+            quiz_id=self.quiz_id,
+            text=data["text"],
+            correct_option=data["correct_option"],
+            weights=data["weights"],
+            time_limit_seconds=data["time_limit_seconds"],
+            order=data["order"],
+            active=data["active"],
+        )
+
+
+class InMemorySnapshotStore:
+    """
+    Per-process store. Invalidation only reaches this process, so snapshots
+    expire after `ttl` (PQ_SNAPSHOT_LOCAL_TTL_SECONDS) to bound how long
+    other workers serve one that changed; participant ids never change and
+    keep the longer PQ_SNAPSHOT_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl=None, participant_ttl=None):
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._participants = {}
+        self.ttl = ttl or settings.PQ_SNAPSHOT_LOCAL_TTL_SECONDS
+        self.participant_ttl = participant_ttl or settings.PQ_SNAPSHOT_TTL_SECONDS
+
+    def get(self, session_code):
+        entry = self._snapshots.get(session_code)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, session_code, data):
+        self._snapshots[session_code] = (data, time.monotonic() + self.ttl)
+
+    def get_participant(self, session_code, user_id):
+        entry = self._participants.get(session_code)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0].get(user_id)
+
+    def set_participant(self, session_code, user_id, participant_id):
+        expires = time.monotonic() + self.participant_ttl
+        with self._lock:
+            entry = self._participants.get(session_code)
+            if entry is None or entry[1] <= time.monotonic():
+                entry = ({}, expires)
+            # Refreshed on write, like the Redis hash
+            self._participants[session_code] = (entry[0], expires)
+            entry[0][user_id] = participant_id
+
+    def delete(self, session_code):
+        with self._lock:
+            self._snapshots.pop(session_code, None)
+            self._participants.pop(session_code, None)
+
+
+class RedisSnapshotStore:
+    def __init__(self, client=None, ttl=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.ttl = ttl or settings.PQ_SNAPSHOT_TTL_SECONDS
+
+    def get(self, session_code):
+        raw = self.client.get(f"pq:snapshot:{session_code}")
+        return json.loads(raw) if raw else None
+
+    def set(self, session_code, data):
+        self.client.set(f"pq:snapshot:{session_code}", json.dumps(data), ex=self.ttl)
+
+    def get_participant(self, session_code, user_id):
+        value = self.client.hget(f"pq:participants:{session_code}", user_id)
+        return int(value) if value else None
+
+    def set_participant(self, session_code, user_id, participant_id):
+        key = f"pq:participants:{session_code}"
+        pipe = self.client.pipeline()
+        pipe.hset(key, user_id, participant_id)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete(self, session_code):
+        self.client.delete(
+            f"pq:snapshot:{session_code}", f"pq:participants:{session_code}"
+        )
+
+
+class SnapshotCache:
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_code) -> SessionSnapshot:
+        """
+        Raises QuizSession.DoesNotExist for unknown codes.
+        """
+        data = self.store.get(session_code)
+        if data is not None:
+            self.hits += 1
+            return SessionSnapshot(data)
+        self.misses += 1
+        snapshot = SessionSnapshot.build(session_code)
+        self.store.set(session_code, snapshot.data)
+        return snapshot
+
+    def participant_id(self, snapshot, user_id):
+        """
+        Id of the user's ParticipantSession, creating it on first use.
+        """
+        participant_id = self.store.get_participant(snapshot.session_code, user_id)
+        if participant_id is not None:
+            self.hits += 1
+            return participant_id
+        self.misses += 1
+        participant, _ = ParticipantSession.objects.get_or_create(
+            session_id=snapshot.session_id,
+            user_id=user_id,
+            defaults={},
+        )
+        self.store.set_participant(snapshot.session_code, user_id, participant.pk)
+        return participant.pk
+
+    def invalidate(self, session_code):
+        self.store.delete(session_code)
+
+    def counters(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if settings.PQ_STATS_BACKEND == "redis":
+                    _cache = SnapshotCache(RedisSnapshotStore())
+                else:
+                    _cache = SnapshotCache(InMemorySnapshotStore())
+    return _cache
+
+
+def invalidate_session_snapshot(session_code):
+    get_snapshot_cache().invalidate(session_code)
+
+
+def invalidate_quiz_snapshots(quiz_id):
+    codes = QuizSession.objects.filter(quiz_id=quiz_id).values_list(
+        "session_code", flat=True
+    )
+    for code in codes:
+        invalidate_session_snapshot(code)
@@ -0,0 +1,224 @@
+# backend/pq_test/sse.py
+"""
+Server-Sent Events stream of a session, for networks that block WebSockets.
+
+GET /api/pq/sessions/<session_code>/events/ (served by the ASGI router, see
+routing.http_urlpatterns; authenticated like the websocket, e.g. ?token=)
+answers with `text/event-stream`. The stream joins the channel group a
+QuizSessionConsumer socket of the same user would join (the host group or a
+participant shard), so `publish_event` reaches it with no extra work, and
+each event is the JSON frame publish_event already encoded:
+
+    id: <seq>
+    event: <event>
+    data: {"event": ..., "data": ..., "seq": ...}
+
+Only STREAM_EVENTS are forwarded. A new stream starts with a `resync` event
+(the current state, with the session's seq as id). EventSource reconnects
+with a Last-Event-ID header (`?last_event_id=` works on the first request)
+and gets the events it missed from the event log, or a `resync` when they
+have been evicted. The stream ends after `session_ended`; requests for an
+ended session get 204, which stops EventSource from reconnecting.
+
+The route bypasses Django's middleware, so CORS is applied here with
+django-cors-headers' own logic and settings (`cors_headers`), including
+OPTIONS preflights: the frontend and API are on different origins.
+
+An idle stream is one consumer waiting on the channel layer plus a comment
+line every PQ_SSE_KEEPALIVE_SECONDS, so one ASGI process holds thousands.
+Streams are read-only and do not count towards presence.
+"""
+import asyncio
+import io
+import json
+import urllib.parse
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.exceptions import StopConsumer
+from channels.generic.http import AsyncHttpConsumer
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+
+from .consumers import resync_state
+from .events import get_event_log, host_group_name, participant_group_name
+from .models import QuizSession
+from .snapshot import get_snapshot_cache
+from .wire import JSON, encode
+
+STREAM_EVENTS = (
+    "current_question_changed",
+    "stats_update",
+    "leaderboard_update",
+    "session_results",
+    "session_ended",
+)
+
+# Reconnect delay suggested to EventSource
+RETRY_MS = 3000
+
+
+_cors = CorsMiddleware(lambda request: None)
+
+
+def cors_headers(scope) -> list:
+    """
+    The CORS headers CorsMiddleware would add to a response to this request
+    (ASGI header pairs); empty for origins it does not allow.
+    """
+    request = ASGIRequest(scope, io.BytesIO())
+    response = _cors.check_preflight(request) or HttpResponse()
+    _cors.add_response_headers(request, response)
+    return [
+        (name.encode(), value.encode())
+        for name, value in response.items()
+        if name.lower().startswith("access-control-") or name.lower() == "vary"
+    ]
+
+
+def sse_message(event, frame, seq=None) -> bytes:
+    """
+    One SSE message carrying a JSON frame (str without newlines).
+    """
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {frame}\n\n".encode()
+
+
+class SessionEventStreamConsumer(AsyncHttpConsumer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.group_name = None
+        self.keepalive = None
+        self.resumed_seq = 0
+        self.cors = []
+
+    async def http_request(self, message):
+        # Unlike AsyncHttpConsumer, stay open after handle() while streaming
+        if "body" in message:
+            self.body.append(message["body"])
+        if message.get("more_body"):
+            return
+        await self.handle(b"".join(self.body))
+        if self.group_name is None:
+            await self.disconnect()
+            raise StopConsumer()
+
+    async def handle(self, body):
+        self.session_code = self.scope["url_route"]["kwargs"]["session_code"]
+        self.cors = cors_headers(self.scope)
+        if self.scope["method"] == "OPTIONS":
+            await self.send_response(200, b"", headers=self.cors)
+            return
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self._send_error(401, "Authentication credentials were not provided.")
+            return
+        snapshot = await self._get_snapshot()
+        if snapshot is None:
+            await self._send_error(404, "Not found.")
+            return
+        if snapshot.status == QuizSession.STATUS_ENDED:
+            await self.send_response(204, b"", headers=self.cors)
+            return
+
+        self.is_host = snapshot.data["host_id"] == user.id
+        if self.is_host:
+            self.group_name = host_group_name(self.session_code)
+        else:
+            self.group_name = participant_group_name(self.session_code, self.channel_name)
+        # Join before reading the log so nothing published meanwhile is lost
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.send_headers(
+            headers=[
+                (b"Content-Type", b"text/event-stream"),
+                (b"Cache-Control", b"no-cache"),
+                # Don't let nginx buffer the stream
+                (b"X-Accel-Buffering", b"no"),
+                *self.cors,
+            ]
+        )
+        await self.send_body(f"retry: {RETRY_MS}\n\n".encode(), more_body=True)
+        self.keepalive = asyncio.ensure_future(self._keepalive())
+        await self._catch_up(self._last_event_id())
+
+    async def disconnect(self):
+        if self.keepalive is not None:
+            self.keepalive.cancel()
+            self.keepalive = None
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            self.group_name = None
+
+    async def broadcast_event(self, event):
+        seq = event.get("seq")
+        if event["event"] not in STREAM_EVENTS:
+            return
+        if seq is not None and seq <= self.resumed_seq:
+            return
+        frames = event.get("frames")
+        if frames is None:
+            frame = encode(JSON, event["event"], event.get("data", {}), seq)
+        else:
+            frame = frames[JSON]
+        await self._send_event(event["event"], frame, seq)
+
+    async def _catch_up(self, last_seq):
+        missed = None
+        if last_seq is not None:
+            missed = await sync_to_async(get_event_log().since, thread_sensitive=False)(
+                self.session_code, last_seq
+            )
+        if missed is None:
+            state = await database_sync_to_async(resync_state)(self.session_code)
+            self.resumed_seq = state["seq"]
+            await self._send_event("resync", encode(JSON, "resync", state, state["seq"]), state["seq"])
+            return
+
+        # Group messages queued meanwhile may repeat the replayed events
+        self.resumed_seq = missed[-1]["seq"] if missed else last_seq
+        for event in missed:
+            if event["event"] not in STREAM_EVENTS:
+                continue
+            if event.get("hosts_only") and not self.is_host:
+                continue
+            frame = encode(JSON, event["event"], event["data"], event["seq"])
+            await self._send_event(event["event"], frame, event["seq"])
+
+    async def _send_event(self, event, frame, seq):
+        await self.send_body(sse_message(event, frame, seq), more_body=True)
+        if event == "session_ended":
+            await self.send_body(b"")
+            await self.disconnect()
+            raise StopConsumer()
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(settings.PQ_SSE_KEEPALIVE_SECONDS)
+            await self.send_body(b": keepalive\n\n", more_body=True)
+
+    async def _send_error(self, status, detail):
+        await self.send_response(
+            status,
+            json.dumps({"detail": detail}).encode(),
+            headers=[(b"Content-Type", b"application/json"), *self.cors],
+        )
+
+    def _last_event_id(self):
+        headers = dict(self.scope.get("headers", []))
+        value = headers.get(b"last-event-id", b"").decode()
+        if not value:
+            query = urllib.parse.parse_qs(self.scope.get("query_string", b"").decode())
+            value = query.get("last_event_id", [""])[0]
+        try:
+            return int(value) if int(value) >= 0 else None
+        except ValueError:
+            return None
+
+    @database_sync_to_async
+    def _get_snapshot(self):
+        try:
+            return get_snapshot_cache().get(self.session_code)
+        except QuizSession.DoesNotExist:
+            return None
@@ -0,0 +1,519 @@
+# backend/pq_test/stats.py
+"""
+Per-question answer counters for live sessions.
+
+Counters are kept per (session, question) and updated on every answer, so
+reading stats is O(1) instead of re-aggregating every AnswerRecord. When the
+counters are cold (process restart, TTL expiry, invalidation) they are rebuilt
+from SQL once and then kept warm by `record_answer`.
+
+Besides the option counts and the time sum, the counters hold an answer-time
+sketch (pq_test.latency bucket counts) for the p50/p90/p99 times and the
+time histogram in `stats_payload`.
+
+A rebuild reads SQL and then primes the store, and an answer committed in
+between would be lost (applied while cold) or counted twice (in the SQL and
+applied after the prime). So writers bracket every answer: `begin_answers`
+before the DB write marks it in flight, and `record_answer` (or
+`abort_answers` on failure) ends it and bumps the question's generation;
+invalidation bumps it too. A rebuild reads the generation before its query
+and only primes when it is unchanged and nothing is in flight, i.e. every
+answer was applied before the query saw it or starts after the prime.
+Otherwise the rebuilt counters are served but not stored, and the next read
+retries. In-flight marks lapse after WRITE_TIMEOUT seconds, so a worker that
+died mid-write cannot block rebuilds for good.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+
+from .archive import archived_values
+from .latency import BUCKET_FIELDS, PERCENTILES, bucket_field, bucket_ranges, histogram, percentile
+from .models import AnswerRecord
+
+OPTIONS = ("A", "B", "C", "D")
+COUNTER_FIELDS = OPTIONS + ("total", "time_sum") + BUCKET_FIELDS
+
+# Seconds before an answer that never ended its write stops blocking rebuilds
+WRITE_TIMEOUT = 60
+
+
+def empty_counters() -> dict:
+    counters = {field: 0 for field in OPTIONS + ("total",) + BUCKET_FIELDS}
+    counters["time_sum"] = 0.0
+    return counters
+
+
+class InMemoryStatsStore:
+    """
+    Process-local store. Only correct when a single process serves a session
+    (local dev / InMemoryChannelLayer); use the Redis store otherwise.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        # Rebuild guard: session_id -> invalidation epoch, and
+        # (session_id, question_id) -> [generation, in flight, deadline]
+        self._epochs = {}
+        self._writes = {}
+
+    def get(self, session_id, question_id):
+        with self._lock:
+            counters = self._sessions.get(session_id, {}).get(question_id)
+            return dict(counters) if counters is not None else None
+
+    def get_many(self, session_id, question_ids):
+        with self._lock:
+            questions = self._sessions.get(session_id, {})
+            return {
+                qid: dict(questions[qid]) if qid in questions else None
+                for qid in question_ids
+            }
+
+    def generation(self, session_id, question_ids):
+        with self._lock:
+            epoch = self._epochs.get(session_id, 0)
+            return {
+                qid: (epoch, self._writes.get((session_id, qid), (0,))[0])
+                for qid in question_ids
+            }
+
+    def prime(self, session_id, question_id, counters, generation):
+        with self._lock:
+            questions = self._sessions.setdefault(session_id, {})
+            if question_id in questions:
+                return False
+            epoch = self._epochs.get(session_id, 0)
+            current, in_flight, deadline = self._writes.get((session_id, question_id), (0, 0, 0.0))
+            if (epoch, current) != tuple(generation):
+                return False
+            if in_flight and deadline > time.monotonic():
+                return False
+            questions[question_id] = dict(counters)
+            return True
+
+    def begin_writes(self, session_id, question_id, count=1):
+        with self._lock:
+            writes = self._writes.setdefault((session_id, question_id), [0, 0, 0.0])
+            writes[1] += count
+            writes[2] = time.monotonic() + WRITE_TIMEOUT
+
+    def end_writes(self, session_id, question_id, count=1):
+        with self._lock:
+            self._end_writes(session_id, question_id, count)
+
+    def _end_writes(self, session_id, question_id, count):
+        writes = self._writes.setdefault((session_id, question_id), [0, 0, 0.0])
+        writes[0] += 1
+        writes[1] = max(writes[1] - count, 0)
+
+    def record_answer(self, session_id, question_id, option, time_taken, previous=None):
+        with self._lock:
+            self._end_writes(session_id, question_id, 1)
+            counters = self._sessions.get(session_id, {}).get(question_id)
+            if counters is None:
+                # Cold: the next read rebuilds from SQL, which includes this answer.
+                return False
+            _apply_answer(counters, option, time_taken, previous)
+            return True
+
+    def invalidate(self, session_id, question_id=None):
+        with self._lock:
+            if question_id is None:
+                self._sessions.pop(session_id, None)
+                self._epochs[session_id] = self._epochs.get(session_id, 0) + 1
+            else:
+                self._sessions.get(session_id, {}).pop(question_id, None)
+                self._writes.setdefault((session_id, question_id), [0, 0, 0.0])[0] += 1
+
+
+# KEYS: counters hash, writes hash (rebuild guard). Ends the answer's write,
+# then increments only when the question's counters are already warm.
+_END_WRITES = """
+redis.call('HINCRBY', KEYS[2], q .. ':gen', 1)
+if redis.call('HINCRBY', KEYS[2], q .. ':inflight', -count) < 0 then
+  redis.call('HSET', KEYS[2], q .. ':inflight', 0)
+end
+redis.call('EXPIRE', KEYS[2], ttl)
+"""
+
+_RECORD_SCRIPT = """
+local q, count, ttl = ARGV[1], 1, ARGV[6]
+""" + _END_WRITES + """
+if redis.call('HEXISTS', KEYS[1], q .. ':total') == 0 then
+  return 0
+end
+if ARGV[4] ~= '' then
+  redis.call('HINCRBY', KEYS[1], q .. ':' .. ARGV[4], -1)
+  redis.call('HINCRBYFLOAT', KEYS[1], q .. ':time_sum', ARGV[5])
+  redis.call('HINCRBY', KEYS[1], q .. ':' .. ARGV[8], -1)
+else
+  redis.call('HINCRBY', KEYS[1], q .. ':total', 1)
+end
+redis.call('HINCRBY', KEYS[1], q .. ':' .. ARGV[2], 1)
+redis.call('HINCRBYFLOAT', KEYS[1], q .. ':time_sum', ARGV[3])
+redis.call('HINCRBY', KEYS[1], q .. ':' .. ARGV[7], 1)
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return 1
+"""
+
+_END_WRITES_SCRIPT = """
+local q, count, ttl = ARGV[1], tonumber(ARGV[2]), ARGV[3]
+""" + _END_WRITES
+
+# Write rebuilt counters unless another worker already warmed them, or the
+# generation moved or answers are in flight since the rebuild started.
+_PRIME_SCRIPT = """
+local q = ARGV[1]
+if redis.call('HEXISTS', KEYS[1], q .. ':total') == 1 then
+  return 0
+end
+local w = redis.call('HMGET', KEYS[2], 'epoch', q .. ':gen', q .. ':inflight', q .. ':until')
+if tonumber(w[1] or 0) ~= tonumber(ARGV[3]) or tonumber(w[2] or 0) ~= tonumber(ARGV[4]) then
+  return 0
+end
+if tonumber(w[3] or 0) > 0 and tonumber(w[4] or 0) > tonumber(ARGV[5]) then
+  return 0
+end
+for i = 6, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], q .. ':' .. ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class RedisStatsStore:
+    """
+    Shared store: one hash per session (`pq:stats:<session_id>`) with
+    `<question_id>:<field>` entries, updated atomically via Lua scripts.
+    The rebuild guard lives in `pq:stats:<session_id>:writes` (`epoch`,
+    `<question_id>:gen|inflight|until`), which survives invalidation.
+    """
+
+    def __init__(self, client=None, ttl=None):
+        if client is None:
+            from .utils import get_redis
+
+            client = get_redis()
+        self.client = client
+        self.ttl = ttl or settings.PQ_STATS_TTL_SECONDS
+        self._record = client.register_script(_RECORD_SCRIPT)
+        self._end_writes = client.register_script(_END_WRITES_SCRIPT)
+        self._prime = client.register_script(_PRIME_SCRIPT)
+
+    @staticmethod
+    def key(session_id):
+        return f"pq:stats:{session_id}"
+
+    @staticmethod
+    def writes_key(session_id):
+        return f"pq:stats:{session_id}:writes"
+
+    def get(self, session_id, question_id):
+        return self.get_many(session_id, [question_id])[question_id]
+
+    def get_many(self, session_id, question_ids):
+        question_ids = list(question_ids)
+        if not question_ids:
+            return {}
+        values = self.client.hmget(
+            self.key(session_id),
+            [f"{qid}:{f}" for qid in question_ids for f in COUNTER_FIELDS],
+        )
+        width = len(COUNTER_FIELDS)
+        result = {}
+        for i, qid in enumerate(question_ids):
+            result[qid] = _parse_counters(values[i * width:(i + 1) * width])
+        return result
+
+    def generation(self, session_id, question_ids):
+        question_ids = list(question_ids)
+        values = self.client.hmget(
+            self.writes_key(session_id), ["epoch"] + [f"{qid}:gen" for qid in question_ids]
+        )
+        epoch = int(values[0] or 0)
+        return {qid: (epoch, int(value or 0)) for qid, value in zip(question_ids, values[1:])}
+
+    def prime(self, session_id, question_id, counters, generation):
+        epoch, current = generation
+        args = [question_id, self.ttl, epoch, current, time.time()]
+        for field in COUNTER_FIELDS:
+            args.extend([field, counters.get(field, 0)])
+        return bool(
+            self._prime(keys=[self.key(session_id), self.writes_key(session_id)], args=args)
+        )
+
+    def begin_writes(self, session_id, question_id, count=1):
+        key = self.writes_key(session_id)
+        pipe = self.client.pipeline()
+        pipe.hincrby(key, f"{question_id}:inflight", count)
+        pipe.hset(key, f"{question_id}:until", time.time() + WRITE_TIMEOUT)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def end_writes(self, session_id, question_id, count=1):
+        self._end_writes(
+            keys=[self.key(session_id), self.writes_key(session_id)],
+            args=[question_id, count, self.ttl],
+        )
+
+    def record_answer(self, session_id, question_id, option, time_taken, previous=None):
+        prev_option, prev_time = previous or ("", 0.0)
+        prev_bucket = bucket_field(prev_time) if previous else ""
+        return bool(
+            self._record(
+                keys=[self.key(session_id), self.writes_key(session_id)],
+                args=[
+                    question_id,
+                    option,
+                    time_taken,
+                    prev_option,
+                    -prev_time,
+                    self.ttl,
+                    bucket_field(time_taken),
+                    prev_bucket,
+                ],
+            )
+        )
+
+    def invalidate(self, session_id, question_id=None):
+        pipe = self.client.pipeline()
+        if question_id is None:
+            pipe.delete(self.key(session_id))
+            pipe.hincrby(self.writes_key(session_id), "epoch", 1)
+        else:
+            pipe.hdel(self.key(session_id), *[f"{question_id}:{f}" for f in COUNTER_FIELDS])
+            pipe.hincrby(self.writes_key(session_id), f"{question_id}:gen", 1)
+        pipe.expire(self.writes_key(session_id), self.ttl)
+        pipe.execute()
+
+
+def _parse_counters(values):
+    if values[COUNTER_FIELDS.index("total")] is None:
+        return None
+    counters = empty_counters()
+    for field, value in zip(COUNTER_FIELDS, values):
+        if value is not None:
+            counters[field] = float(value) if field == "time_sum" else int(value)
+    return counters
+
+
+def _apply_answer(counters, option, time_taken, previous=None):
+    if previous:
+        prev_option, prev_time = previous
+        counters[prev_option] -= 1
+        counters["time_sum"] -= prev_time
+        counters[bucket_field(prev_time)] -= 1
+    else:
+        counters["total"] += 1
+    counters[option] += 1
+    counters["time_sum"] += time_taken
+    counters[bucket_field(time_taken)] += 1
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_stats_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.PQ_STATS_BACKEND == "redis":
+                    _store = RedisStatsStore()
+                else:
+                    _store = InMemoryStatsStore()
+    return _store
+
+
+def _bucket_aggregates():
+    aggregates = {}
+    for field, low, high in bucket_ranges():
+        # The first bucket also takes anything below 0, as bucket_field does
+        bounds = Q() if field == BUCKET_FIELDS[0] else Q(time_taken_seconds__gte=low)
+        if high is not None:
+            bounds &= Q(time_taken_seconds__lt=high)
+        aggregates[field] = Count("id", filter=bounds)
+    return aggregates
+
+
+_COUNTER_AGGREGATES = {
+    "total": Count("id"),
+    "time_sum": Sum("time_taken_seconds"),
+    "A": Count("id", filter=Q(selected_option="A")),
+    "B": Count("id", filter=Q(selected_option="B")),
+    "C": Count("id", filter=Q(selected_option="C")),
+    "D": Count("id", filter=Q(selected_option="D")),
+    **_bucket_aggregates(),
+}
+
+
+def _row_counters(row) -> dict:
+    counters = empty_counters()
+    for field in COUNTER_FIELDS:
+        counters[field] = row[field] or counters[field]
+    return counters
+
+
+def _archived_counters(session_id, question_ids):
+    """
+    Counters of an archived session, or None when it is not archived.
+    """
+    rows = archived_values(session_id, ("question_id", "selected_option", "time_taken_seconds"))
+    if rows is None:
+        return None
+    result = {qid: empty_counters() for qid in question_ids}
+    for question_id, option, time_taken in rows:
+        counters = result.get(question_id)
+        if counters is not None:
+            counters[option] += 1
+            counters["total"] += 1
+            counters["time_sum"] += time_taken
+            counters[bucket_field(time_taken)] += 1
+    return result
+
+
+def aggregate_counters(session_id, question_id) -> dict:
+    """
+    SQL fallback used to (re)build cold counters.
+    """
+    agg = AnswerRecord.objects.filter(
+        session_id=session_id,
+        question_id=question_id,
+    ).aggregate(**_COUNTER_AGGREGATES)
+    if not agg["total"]:
+        archived = _archived_counters(session_id, [question_id])
+        if archived is not None:
+            return archived[question_id]
+    return _row_counters(agg)
+
+
+def aggregate_session_counters(session_id, question_ids) -> dict:
+    """
+    Same as aggregate_counters for many questions in one GROUP BY query
+    (hot answers only; see ended_session_counters).
+    """
+    rows = (
+        AnswerRecord.objects.filter(
+            session_id=session_id,
+            question_id__in=question_ids,
+        )
+        .values("question_id")
+        .annotate(**_COUNTER_AGGREGATES)
+        .order_by()
+    )
+    result = {qid: empty_counters() for qid in question_ids}
+    for row in rows:
+        result[row["question_id"]] = _row_counters(row)
+    return result
+
+
+def ended_session_counters(session_id, question_ids) -> dict:
+    """
+    aggregate_session_counters for an ended session, whose answers may have
+    been archived.
+    """
+    counters = _archived_counters(session_id, question_ids)
+    if counters is None:
+        counters = aggregate_session_counters(session_id, question_ids)
+    return counters
+
+
+def stats_payload(question_id, counters) -> dict:
+    total = counters["total"]
+    buckets = [counters[field] for field in BUCKET_FIELDS]
+
+    # compute percentages safely
+    def pct(option):
+        return counters[option] * 100.0 / total if total > 0 else 0.0
+
+    return {
+        "question_id": question_id,
+        "total_responses": total,
+        "average_time": counters["time_sum"] / total if total > 0 else 0.0,
+        "option_a_count": counters["A"],
+        "option_b_count": counters["B"],
+        "option_c_count": counters["C"],
+        "option_d_count": counters["D"],
+        "option_a_pct": pct("A"),
+        "option_b_pct": pct("B"),
+        "option_c_pct": pct("C"),
+        "option_d_pct": pct("D"),
+        **{f"p{q}_time": percentile(buckets, q) for q in PERCENTILES},
+        # Counts per latency.HISTOGRAM_EDGES bucket
+        "time_histogram": histogram(buckets),
+    }
+
+
+def question_stats(session_id, question_id) -> dict:
+    store = get_stats_store()
+    counters = store.get(session_id, question_id)
+    if counters is None:
+        # Read before the query; see the module docstring
+        generation = store.generation(session_id, [question_id])[question_id]
+        counters = aggregate_counters(session_id, question_id)
+        store.prime(session_id, question_id, counters, generation)
+    return stats_payload(question_id, counters)
+
+
+def compute_question_stats(session, question):
+    """
+    Compute aggregated stats for a question within a session.
+    """
+    return question_stats(session.id, question.id)
+
+
+def compute_session_stats(session, questions):
+    """
+    Stats for every given question of a session, in the same order. Warm
+    counters come from the store; cold ones are rebuilt with a single
+    GROUP BY question_id query.
+    """
+    question_ids = [q.id for q in questions]
+    store = get_stats_store()
+    counters = store.get_many(session.id, question_ids)
+
+    cold = [qid for qid, value in counters.items() if value is None]
+    if cold:
+        generations = store.generation(session.id, cold)
+        rebuilt = aggregate_session_counters(session.id, cold)
+        for qid, value in rebuilt.items():
+            store.prime(session.id, qid, value, generations[qid])
+        counters.update(rebuilt)
+
+    return [stats_payload(qid, counters[qid]) for qid in question_ids]
+
+
+def begin_answers(session_id, question_id, count=1):
+    """
+    Mark answers to a question as being written; call before the DB write.
+    Each one ends with record_answer after commit, or abort_answers.
+    """
+    get_stats_store().begin_writes(session_id, question_id, count)
+
+
+def abort_answers(session_id, question_id, count=1):
+    """
+    End begun answers whose write failed.
+    """
+    get_stats_store().end_writes(session_id, question_id, count)
+
+
+def record_answer(session_id, question_id, option, time_taken, previous=None):
+    """
+    Apply one saved answer to the counters and end its write. `previous` is
+    the (selected_option, time_taken_seconds) pair the answer replaced, if
+    any.
+    """
+    return get_stats_store().record_answer(
+        session_id, question_id, option, time_taken, previous
+    )
+
+
+def invalidate_stats(session_id, question_id=None):
+    get_stats_store().invalidate(session_id, question_id)
@@ -0,0 +1,34 @@
+from celery import shared_task
+from django.conf import settings
+
+from . import archive, deletion, ingest, reports, timers
+
+
+@shared_task
+def fire_due_timers():
+    sessions, questions = timers.fire_due_timers()
+    return {"sessions": sessions, "questions": questions}
+
+
+@shared_task
+def build_session_report(session_id):
+    if settings.PQ_ANSWER_INGEST_MODE == "buffered":
+        # Answers acknowledged just before the end may still be queued
+        ingest.get_answer_buffer().flush()
+    report = reports.build_session_report(session_id)
+    return report.pk if report else None
+
+
+@shared_task
+def run_deletion_job(job_id):
+    job = deletion.run_deletion_job(job_id)
+    return job.progress
+
+
+@shared_task
+def archive_ended_sessions():
+    archived = 0
+    for session_id in list(archive.archive_candidates().values_list("id", flat=True)):
+        if archive.archive_session(session_id) is not None:
+            archived += 1
+    return archived
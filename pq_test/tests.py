@@ -1,3 +1,1560 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+import warnings
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import OperationalError, close_old_connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from pq_test import (
+    archive,
+    bundles,
+    deletion,
+    events,
+    ingest,
+    jwt_middleware,
+    leaderboard,
+    scoring,
+    stats,
+    timers,
+    views,
+    wire,
+)
+from pq_test.answers import save_answer
+from pq_test.completion import count_answered
+from pq_test.models import (
+    AnswerArchive,
+    AnswerRecord,
+    DeletionJob,
+    ParticipantSession,
+    Question,
+    Quiz,
+    QuizSession,
+)
+from pq_test.reports import build_report, build_session_report
+from pq_test.routing import http_urlpatterns, websocket_urlpatterns
+from pq_test.utils import TTLCache
+
+try:
+    import fakeredis
+except ImportError:  # optional, only for the Redis store tests
+    fakeredis = None
+
+
+def make_quiz(owner, questions):
+    quiz = Quiz.objects.create(title="Quiz", owner=owner)
+    Question.objects.bulk_create(
+        [
+            Question(
+                quiz=quiz,
+                text=f"Question {i}",
+                option_a="a",
+                option_b="b",
+                option_c="c",
+                option_d="d",
+                order=i,
+            )
+            for i in range(questions)
+        ]
+    )
+    return quiz
+
+
+class StatsRebuildRaceTests(TestCase):
+    """
+    An answer landing while cold counters are rebuilt is counted exactly
+    once, whichever side of the rebuild's query it commits on.
+    """
+
+    def make_store(self):
+        return stats.InMemoryStatsStore()
+
+    def setUp(self):
+        patcher = mock.patch.object(stats, "_store", self.make_store())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        self.quiz = make_quiz(host, 1)
+        self.question = self.quiz.questions.get()
+        self.session = QuizSession.objects.create(
+            quiz=self.quiz, host=host, status=QuizSession.STATUS_LIVE
+        )
+        self.participants = [
+            ParticipantSession.objects.create(
+                session=self.session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            for i in range(2)
+        ]
+
+    def answer(self, participant, option, execute=True):
+        with self.captureOnCommitCallbacks(execute=execute) as callbacks:
+            save_answer(participant, self.question, option, 5.0, 1.0, question_count=1)
+        return callbacks
+
+    def total(self):
+        return stats.question_stats(self.session.id, self.question.id)["total_responses"]
+
+    def test_answer_committed_after_the_rebuild_query_is_not_lost(self):
+        self.answer(self.participants[0], "A")
+        stats.invalidate_stats(self.session.id)
+        aggregate = stats.aggregate_counters
+
+        def aggregate_then_answer(session_id, question_id):
+            counters = aggregate(session_id, question_id)
+            # Commits and applies (to cold counters) before the prime
+            self.answer(self.participants[1], "B")
+            return counters
+
+        with mock.patch.object(stats, "aggregate_counters", side_effect=aggregate_then_answer):
+            self.assertEqual(self.total(), 1)
+        self.assertEqual(self.total(), 2)
+        self.assertEqual(self.total(), 2)
+
+    def test_answer_applied_after_the_prime_is_not_counted_twice(self):
+        self.answer(self.participants[0], "A")
+        stats.invalidate_stats(self.session.id)
+
+        # Committed before the rebuild's query, applied after its prime
+        pending = self.answer(self.participants[1], "B", execute=False)
+        self.assertEqual(self.total(), 2)
+        for callback in pending:
+            callback()
+        self.assertEqual(self.total(), 2)
+
+        self.answer(self.participants[1], "C")
+        payload = stats.question_stats(self.session.id, self.question.id)
+        self.assertEqual(payload["total_responses"], 2)
+        self.assertEqual((payload["option_a_count"], payload["option_c_count"]), (1, 1))
+
+    def test_quiet_rebuild_is_primed(self):
+        self.answer(self.participants[0], "A")
+        stats.invalidate_stats(self.session.id)
+        self.assertEqual(self.total(), 1)
+        with mock.patch.object(stats, "aggregate_counters") as aggregate:
+            self.answer(self.participants[1], "D")
+            self.assertEqual(self.total(), 2)
+        aggregate.assert_not_called()
+
+    def test_failed_write_does_not_block_rebuilds(self):
+        stats.invalidate_stats(self.session.id)
+        with mock.patch.object(AnswerRecord.objects, "create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.answer(self.participants[0], "A")
+        self.assertEqual(self.total(), 0)
+        with mock.patch.object(stats, "aggregate_counters") as aggregate:
+            self.assertEqual(self.total(), 0)
+        aggregate.assert_not_called()
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisStatsRebuildRaceTests(StatsRebuildRaceTests):
+    def make_store(self):
+        return stats.RedisStatsStore(client=fakeredis.FakeRedis())
+
+
+class LeaderboardRebuildRaceTests(TestCase):
+    """
+    An answer landing while a cold leaderboard is rebuilt is scored exactly
+    once, whichever side of the rebuild's query it commits on.
+    """
+
+    def make_store(self):
+        return leaderboard.InMemoryLeaderboardStore()
+
+    def setUp(self):
+        stores = ((stats, stats.InMemoryStatsStore()), (leaderboard, self.make_store()))
+        for module, store in stores:
+            patcher = mock.patch.object(module, "_store", store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        self.quiz = make_quiz(host, 1)
+        self.question = self.quiz.questions.get()
+        self.session = QuizSession.objects.create(
+            quiz=self.quiz, host=host, status=QuizSession.STATUS_LIVE
+        )
+        self.participants = [
+            ParticipantSession.objects.create(
+                session=self.session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            for i in range(2)
+        ]
+
+    def answer(self, participant, score, execute=True):
+        with self.captureOnCommitCallbacks(execute=execute) as callbacks:
+            save_answer(participant, self.question, "A", 5.0, score, question_count=1)
+        return callbacks
+
+    def scores(self):
+        return [score for _, score, _ in leaderboard.top_entries(self.session.id)]
+
+    def test_answer_committed_after_the_rebuild_query_is_not_lost(self):
+        self.answer(self.participants[0], 1.0)
+        leaderboard.invalidate_leaderboard(self.session.id)
+        aggregate = leaderboard.aggregate_totals
+
+        def aggregate_then_answer(session_id):
+            totals = aggregate(session_id)
+            # Commits and applies (to a cold board) before the prime
+            self.answer(self.participants[1], 2.0)
+            return totals
+
+        with mock.patch.object(leaderboard, "aggregate_totals", side_effect=aggregate_then_answer):
+            self.assertEqual(self.scores(), [1.0])
+        self.assertEqual(self.scores(), [2.0, 1.0])
+        self.assertEqual(
+            leaderboard.participant_rank(self.session.id, self.participants[1].pk)[0], 1
+        )
+
+    def test_answer_applied_after_the_prime_is_not_counted_twice(self):
+        self.answer(self.participants[0], 1.0)
+        leaderboard.invalidate_leaderboard(self.session.id)
+
+        # Committed before the rebuild's query, applied after its prime
+        pending = self.answer(self.participants[1], 2.0, execute=False)
+        self.assertEqual(self.scores(), [2.0, 1.0])
+        for callback in pending:
+            callback()
+        self.assertEqual(self.scores(), [2.0, 1.0])
+        self.assertEqual(
+            leaderboard.participant_rank(self.session.id, self.participants[1].pk)[:2], (1, 2.0)
+        )
+
+    def test_quiet_rebuild_is_primed(self):
+        self.answer(self.participants[0], 1.0)
+        leaderboard.invalidate_leaderboard(self.session.id)
+        self.assertEqual(self.scores(), [1.0])
+        with mock.patch.object(leaderboard, "aggregate_totals") as aggregate:
+            self.answer(self.participants[1], 2.0)
+            self.assertEqual(self.scores(), [2.0, 1.0])
+        aggregate.assert_not_called()
+
+    def test_failed_write_does_not_block_rebuilds(self):
+        leaderboard.invalidate_leaderboard(self.session.id)
+        with mock.patch.object(AnswerRecord.objects, "create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.answer(self.participants[0], 1.0)
+        self.assertEqual(self.scores(), [])
+        with mock.patch.object(leaderboard, "aggregate_totals") as aggregate:
+            self.assertEqual(self.scores(), [])
+        aggregate.assert_not_called()
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisLeaderboardRebuildRaceTests(LeaderboardRebuildRaceTests):
+    def make_store(self):
+        return leaderboard.RedisLeaderboardStore(client=fakeredis.FakeRedis())
+
+
+class IngestFixture:
+    """
+    A live session of a 3 question quiz with 3 participants, and an
+    AnswerBuffer on `make_queue()` (stats broadcasts are not scheduled).
+    """
+
+    def make_queue(self):
+        return ingest.InMemoryAnswerQueue()
+
+    def setUp(self):
+        stores = (
+            (stats, stats.InMemoryStatsStore()),
+            (leaderboard, leaderboard.InMemoryLeaderboardStore()),
+        )
+        for module, store in stores:
+            patcher = mock.patch.object(module, "_store", store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ingest, "schedule_stats_update")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        self.quiz = make_quiz(host, 3)
+        self.questions = list(self.quiz.questions.all())
+        self.session = QuizSession.objects.create(
+            quiz=self.quiz, host=host, status=QuizSession.STATUS_LIVE
+        )
+        self.participants = [
+            ParticipantSession.objects.create(
+                session=self.session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            for i in range(3)
+        ]
+        self.queue = self.make_queue()
+        self.buffer = ingest.AnswerBuffer(self.queue, batch_size=10, interval=60, max_pending=1000)
+
+    def entry(self, participant, question_id, option="A"):
+        return {
+            "session_code": self.session.session_code,
+            "session_id": self.session.id,
+            "participant_id": participant.pk,
+            "question_id": question_id,
+            "question_count": 3,
+            "selected_option": option,
+            "time_taken_seconds": 4.0,
+            "within_time": True,
+            "score": 1.0,
+        }
+
+
+class BufferedIngestTests(IngestFixture, TestCase):
+    def answered(self):
+        return {
+            p.pk: (p.answered_count, p.completed)
+            for p in ParticipantSession.objects.filter(session=self.session)
+        }
+
+    def option_counts(self, question):
+        payload = stats.question_stats(self.session.id, question.id)
+        return payload["total_responses"], payload["option_a_count"], payload["option_b_count"]
+
+    def test_batch_is_upserted(self):
+        first, second = self.participants[:2]
+        ingest.write_answer_batch(
+            [self.entry(p, q.id) for p in (first, second) for q in self.questions]
+        )
+        self.assertEqual(AnswerRecord.objects.count(), 6)
+        self.assertEqual(self.answered()[first.pk], (3, True))
+        self.assertEqual(self.option_counts(self.questions[0]), (2, 2, 0))
+
+        # A replayed or changed answer replaces the row and counts once
+        ingest.write_answer_batch([self.entry(first, self.questions[0].id, "B")])
+        self.assertEqual(AnswerRecord.objects.count(), 6)
+        self.assertEqual(self.answered()[first.pk], (3, True))
+        self.assertEqual(self.option_counts(self.questions[0]), (2, 1, 1))
+        self.assertEqual(
+            leaderboard.participant_rank(self.session.id, first.pk)[1], 3.0
+        )
+
+    def test_last_write_wins_within_a_batch(self):
+        participant, question = self.participants[0], self.questions[0]
+        ingest.write_answer_batch(
+            [self.entry(participant, question.id, "A"), self.entry(participant, question.id, "B")]
+        )
+        answer = AnswerRecord.objects.get()
+        self.assertEqual(answer.selected_option, "B")
+        self.assertEqual(self.answered()[participant.pk], (1, False))
+        self.assertEqual(self.option_counts(question), (1, 0, 1))
+
+    def test_failed_flush_requeues_in_order(self):
+        entries = [self.entry(p, self.questions[0].id) for p in self.participants]
+        for entry in entries[:2]:
+            self.queue.push(entry)
+        self.assertEqual(self.queue.take(10), entries[:2])
+        self.queue.push(entries[2])
+
+        with mock.patch.object(ingest, "write_answer_batch", side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+        self.assertEqual(self.queue.take(10), entries)
+        self.queue.requeue()
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.queue.take(10), [])
+        self.assertEqual(AnswerRecord.objects.count(), 3)
+
+
+class CompletionTests(IngestFixture, TestCase):
+    def state(self, participant):
+        participant.refresh_from_db()
+        return (
+            participant.answered_count,
+            participant.completed,
+            participant.completed_reason,
+            participant.not_done_questions,
+        )
+
+    def test_only_the_crossing_update_completes(self):
+        participant = self.participants[0]
+        participant.not_done_questions = [self.questions[2].id]
+        participant.save(update_fields=["not_done_questions"])
+        for _ in range(2):
+            count_answered([participant.pk], 1, 3)
+        self.assertEqual(self.state(participant), (2, False, "", [self.questions[2].id]))
+        count_answered([participant.pk], 1, 3)
+        self.assertEqual(self.state(participant), (3, True, "answered_all", []))
+
+        # Past the count, a completion recorded elsewhere is left alone
+        ParticipantSession.objects.filter(pk=participant.pk).update(
+            completed_reason="time_expired"
+        )
+        count_answered([participant.pk], 1, 3)
+        self.assertEqual(self.state(participant), (4, True, "time_expired", []))
+
+    def test_batched_counts_complete_on_crossing(self):
+        first, second, third = self.participants
+        ParticipantSession.objects.filter(pk=first.pk).update(answered_count=1)
+        ParticipantSession.objects.filter(pk=second.pk).update(answered_count=2)
+        count_answered([first.pk, second.pk, third.pk], 2, 3)
+        self.assertEqual(self.state(first)[:2], (3, True))
+        self.assertEqual(self.state(second)[:2], (4, True))
+        self.assertEqual(self.state(third)[:2], (2, False))
+
+    def test_replaced_answers_are_not_counted(self):
+        participant, question = self.participants[0], self.questions[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            for option in ("A", "B", "C"):
+                save_answer(participant, question, option, 2.0, 1.0, question_count=3)
+        self.assertEqual(self.state(participant)[:2], (1, False))
+        with self.captureOnCommitCallbacks(execute=True):
+            for question in self.questions[1:]:
+                save_answer(participant, question, "A", 2.0, 1.0, question_count=3)
+        self.assertEqual(self.state(participant)[:3], (3, True, "answered_all"))
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisAnswerQueueTests(IngestFixture, TestCase):
+    def make_queue(self, worker_id="live"):
+        return ingest.RedisAnswerQueue(client=self.redis, worker_id=worker_id)
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        super().setUp()
+
+    def test_in_flight_batch_of_a_dead_worker_is_replayed(self):
+        dead, busy = self.make_queue("dead"), self.make_queue("busy")
+        entries = [self.entry(p, self.questions[0].id) for p in self.participants]
+        for entry in entries:
+            self.queue.push(entry)
+        self.assertEqual(dead.take(2), entries[:2])
+        self.assertEqual(busy.take(1), entries[2:])
+        # The dead worker's heartbeat lapses; the busy one's does not
+        self.redis.delete(f"{dead.worker_prefix}dead")
+
+        with self.assertLogs(ingest.logger, "WARNING"):
+            self.assertEqual(self.queue.recover(), 2)
+        self.assertEqual(self.queue.recover(), 0)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            set(AnswerRecord.objects.values_list("participant_id", flat=True)),
+            {p.pk for p in self.participants[:2]},
+        )
+        self.assertEqual(busy.take(10), entries[2:])
+
+
+class AnswerBufferPoisonTests(IngestFixture, TransactionTestCase):
+    """
+    An answer that can never be written is isolated and dead-lettered; the
+    answers queued with and behind it are written.
+    """
+
+    @override_settings(PQ_ANSWER_MAX_ATTEMPTS=3)
+    def test_poison_answer_is_dead_lettered(self):
+        deleted = self.questions.pop()
+        Question.objects.filter(pk=deleted.pk).delete()
+        self.queue.push(self.entry(self.participants[0], self.questions[0].id))
+        self.queue.push(self.entry(self.participants[1], deleted.id))
+        self.queue.push(self.entry(self.participants[2], self.questions[1].id))
+
+        with self.assertLogs(ingest.logger, "WARNING"):
+            self.assertEqual(self.buffer.flush(), 2)
+            self.assertEqual(AnswerRecord.objects.count(), 2)
+            self.assertEqual(self.queue.dead_letters(), [])
+
+            # Answers queued behind the failing one are written on each flush
+            self.queue.push(self.entry(self.participants[0], self.questions[1].id))
+            self.assertEqual(self.buffer.flush(), 1)
+            self.assertEqual(self.buffer.flush(), 0)
+            self.assertEqual(AnswerRecord.objects.count(), 3)
+
+        dead = self.queue.dead_letters()
+        self.assertEqual([(e["question_id"], e["attempts"]) for e in dead], [(deleted.id, 3)])
+        self.assertEqual(self.queue.take(10), [])
+
+    def test_unreachable_database_requeues_the_batch(self):
+        self.queue.push(self.entry(self.participants[0], self.questions[0].id))
+        with mock.patch.object(ingest, "write_answer_batch", side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.queue.dead_letters(), [])
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisAnswerBufferPoisonTests(AnswerBufferPoisonTests):
+    def make_queue(self):
+        return ingest.RedisAnswerQueue(
+            client=fakeredis.FakeRedis(decode_responses=True), worker_id="test"
+        )
+
+
+class InMemoryBundleStoreTests(TestCase):
+    def test_bundles_expire_and_are_bounded(self):
+        store = bundles.InMemoryBundleStore(ttl=5, maxsize=2)
+        with mock.patch("time.time", return_value=1000.0):
+            for quiz_id in (1, 2, 3):
+                store.set(quiz_id, [{"id": quiz_id}])
+            self.assertIsNone(store.get(1))
+            self.assertEqual(store.get(3), [{"id": 3}])
+        with mock.patch("time.time", return_value=1005.0):
+            self.assertIsNone(store.get(3))
+
+
+class SessionReportTests(TestCase):
+    def test_answers_of_removed_questions_and_participants_are_left_out(self):
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        quiz = make_quiz(host, 3)
+        questions = list(quiz.questions.order_by("id"))
+        session = QuizSession.objects.create(quiz=quiz, host=host, status=QuizSession.STATUS_ENDED)
+        participants = [
+            ParticipantSession.objects.create(
+                session=session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            for i in range(2)
+        ]
+        AnswerRecord.objects.bulk_create(
+            [
+                AnswerRecord(
+                    participant=participant,
+                    session_id=session.id,
+                    question=question,
+                    selected_option="A",
+                    time_taken_seconds=3.0,
+                    score=1.0,
+                )
+                for participant in participants
+                for question in questions
+            ]
+        )
+        # Archived answers outlive the rows they point at
+        archive.archive_session(session.id)
+        questions.pop(1).delete()
+        participants.pop(0).delete()
+
+        report = build_report(session)
+        histograms = report["time_histograms"]
+        self.assertEqual(
+            {qid: sum(counts) for qid, counts in histograms["questions"].items()},
+            {str(q.id): 2 for q in questions},
+        )
+        self.assertEqual(sum(histograms["overall"]), 4)
+        self.assertEqual(
+            [(p["participant_id"], p["answered"], p["score"]) for p in report["participants"]],
+            [(participants[0].pk, 3, 3.0)],
+        )
+
+
+class SocketTestCase(TransactionTestCase):
+    """
+    A live session, talked to over QuizSessionConsumer with the host in the
+    scope (participant sockets would also get presence updates).
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="host@example.com", username="host")
+        self.session = QuizSession.objects.create(
+            quiz=make_quiz(self.user, 1), host=self.user, status=QuizSession.STATUS_LIVE
+        )
+
+    async def connect(self, query=b""):
+        path = f"/ws/pq/sessions/{self.session.session_code}/"
+        socket = ApplicationCommunicator(
+            URLRouter(websocket_urlpatterns),
+            {
+                "type": "websocket",
+                "path": path,
+                "query_string": query,
+                "headers": [],
+                "subprotocols": [],
+                "user": self.user,
+            },
+        )
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.accept")
+        return socket
+
+    async def disconnect(self, socket):
+        await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+        await socket.wait(1)
+
+    async def exchange(self, socket, **frame):
+        """
+        Send one frame and return the reply frame's content.
+        """
+        await socket.send_input({"type": "websocket.receive", **frame})
+        reply = await socket.receive_output(1)
+        if reply.get("bytes") is not None:
+            event, seq, data = wire.msgpack.unpackb(reply["bytes"], raw=False)
+            return {"event": event, "seq": seq, "data": data}
+        return json.loads(reply["text"])
+
+
+class SessionSocketTests(SocketTestCase):
+    async def test_malformed_json_frames_get_an_error(self):
+        socket = await self.connect()
+        for frame in ({"text": "{not json"}, {"text": "[1, 2]"}, {"bytes": b"\x81\xa1a\x01"}):
+            reply = await self.exchange(socket, **frame)
+            self.assertEqual(reply["event"], "error")
+        # Still connected and serving actions
+        reply = await self.exchange(socket, text=json.dumps({"action": "join"}))
+        self.assertEqual((reply["event"], reply["data"]["user_id"]), ("joined", self.user.id))
+        await self.disconnect(socket)
+
+    async def test_malformed_msgpack_frames_get_an_error(self):
+        socket = await self.connect(b"format=msgpack")
+        for frame in (b"\xc1", wire.msgpack.packb([1, 2]), b"\x93\x01"):
+            reply = await self.exchange(socket, bytes=frame)
+            self.assertEqual(reply["event"], "error")
+        reply = await self.exchange(socket, bytes=wire.msgpack.packb({"action": "join"}))
+        self.assertEqual((reply["event"], reply["data"]["user_id"]), ("joined", self.user.id))
+        await self.disconnect(socket)
+
+
+class ResumeTests(SocketTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(events, "_log", events.InMemoryEventLog(size=3))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log = events.get_event_log()
+        self.code = self.session.session_code
+
+    def append(self, count):
+        for _ in range(count):
+            self.log.append(self.code, "session_results", {})
+
+    async def resume(self, socket, last_seq):
+        await socket.send_input(
+            {
+                "type": "websocket.receive",
+                "text": json.dumps({"action": "resume", "last_seq": last_seq}),
+            }
+        )
+
+    async def receive(self, socket):
+        return json.loads((await socket.receive_output(1))["text"])
+
+    async def test_missed_events_are_replayed_in_order(self):
+        self.append(3)
+        socket = await self.connect()
+        await self.resume(socket, 1)
+        self.assertEqual([(await self.receive(socket))["seq"] for _ in range(2)], [2, 3])
+        self.assertTrue(await socket.receive_nothing())
+        await self.disconnect(socket)
+
+    async def test_evicted_events_fall_back_to_resync(self):
+        self.append(5)
+        socket = await self.connect()
+        await self.resume(socket, 1)
+        reply = await self.receive(socket)
+        self.assertEqual((reply["event"], reply["seq"]), ("resync", 5))
+        self.assertEqual(reply["data"]["status"], QuizSession.STATUS_LIVE)
+        self.assertTrue(await socket.receive_nothing())
+        await self.disconnect(socket)
+
+    async def test_live_events_up_to_the_replayed_seq_are_not_repeated(self):
+        self.append(3)
+        socket = await self.connect()
+        await self.resume(socket, 1)
+        for _ in range(2):
+            await self.receive(socket)
+        # Group messages queued while replaying, then a new one
+        layer = get_channel_layer()
+        for seq in (2, 3, 4):
+            await layer.group_send(
+                events.host_group_name(self.code),
+                {"type": "broadcast_event", "event": "session_results", "data": {}, "seq": seq},
+            )
+        self.assertEqual((await self.receive(socket))["seq"], 4)
+        self.assertTrue(await socket.receive_nothing())
+        await self.disconnect(socket)
+
+
+@override_settings(
+    CORS_ALLOWED_ORIGINS=["https://app.example.com"], PQ_SSE_KEEPALIVE_SECONDS=60
+)
+class EventStreamTests(SocketTestCase):
+    """
+    The SSE stream of a session (sse.SessionEventStreamConsumer).
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(events, "_log", events.InMemoryEventLog(size=10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.code = self.session.session_code
+
+    def open(self, method="GET", headers=(), query=b""):
+        token = f"Bearer {AccessToken.for_user(self.user)}".encode()
+        return ApplicationCommunicator(
+            URLRouter(http_urlpatterns),
+            {
+                "type": "http",
+                "method": method,
+                "path": f"/api/pq/sessions/{self.code}/events/",
+                "query_string": query,
+                "headers": [(b"host", b"testserver"), (b"authorization", token), *headers],
+            },
+        )
+
+    async def start(self, stream):
+        await stream.send_input({"type": "http.request", "body": b"", "more_body": False})
+        start = await stream.receive_output(1)
+        return start["status"], {name.lower(): value for name, value in start["headers"]}
+
+    async def receive(self, stream):
+        """
+        The next SSE message as (seq, event), or "end" when the stream ends.
+        """
+        message = await stream.receive_output(1)
+        if not message.get("more_body"):
+            return "end"
+        fields = dict(
+            line.split(": ", 1) for line in message["body"].decode().strip().split("\n")
+        )
+        return int(fields["id"]), fields["event"]
+
+    async def test_ended_session_gets_204(self):
+        await QuizSession.objects.filter(pk=self.session.pk).aupdate(
+            status=QuizSession.STATUS_ENDED
+        )
+        stream = self.open()
+        status, _ = await self.start(stream)
+        self.assertEqual(status, 204)
+        self.assertFalse((await stream.receive_output(1)).get("more_body"))
+        await stream.wait(1)
+
+    async def test_reconnect_catches_up_from_last_event_id(self):
+        log = events.get_event_log()
+        for event in ("stats_update", "presence_update", "session_results"):
+            log.append(self.code, event, {})
+        stream = self.open(headers=[(b"last-event-id", b"1")])
+        status, headers = await self.start(stream)
+        self.assertEqual((status, headers[b"content-type"]), (200, b"text/event-stream"))
+        self.assertEqual((await stream.receive_output(1))["body"], b"retry: 3000\n\n")
+        # Only stream events are forwarded
+        self.assertEqual(await self.receive(stream), (3, "session_results"))
+        self.assertTrue(await stream.receive_nothing())
+
+        # Live events already replayed are not sent again
+        layer = get_channel_layer()
+        for seq, event in ((3, "session_results"), (4, "stats_update"), (5, "session_ended")):
+            await layer.group_send(
+                events.host_group_name(self.code),
+                {"type": "broadcast_event", "event": event, "data": {}, "seq": seq},
+            )
+        self.assertEqual(await self.receive(stream), (4, "stats_update"))
+        self.assertEqual(await self.receive(stream), (5, "session_ended"))
+        self.assertEqual(await self.receive(stream), "end")
+        await stream.wait(1)
+
+    async def test_new_stream_starts_with_resync(self):
+        events.get_event_log().append(self.code, "stats_update", {})
+        stream = self.open(query=b"last_event_id=")
+        await self.start(stream)
+        await stream.receive_output(1)
+        self.assertEqual(await self.receive(stream), (1, "resync"))
+        await stream.send_input({"type": "http.disconnect"})
+        await stream.wait(1)
+
+    async def test_cors_preflight(self):
+        stream = self.open(
+            "OPTIONS",
+            headers=[
+                (b"origin", b"https://app.example.com"),
+                (b"access-control-request-method", b"GET"),
+                (b"access-control-request-headers", b"authorization"),
+            ],
+        )
+        status, headers = await self.start(stream)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"access-control-allow-origin"], b"https://app.example.com")
+        self.assertIn(b"authorization", headers[b"access-control-allow-headers"])
+
+        stream = self.open("OPTIONS", headers=[(b"origin", b"https://elsewhere.example.com")])
+        status, headers = await self.start(stream)
+        self.assertEqual(status, 200)
+        self.assertNotIn(b"access-control-allow-origin", headers)
+
+
+class SessionViewQueryCountTests(TestCase):
+    """
+    The session views read the stats of every question in a constant number
+    of queries, however long the quiz is.
+    """
+
+    def setUp(self):
+        stores = (
+            (stats, stats.InMemoryStatsStore()),
+            (leaderboard, leaderboard.InMemoryLeaderboardStore()),
+            (bundles, bundles.InMemoryBundleStore()),
+        )
+        for module, store in stores:
+            patcher = mock.patch.object(module, "_store", store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.host = get_user_model().objects.create_user(email="host@example.com", username="host")
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def make_session(self, questions, status=QuizSession.STATUS_LIVE):
+        """
+        A session of a `questions` long quiz, every question answered by two
+        participants; ended ones have their report stored.
+        """
+        User = get_user_model()
+        quiz = make_quiz(self.host, questions)
+        session = QuizSession.objects.create(quiz=quiz, host=self.host, status=status)
+        for i in range(2):
+            tag = f"{session.id}-{i}"
+            participant = ParticipantSession.objects.create(
+                session=session,
+                user=User.objects.create_user(email=f"p{tag}@example.com", username=f"p{tag}"),
+            )
+            AnswerRecord.objects.bulk_create(
+                [
+                    AnswerRecord(
+                        participant=participant,
+                        session_id=session.id,
+                        question=question,
+                        selected_option="A",
+                        time_taken_seconds=3.0,
+                        score=1.0,
+                    )
+                    for question in quiz.questions.all()
+                ]
+            )
+        if status == QuizSession.STATUS_ENDED:
+            build_session_report(session.id)
+        return session
+
+    def assertQueries(self, num, path, status=QuizSession.STATUS_LIVE):
+        for questions in (3, 30):
+            with self.subTest(questions=questions):
+                session = self.make_session(questions, status)
+                with self.assertNumQueries(num):
+                    response = self.client.get(
+                        path.format(id=session.id, code=session.session_code)
+                    )
+                self.assertEqual(response.status_code, 200)
+                stats_of = response.data.get("question_stats")
+                self.assertEqual(len(stats_of), questions)
+                self.assertEqual({s["total_responses"] for s in stats_of}, {2})
+
+    def test_by_code(self):
+        self.assertQueries(4, "/api/pq/sessions/by-code/{code}/")
+
+    def test_analytics(self):
+        self.assertQueries(7, "/api/pq/sessions/{id}/analytics/")
+
+    def test_ended_analytics(self):
+        self.assertQueries(6, "/api/pq/sessions/{id}/analytics/", QuizSession.STATUS_ENDED)
+
+    def test_ended_projector(self):
+        self.assertQueries(
+            3, "/api/pq/sessions/by-code/{code}/projector/", QuizSession.STATUS_ENDED
+        )
+
+
+class ListQueryCountTests(TestCase):
+    """
+    List endpoints cost a constant number of queries, with 3 or 30 rows of
+    everything they list.
+    """
+
+    def setUp(self):
+        stores = (
+            (stats, stats.InMemoryStatsStore()),
+            (bundles, bundles.InMemoryBundleStore()),
+        )
+        for module, store in stores:
+            patcher = mock.patch.object(module, "_store", store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def make_user(self, rows):
+        """
+        A user hosting `rows` public live sessions, taking part in `rows`
+        sessions of another host and owning `rows` quizzes of `rows`
+        questions; one of their sessions has `rows` participants.
+        """
+        User = get_user_model()
+        tag = f"{rows}-{User.objects.count()}"
+        user = User.objects.create_user(email=f"u{tag}@example.com", username=f"u{tag}")
+        other = User.objects.create_user(email=f"o{tag}@example.com", username=f"o{tag}")
+        quizzes = [make_quiz(user, rows) for _ in range(rows)]
+        for _ in range(rows):
+            QuizSession.objects.create(
+                quiz=quizzes[0], host=user, is_public=True, status=QuizSession.STATUS_LIVE
+            )
+            joined = QuizSession.objects.create(
+                quiz=quizzes[0], host=other, is_public=True, status=QuizSession.STATUS_LIVE
+            )
+            ParticipantSession.objects.create(session=joined, user=user)
+        players = User.objects.bulk_create(
+            [User(email=f"p{tag}-{i}@example.com", username=f"p{tag}-{i}") for i in range(rows)]
+        )
+        self.hosted = QuizSession.objects.filter(host=user).first()
+        ParticipantSession.objects.bulk_create(
+            [ParticipantSession(session=self.hosted, user=player) for player in players]
+        )
+        self.client.force_authenticate(user)
+        views._public_live_pages.clear()
+        return user
+
+    def assertQueries(self, *checks):
+        """
+        Request each (query count, path) in order, for each fixture size.
+        """
+        for rows in (3, 30):
+            self.make_user(rows)
+            for num, path in checks:
+                with self.subTest(rows=rows, path=path), self.assertNumQueries(num):
+                    response = self.client.get(path.format(code=self.hosted.session_code))
+                    self.assertEqual(response.status_code, 200)
+
+    def test_session_list(self):
+        self.assertQueries((1, "/api/pq/sessions/"))
+
+    def test_public_live(self):
+        path = "/api/pq/sessions/public-live/?include_async=1"
+        # The second request is served from the page cache
+        self.assertQueries((2, path), (1, path))
+
+    def test_quiz_list(self):
+        self.assertQueries((1, "/api/pq/quizzes/"), (2, "/api/pq/quizzes/?expand=questions"))
+
+    def test_by_code_and_projector(self):
+        path = "/api/pq/sessions/by-code/{code}/"
+        # Repeats find the question bundle and stats warm
+        self.assertQueries((4, path), (2, path), (1, path + "projector/"))
+
+
+class ExportStreamingTests(TestCase):
+    """
+    Under ASGI an export is sent chunk by chunk, not buffered whole.
+    """
+
+    def setUp(self):
+        # As the test client does: keep the test transaction's connection
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+
+        User = get_user_model()
+        self.host = User.objects.create_user(email="host@example.com", username="host")
+        quiz = make_quiz(self.host, 3)
+        self.session = QuizSession.objects.create(
+            quiz=quiz, host=self.host, status=QuizSession.STATUS_ENDED
+        )
+        participant = ParticipantSession.objects.create(
+            session=self.session,
+            user=User.objects.create_user(email="p@example.com", username="p"),
+        )
+        AnswerRecord.objects.bulk_create(
+            [
+                AnswerRecord(
+                    participant=participant,
+                    session_id=self.session.id,
+                    question=question,
+                    selected_option="B",
+                    time_taken_seconds=2.0,
+                    score=1.0,
+                )
+                for question in quiz.questions.all()
+            ]
+        )
+
+    def request(self, path):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Bearer {AccessToken.for_user(self.host)}".encode()),
+            ],
+            "client": ("127.0.0.1", 1234),
+            "server": ("testserver", 80),
+        }
+        messages = []
+        inbox = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if inbox:
+                return inbox.pop()
+            # The client stays connected until the response is sent
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(ASGIHandler())(scope, receive, send)
+        return messages
+
+    def test_csv_export_streams(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            messages = self.request(f"/api/pq/sessions/{self.session.id}/export/csv/")
+
+        self.assertEqual(messages[0]["status"], 200)
+        bodies = [m for m in messages if m["type"] == "http.response.body"]
+        # Header row and three answers as separate messages, then the end
+        self.assertEqual(len(bodies), 5)
+        self.assertTrue(all(m["more_body"] for m in bodies[:-1]))
+        self.assertEqual(b"".join(m.get("body", b"") for m in bodies).count(b"\r\n"), 4)
+        self.assertFalse(
+            [w for w in caught if "StreamingHttpResponse" in str(w.message)],
+            "the export was buffered",
+        )
+
+
+class TimerTests(TestCase):
+    def setUp(self):
+        self.published = []
+        for name, side_effect in (
+            ("publish_event_sync", lambda code, event, data: self.published.append(event)),
+            ("flush_stats_updates", None),
+        ):
+            patcher = mock.patch.object(timers, name, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        User = get_user_model()
+        self.host = User.objects.create_user(email="host@example.com", username="host")
+        self.quiz = make_quiz(self.host, 3)
+        self.quiz.questions.update(time_limit_seconds=30)
+        self.questions = list(self.quiz.questions.order_by("order"))
+
+    def make_session(self, mode=QuizSession.MODE_LIVE):
+        return QuizSession.objects.create(
+            quiz=self.quiz, host=self.host, mode=mode, status=QuizSession.STATUS_LIVE
+        )
+
+    def test_expired_session_completes_unfinished_participants(self):
+        session = self.make_session()
+        User = get_user_model()
+        partial, finished, idle = [
+            ParticipantSession.objects.create(
+                session=session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            for i in range(3)
+        ]
+        for participant, questions in ((partial, self.questions[:1]), (finished, self.questions)):
+            for question in questions:
+                with self.captureOnCommitCallbacks():
+                    save_answer(participant, question, "A", 2.0, 1.0, question_count=3)
+        session.total_time_expires_at = timezone.now() - timedelta(seconds=1)
+        session.save(update_fields=["total_time_expires_at"])
+
+        self.assertEqual(timers.fire_due_timers(), (1, 0))
+        self.assertEqual(timers.fire_due_timers(), (0, 0))
+        self.assertEqual(self.published, ["session_time_expired"])
+        ids = [q.id for q in self.questions]
+        self.assertEqual(
+            {
+                p.pk: (p.completed, p.completed_reason, sorted(p.not_done_questions))
+                for p in ParticipantSession.objects.filter(session=session)
+            },
+            {
+                partial.pk: (True, "time_expired", ids[1:]),
+                finished.pk: (True, "answered_all", []),
+                idle.pk: (True, "time_expired", ids),
+            },
+        )
+        self.assertFalse(timers.expire_session(session.id, session.session_code, self.quiz.id))
+
+    def test_question_timer_fires_once(self):
+        session = self.make_session()
+        session.set_current_question(self.questions[0])
+        expires_at = session.current_question_expires_at
+
+        self.assertEqual(timers.fire_due_timers(expires_at - timedelta(seconds=1)), (0, 0))
+        self.assertEqual(timers.fire_due_timers(expires_at), (0, 1))
+        self.assertEqual(timers.fire_due_timers(expires_at), (0, 0))
+        self.assertEqual(self.published, ["question_time_up"])
+        self.assertFalse(
+            timers.expire_question(
+                session.id, session.session_code, self.questions[0].id, expires_at
+            )
+        )
+
+    def test_question_timers_skip_async_and_paused_sessions(self):
+        async_session = self.make_session(QuizSession.MODE_ASYNC)
+        async_session.set_current_question(self.questions[0])
+        self.assertIsNone(async_session.current_question_expires_at)
+        # Even with an expiry, an async session's question clock never fires
+        expires_at = timezone.now()
+        QuizSession.objects.filter(pk=async_session.pk).update(
+            current_question_expires_at=expires_at
+        )
+        self.assertFalse(
+            timers.expire_question(
+                async_session.id, async_session.session_code, self.questions[0].id, expires_at
+            )
+        )
+
+        paused = self.make_session()
+        paused.set_current_question(self.questions[0])
+        paused.pause()
+        later = paused.current_question_expires_at + timedelta(seconds=1)
+        self.assertEqual(timers.fire_due_timers(later), (0, 0))
+        self.assertEqual(self.published, [])
+
+    def test_resume_moves_the_question_deadline(self):
+        session = self.make_session()
+        start = timezone.now()
+        with mock.patch("django.utils.timezone.now", return_value=start):
+            session.set_current_question(self.questions[0])
+        deadline = start + timedelta(seconds=30)
+        with mock.patch("django.utils.timezone.now", return_value=start + timedelta(seconds=10)):
+            session.pause()
+        with mock.patch("django.utils.timezone.now", return_value=start + timedelta(seconds=25)):
+            session.resume()
+
+        moved = deadline + timedelta(seconds=15)
+        self.assertEqual(session.current_question_expires_at, moved)
+        session.refresh_from_db()
+        self.assertEqual(
+            (session.status, session.paused_at, session.current_question_expires_at),
+            (QuizSession.STATUS_LIVE, None, moved),
+        )
+        self.assertEqual(timers.fire_due_timers(deadline), (0, 0))
+        self.assertEqual(timers.fire_due_timers(moved), (0, 1))
+
+
+class DeletionTests(TestCase):
+    """
+    Quizzes and sessions are hidden by `destroy` (202 + job) and their rows
+    deleted in batches by the job.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(deletion, "_enqueue")
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        User = get_user_model()
+        self.host = User.objects.create_user(email="host@example.com", username="host")
+        self.quiz = make_quiz(self.host, 3)
+        self.sessions = [
+            QuizSession.objects.create(
+                quiz=self.quiz, host=self.host, status=QuizSession.STATUS_ENDED
+            )
+            for _ in range(2)
+        ]
+        for i, (session, players) in enumerate(zip(self.sessions, (2, 1))):
+            for j in range(players):
+                participant = ParticipantSession.objects.create(
+                    session=session,
+                    user=User.objects.create_user(
+                        email=f"p{i}{j}@example.com", username=f"p{i}{j}"
+                    ),
+                )
+                AnswerRecord.objects.bulk_create(
+                    [
+                        AnswerRecord(
+                            participant=participant,
+                            session_id=session.id,
+                            question=question,
+                            selected_option="A",
+                            time_taken_seconds=2.0,
+                            score=1.0,
+                        )
+                        for question in self.quiz.questions.all()
+                    ]
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def destroy(self, path):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(path)
+        self.assertEqual(response.status_code, 202)
+        self.enqueue.assert_called_once_with(response.data["id"])
+        return DeletionJob.objects.get(pk=response.data["id"])
+
+    def test_quiz_is_hidden_then_deleted_in_batches(self):
+        job = self.destroy(f"/api/pq/quizzes/{self.quiz.id}/")
+        self.assertEqual(
+            (job.kind, job.status), (DeletionJob.KIND_QUIZ, DeletionJob.STATUS_PENDING)
+        )
+        self.assertFalse(Quiz.objects.filter(pk=self.quiz.pk).exists())
+        self.assertFalse(QuizSession.objects.filter(quiz=self.quiz).exists())
+        self.assertEqual(AnswerRecord.objects.count(), 9)
+
+        job = deletion.run_deletion_job(job.pk, batch_size=2)
+        self.assertEqual(job.status, DeletionJob.STATUS_DONE)
+        self.assertEqual(job.progress["answerrecord"], {"total": 9, "deleted": 9})
+        self.assertEqual(job.progress["quizsession"], {"total": 2, "deleted": 2})
+        self.assertFalse(Quiz.all_objects.filter(pk=self.quiz.pk).exists())
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(ParticipantSession.objects.exists())
+        self.assertFalse(AnswerRecord.objects.exists())
+
+    def test_session_is_hidden_then_deleted(self):
+        session, other = self.sessions
+        job = self.destroy(f"/api/pq/sessions/{session.id}/")
+        self.assertEqual(job.kind, DeletionJob.KIND_SESSION)
+        self.assertFalse(QuizSession.objects.filter(pk=session.pk).exists())
+
+        deletion.run_deletion_job(job.pk, batch_size=2)
+        self.assertFalse(QuizSession.all_objects.filter(pk=session.pk).exists())
+        self.assertEqual(AnswerRecord.objects.filter(session=session).count(), 0)
+        # The rest of the quiz is untouched
+        self.assertEqual(AnswerRecord.objects.filter(session=other).count(), 3)
+        self.assertEqual(self.quiz.questions.count(), 3)
+
+    def test_failed_job_resumes_from_the_command(self):
+        job = self.destroy(f"/api/pq/quizzes/{self.quiz.id}/")
+        raw_delete = deletion._raw_delete
+        calls = []
+
+        def fail_second_batch(model, ids):
+            calls.append(ids)
+            if len(calls) == 2:
+                raise OperationalError("connection lost")
+            return raw_delete(model, ids)
+
+        with mock.patch.object(deletion, "_raw_delete", fail_second_batch):
+            with self.assertRaises(OperationalError), self.assertLogs(deletion.logger, "ERROR"):
+                deletion.run_deletion_job(job.pk, batch_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (DeletionJob.STATUS_FAILED, "connection lost"))
+        self.assertEqual(job.progress["answerrecord"]["deleted"], 2)
+
+        out = StringIO()
+        call_command("run_deletion_jobs", stdout=out)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.STATUS_DONE)
+        self.assertEqual(job.progress["answerrecord"], {"total": 9, "deleted": 9})
+        self.assertFalse(AnswerRecord.objects.exists())
+        self.assertIn(f"Job {job.pk} (quiz Quiz)", out.getvalue())
+
+
+class ArchiveTests(TestCase):
+    """
+    Answers of long-ended sessions move into an AnswerArchive and back
+    without changing what is read from them.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        self.quiz = make_quiz(host, 3)
+        self.questions = list(self.quiz.questions.all())
+        self.session = QuizSession.objects.create(
+            quiz=self.quiz,
+            host=host,
+            status=QuizSession.STATUS_ENDED,
+            ended_at=timezone.now() - timedelta(days=60),
+        )
+        self.participants = [
+            ParticipantSession.objects.create(
+                session=self.session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            for i in range(2)
+        ]
+        AnswerRecord.objects.bulk_create(
+            [
+                AnswerRecord(
+                    participant=participant,
+                    session_id=self.session.id,
+                    question=question,
+                    selected_option="ABCD"[(i + j) % 4],
+                    time_taken_seconds=1.5 + 4 * i + j,
+                    within_time=j != 2,
+                    score=0.5 * j,
+                )
+                for i, participant in enumerate(self.participants)
+                for j, question in enumerate(self.questions)
+            ]
+        )
+        # Restoring must keep the original submission times
+        submitted = timezone.now() - timedelta(days=61, microseconds=123)
+        AnswerRecord.objects.update(submitted_at=submitted)
+
+    def rows(self):
+        return list(
+            AnswerRecord.objects.order_by("id").values_list(*archive.ARCHIVE_FIELDS)
+        )
+
+    def counters(self):
+        return {q.id: stats.aggregate_counters(self.session.id, q.id) for q in self.questions}
+
+    def test_archive_and_restore_round_trip(self):
+        rows, counters = self.rows(), self.counters()
+        self.assertEqual(list(archive.archive_candidates()), [self.session])
+
+        stored = archive.archive_session(self.session.id)
+        self.assertEqual(stored.row_count, 6)
+        self.assertFalse(AnswerRecord.objects.exists())
+        self.assertIsNone(archive.archive_session(self.session.id))
+        self.assertEqual(list(archive.archive_candidates()), [])
+
+        self.assertEqual(
+            list(archive.session_answer_values(self.session.id, archive.ARCHIVE_FIELDS)), rows
+        )
+        first = self.participants[0]
+        self.assertEqual(
+            archive.participant_answer_values(first, "question_id", "score"),
+            [{"question_id": row[2], "score": row[7]} for row in rows if row[1] == first.pk],
+        )
+        # Cold counters are rebuilt from the archive
+        self.assertEqual(self.counters(), counters)
+        self.assertEqual(
+            stats.ended_session_counters(self.session.id, list(counters)), counters
+        )
+
+        self.assertEqual(archive.restore_session(self.session.id), 6)
+        self.assertFalse(AnswerArchive.objects.exists())
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(self.counters(), counters)
+
+    def test_sessions_that_have_not_ended_are_not_archived(self):
+        QuizSession.objects.filter(pk=self.session.pk).update(status=QuizSession.STATUS_LIVE)
+        self.assertIsNone(archive.archive_session(self.session.id))
+        self.assertEqual(AnswerRecord.objects.count(), 6)
+
+    def test_restore_drops_answers_of_deleted_rows(self):
+        archive.archive_session(self.session.id)
+        self.participants[1].delete()
+        self.questions[0].delete()
+        self.assertEqual(archive.restore_session(self.session.id), 2)
+        self.assertEqual(
+            set(AnswerRecord.objects.values_list("participant_id", "question_id")),
+            {(self.participants[0].pk, question.id) for question in self.questions[1:]},
+        )
+
+
+class ScoringTests(TestCase):
+    WEIGHTS = {
+        "A": {"Health": 2, "wealth": 1, "unknown": 9},
+        "B": {"intellect": 3},
+        "C": [0, 0, 1, 0, 0, 0, 0, 0.5],
+    }
+
+    def test_score_answer(self):
+        weighted = Question(weights=self.WEIGHTS, correct_option="B")
+        self.assertEqual(
+            [scoring.score_answer(weighted, option) for option in "ABCD"], [3.0, 3.0, 1.5, 0.0]
+        )
+        plain = Question(correct_option="C")
+        self.assertEqual([scoring.score_answer(plain, option) for option in "ABCD"], [0, 0, 1, 0])
+        self.assertEqual(scoring.score_answer(Question(), "A"), 0.0)
+
+    def test_session_profiles_match_per_answer_scoring(self):
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        quiz = make_quiz(host, 3)
+        questions = list(quiz.questions.order_by("order"))
+        questions[0].weights = self.WEIGHTS
+        questions[1].weights = {"A": [1] * 8, "D": {"travel": 4}}
+        questions[2].correct_option = "A"
+        Question.objects.bulk_update(questions, ["weights", "correct_option"])
+        session = QuizSession.objects.create(quiz=quiz, host=host, status=QuizSession.STATUS_ENDED)
+        picks = {}
+        for i, options in enumerate(("ABA", "CD", "")):
+            participant = ParticipantSession.objects.create(
+                session=session,
+                user=User.objects.create_user(email=f"p{i}@example.com", username=f"p{i}"),
+            )
+            picks[participant.pk] = options
+            AnswerRecord.objects.bulk_create(
+                [
+                    AnswerRecord(
+                        participant=participant,
+                        session_id=session.id,
+                        question=question,
+                        selected_option=option,
+                        time_taken_seconds=2.0,
+                    )
+                    for question, option in zip(questions, options)
+                ]
+            )
+
+        profiles = scoring.session_profiles(session)
+        # Participants without answers have no profile
+        self.assertEqual(set(profiles), {pid for pid, options in picks.items() if options})
+        compiled = scoring.QuizWeights.for_quiz(quiz.id)
+        participant_ids, matrix = compiled.answer_matrix(scoring.session_answer_rows(session.id))
+        scores = compiled.scores(matrix)
+        for row, pid in enumerate(participant_ids):
+            answered = list(zip(questions, picks[pid]))
+            expected = [0.0] * len(scoring.PISTONS)
+            for question, option in answered:
+                for i, weight in enumerate(scoring.option_weights(question.weights, option)):
+                    expected[i] += weight
+            self.assertEqual(profiles[pid], dict(zip(scoring.PISTONS, expected)))
+            # Unanswered questions score 0
+            self.assertEqual(
+                scores[row].tolist(),
+                [scoring.score_answer(q, o) for q, o in answered]
+                + [0.0] * (len(questions) - len(answered)),
+            )
+
+    def test_unweighted_quiz_has_no_profiles(self):
+        User = get_user_model()
+        host = User.objects.create_user(email="host@example.com", username="host")
+        session = QuizSession.objects.create(
+            quiz=make_quiz(host, 2), host=host, status=QuizSession.STATUS_ENDED
+        )
+        self.assertEqual(scoring.session_profiles(session), {})
+
+
+@override_settings(PQ_WS_AUTH_CACHE_TTL_SECONDS=60)
+class SocketAuthCacheTests(TestCase):
+    """
+    Tokens stay cached until their `exp`, principals for
+    PQ_WS_AUTH_CACHE_TTL_SECONDS or until the user is saved.
+    """
+
+    def setUp(self):
+        for name in ("_tokens", "_principals"):
+            patcher = mock.patch.object(jwt_middleware, name, TTLCache(10))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(email="p@example.com", username="p")
+        self.token = AccessToken.for_user(self.user)
+        self.now = time.time()
+
+    def authenticate(self):
+        return async_to_sync(jwt_middleware._get_user_for_token)(str(self.token))
+
+    def cached(self, at):
+        with mock.patch("time.time", return_value=at):
+            return jwt_middleware._cached_user(str(self.token))
+
+    def test_cached_principal_needs_no_queries(self):
+        self.assertIsNone(self.cached(self.now))
+        self.assertEqual(self.authenticate().id, self.user.id)
+        with self.assertNumQueries(0):
+            principal = self.cached(self.now)
+        self.assertEqual(
+            (principal.id, principal.get_username()), (self.user.id, self.user.get_username())
+        )
+
+    def test_principal_expires_before_the_token(self):
+        self.authenticate()
+        self.assertIsNotNone(self.cached(self.now + 59))
+        self.assertIsNone(self.cached(self.now + 61))
+        # The token is still known; only the principal is loaded again
+        self.assertEqual(jwt_middleware._tokens.get(str(self.token)), str(self.user.id))
+        self.user.is_staff = True
+        self.user.save(update_fields=["is_staff"])
+        self.assertTrue(self.authenticate().is_staff)
+
+    def test_token_expires_at_its_exp(self):
+        self.authenticate()
+        with mock.patch("time.time", return_value=self.token["exp"] - 1):
+            self.assertIsNotNone(jwt_middleware._tokens.get(str(self.token)))
+        with mock.patch("time.time", return_value=self.token["exp"]):
+            self.assertIsNone(jwt_middleware._tokens.get(str(self.token)))
+
+    def test_saving_the_user_drops_the_principal(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        self.assertIsNone(self.cached(self.now))
+        self.assertFalse(self.authenticate().is_authenticated)
+
+
+class WireFormatTests(TestCase):
+    def unpack(self, frame):
+        return wire.msgpack.unpackb(frame, raw=False)
+
+    def test_stats_update_round_trip(self):
+        counters = stats.empty_counters()
+        counters.update({"A": 3, "C": 1, "total": 4, "time_sum": 9.5})
+        counters[stats.bucket_field(2.0)] = 3
+        counters[stats.bucket_field(3.5)] = 1
+        data = stats.stats_payload(12, counters)
+        frames = wire.encode_frames("stats_update", data, 7)
+
+        self.assertEqual(
+            json.loads(frames[wire.JSON]), {"event": "stats_update", "data": data, "seq": 7}
+        )
+        event, seq, (qid, total, average, counts, pcts, times, histogram) = self.unpack(
+            frames[wire.MSGPACK]
+        )
+        self.assertEqual((event, seq), ("stats_update", 7))
+        options = "abcd"
+        self.assertEqual(
+            {
+                "question_id": qid,
+                "total_responses": total,
+                "average_time": average,
+                **{f"option_{o}_count": count for o, count in zip(options, counts)},
+                **{f"option_{o}_pct": pct for o, pct in zip(options, pcts)},
+                **dict(zip(("p50_time", "p90_time", "p99_time"), times)),
+                "time_histogram": histogram,
+            },
+            data,
+        )
+        self.assertLess(len(frames[wire.MSGPACK]), len(frames[wire.JSON]) / 2)
+
+    def test_current_question_changed_round_trip(self):
+        User = get_user_model()
+        quiz = make_quiz(User.objects.create_user(email="host@example.com", username="host"), 1)
+        data = events.question_event_data(quiz.questions.get())
+        event, seq, (qid, text, options, order, time_limit) = self.unpack(
+            wire.encode(wire.MSGPACK, "current_question_changed", data, 3)
+        )
+        self.assertEqual(
+            {
+                "question_id": qid,
+                "question_text": text,
+                **{f"option_{o}": option for o, option in zip("abcd", options)},
+                "order": order,
+                "time_limit": time_limit,
+            },
+            data,
+        )
+
+    def test_other_events_keep_their_data(self):
+        data = {"user_id": 5, "username": "p", "scores": [1.5, 2]}
+        self.assertEqual(
+            self.unpack(wire.encode(wire.MSGPACK, "joined", data)), ["joined", None, data]
+        )
+        # JSON frames leave out a missing seq
+        self.assertEqual(
+            json.loads(wire.encode(wire.JSON, "joined", data)), {"event": "joined", "data": data}
+        )
+
+    def test_negotiate(self):
+        self.assertEqual(
+            wire.negotiate({"subprotocols": ["pq.msgpack"]}), (wire.MSGPACK, "pq.msgpack")
+        )
+        self.assertEqual(wire.negotiate({"query_string": b"format=msgpack"}), (wire.MSGPACK, None))
+        self.assertEqual(wire.negotiate({"subprotocols": ["other"]}), (wire.JSON, None))
+
+    def test_decode(self):
+        action = {"action": "submit_answer", "question_id": 3, "selected_option": "B"}
+        self.assertEqual(wire.decode(wire.msgpack.packb(action)), action)
+        for payload in (wire.msgpack.packb(["action"]), b"\xc1", b"\x81\xa6action"):
+            with self.assertRaises(ValueError):
+                wire.decode(payload)
@@ -0,0 +1,156 @@
+# backend/pq_test/timers.py
+"""
+Server-side quiz timers.
+
+`fire_due_timers` is run every PQ_TIMER_SWEEP_SECONDS by Celery beat
+(`pq_test.tasks.fire_due_timers`). Each timer is claimed with a conditional
+UPDATE, so it fires exactly once even with several sweepers or when a request
+notices the expiry first:
+
+- total quiz time: all unfinished participants are completed in one UPDATE
+  (with their unanswered questions) and one `session_time_expired` is sent;
+- question time (live-mode sessions only; async sessions are self-paced):
+  one `question_time_up` is sent with the final stats. Paused sessions don't
+  fire, and resume() pushes the expiry back by the length of the pause.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Exists, JSONField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .broadcast import flush_stats_updates
+from .events import publish_event_sync
+from .models import AnswerRecord, ParticipantSession, Question, QuizSession
+
+
+def complete_expired_participants(session_id, quiz_id, now=None):
+    """
+    Mark every unfinished participant of the session as completed by time,
+    storing the questions they did not answer. Returns the number completed.
+    """
+    now = now or timezone.now()
+    pending = ParticipantSession.objects.filter(session_id=session_id, completed=False)
+
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.aggregates import JSONBAgg
+
+        missing = (
+            Question.objects.filter(quiz_id=quiz_id)
+            .exclude(
+                Exists(
+                    AnswerRecord.objects.filter(
+                        question=OuterRef("pk"), participant=OuterRef(OuterRef("pk"))
+                    )
+                )
+            )
+            .order_by()
+            .values("quiz")
+            .annotate(ids=JSONBAgg("id"))
+            .values("ids")
+        )
+        return pending.update(
+            completed=True,
+            completed_reason="time_expired",
+            not_done_questions=Coalesce(
+                Subquery(missing), Value([], output_field=JSONField())
+            ),
+            last_active_at=now,
+        )
+
+    # Other backends: same result with one read of the answered pairs.
+    participant_ids = list(pending.values_list("id", flat=True))
+    if not participant_ids:
+        return 0
+    question_ids = list(
+        Question.objects.filter(quiz_id=quiz_id).values_list("id", flat=True)
+    )
+    answered = defaultdict(set)
+    for participant_id, question_id in AnswerRecord.objects.filter(
+        participant_id__in=participant_ids
+    ).values_list("participant_id", "question_id"):
+        answered[participant_id].add(question_id)
+    ParticipantSession.objects.bulk_update(
+        [
+            ParticipantSession(
+                id=participant_id,
+                completed=True,
+                completed_reason="time_expired",
+                not_done_questions=[
+                    qid for qid in question_ids if qid not in answered[participant_id]
+                ],
+                last_active_at=now,
+            )
+            for participant_id in participant_ids
+        ],
+        ["completed", "completed_reason", "not_done_questions", "last_active_at"],
+        batch_size=500,
+    )
+    return len(participant_ids)
+
+
+def expire_session(session_id, session_code, quiz_id, now=None):
+    """
+    Handle the end of a session's total time. Returns False if it was
+    already handled.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        claimed = QuizSession.objects.filter(
+            pk=session_id, time_expired_at__isnull=True
+        ).update(time_expired_at=now)
+        if not claimed:
+            return False
+        completed = complete_expired_participants(session_id, quiz_id, now)
+
+    flush_stats_updates(session_code)
+    publish_event_sync(
+        session_code, "session_time_expired", {"completed_participants": completed}
+    )
+    return True
+
+
+def expire_question(session_id, session_code, question_id, expires_at):
+    """
+    Announce that the current question's time is up. Returns False if this
+    timer was already fired, replaced by a question change or moved by a
+    pause, or the session is not a running live-mode one.
+    """
+    claimed = QuizSession.objects.filter(
+        pk=session_id,
+        mode=QuizSession.MODE_LIVE,
+        status=QuizSession.STATUS_LIVE,
+        current_question_id=question_id,
+        current_question_expires_at=expires_at,
+    ).update(current_question_expires_at=None)
+    if not claimed:
+        return False
+
+    flush_stats_updates(session_code, session_id, question_id)
+    publish_event_sync(session_code, "question_time_up", {"question_id": question_id})
+    return True
+
+
+def fire_due_timers(now=None):
+    """
+    Fire every session and question timer that is due. Returns
+    (sessions expired, questions expired).
+    """
+    now = now or timezone.now()
+
+    sessions = 0
+    for session_id, session_code, quiz_id in QuizSession.objects.filter(
+        total_time_expires_at__lte=now, time_expired_at__isnull=True
+    ).values_list("id", "session_code", "quiz_id"):
+        sessions += expire_session(session_id, session_code, quiz_id, now)
+
+    questions = 0
+    for session_id, session_code, question_id, expires_at in QuizSession.objects.filter(
+        mode=QuizSession.MODE_LIVE,
+        status=QuizSession.STATUS_LIVE,
+        current_question_expires_at__lte=now,
+    ).values_list("id", "session_code", "current_question_id", "current_question_expires_at"):
+        questions += expire_question(session_id, session_code, question_id, expires_at)
+
+    return sessions, questions
@@ -14,6 +14,8 @@ from .views import (
     MyResultDetailView,
     SessionStatsView,
     MySessionResultView,
+    SessionLeaderboardView,
+    DeletionJobView,
 )
 
 router = DefaultRouter()
@@ -39,6 +41,7 @@ urlpatterns = [
         SubmitAnswerView.as_view(),
         name="pq-submit-answer",
     ),
+    path("deletions/<int:job_id>/", DeletionJobView.as_view(), name="pq-deletion-job"),
     path("my/results/", MyResultsView.as_view(), name="pq-my-results"),
     path(
         "my/results/<int:participant_id>/",
@@ -50,6 +53,11 @@ urlpatterns = [
         SessionStatsView.as_view(),
         name="pq-session-stats-current",
     ),
+    path(
+        "sessions/<str:session_code>/leaderboard/",
+        SessionLeaderboardView.as_view(),
+        name="pq-session-leaderboard",
+    ),
     path(
     "sessions/<str:session_code>/my-answers/",
     MySessionResultView.as_view(),
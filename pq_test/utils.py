@@ -0,0 +1,61 @@
+# backend/pq_test/utils.py
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+_redis_client = None
+
+
+def get_redis():
+    """
+    Shared Redis client for the live-quiz stores (stats, leaderboards, ...).
+    Created lazily so the in-memory backends never need the redis package.
+    """
+    global _redis_client
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(
+            settings.PQ_REDIS_URL, decode_responses=True
+        )
+    return _redis_client
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU whose entries expire individually.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
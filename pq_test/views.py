@@ -1,7 +1,8 @@
 # backend/pq_test/views.py
+import time
 from datetime import timedelta
-from django.db import transaction
-from django.db.models import Count, Avg, Q
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
@@ -11,11 +12,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-
 from .models import (
     Classroom,
+    DeletionJob,
     Quiz,
     Question,
     QuizSession,
@@ -26,12 +25,14 @@ from .serializers import (
     ClassroomSerializer,
     ClassroomJoinSerializer,
     QuizSerializer,
+    QuizSummarySerializer,
     QuestionSerializer,
     QuizSessionSerializer,
     ParticipantSessionSerializer,
     AnswerRecordSerializer,
     SubmitAnswerSerializer,
     AggregatedStatsSerializer,
+    DeletionJobSerializer,
 )
 from .permissions import (
     IsOwnerOrReadOnly,
@@ -39,6 +40,22 @@ from .permissions import (
     IsHostOrReadOnly,
     IsSelfParticipant,
 )
+from .access import QUIZ_LIST_SOURCES, accessible_quiz_ids
+from .answers import AnswerRejected, submit_answer
+from .archive import participant_answer_values, participant_answers
+from .broadcast import flush_stats_updates
+from .bundles import question_bundle
+from .deletion import hide_quiz, hide_session
+from .events import publish_event_sync, question_event_data
+from .exports import ExportUnavailable, export_response, quiz_answers, session_answers
+from .leaderboard import invalidate_leaderboard, leaderboard_payload
+from .pagination import SessionCursorPagination
+from .presence import get_presence
+from .reports import session_question_stats, session_report
+from .scoring import session_profiles
+from .stats import invalidate_stats, question_stats
+from .timers import expire_session
+from .utils import TTLCache
 
 
 class ClassroomViewSet(viewsets.ModelViewSet):
@@ -52,7 +69,8 @@ class ClassroomViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Classroom.objects.filter(Q(owner=user) | Q(members=user)).distinct()
+        joined = Classroom.members.through.objects.filter(user=user).values("classroom_id")
+        return Classroom.objects.filter(Q(owner=user) | Q(id__in=joined))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -79,10 +97,28 @@ class QuizViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsOwnerOrHostOrReadOnly]
 
     def get_queryset(self):
-        user = self.request.user
-        return Quiz.objects.filter(
-            Q(owner=user) | Q(classroom__members=user) | Q(classroom__owner=user)
-        ).distinct()
+        visible = accessible_quiz_ids(self.request.user, QUIZ_LIST_SOURCES)
+        qs = (
+            Quiz.objects.select_related("owner")
+            .filter(id__in=visible)
+            .annotate(question_count=Count("questions"))
+        )
+        if self._summary():
+            return qs
+        # Prefetching also sets each question's quiz (effective_time_limit)
+        return qs.prefetch_related("questions")
+
+    def get_serializer_class(self):
+        if self._summary():
+            return QuizSummarySerializer
+        return QuizSerializer
+
+    def _summary(self):
+        """
+        Listings leave questions out unless asked for with ?expand=questions.
+        """
+        expand = self.request.query_params.get("expand", "").split(",")
+        return self.action == "list" and "questions" not in expand
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -105,10 +141,33 @@ class QuizViewSet(viewsets.ModelViewSet):
             QuizSerializer(quiz, context={"request": request}).data
         )
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"export/(?P<file_format>csv|xlsx|parquet)",
+    )
+    def export(self, request, file_format, pk=None):
+        """
+        Every answer of every session of the quiz, streamed (owner/staff only).
+        """
+        quiz = self.get_object()
+        user = request.user
+        if quiz.owner_id != getattr(user, "id", None) and not getattr(
+            user, "is_staff", False
+        ) and not getattr(user, "is_superuser", False):
+            return Response(
+                {"detail": "Not allowed."}, status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            return export_response(quiz_answers(quiz.id), file_format, f"quiz-{quiz.id}")
+        except ExportUnavailable as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
     def destroy(self, request, *args, **kwargs):
         """
         Allow quiz deletion by owner, staff, or any session host of the quiz.
-        Cascade remove related sessions/participants/answers to avoid FK protect.
+        The quiz and its sessions disappear at once; answers, participants,
+        sessions and questions are deleted in the background (202 + job).
         """
         quiz = self.get_object()
         user = request.user
@@ -124,15 +183,20 @@ class QuizViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        with transaction.atomic():
-            # Remove answers first (Question->AnswerRecord is PROTECT)
-            AnswerRecord.objects.filter(question__quiz=quiz).delete()
-            # Remove sessions and participants
-            QuizSession.objects.filter(quiz=quiz).delete()
-            # Remove questions then quiz
-            quiz.delete()
+        # Hidden now; rows are removed in batches by a background job
+        job = hide_quiz(quiz, user)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def _quiz_with_questions(quiz, request):
+    """
+    (quiz payload, its questions) with the questions from the cached bundle.
+    """
+    questions = question_bundle(quiz)
+    quiz.question_count = len(questions)
+    data = QuizSummarySerializer(quiz, context={"request": request}).data
+    data["questions"] = questions
+    return data, questions
 
 
 class QuestionViewSet(viewsets.ModelViewSet):
@@ -144,20 +208,35 @@ class QuestionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
         return Question.objects.filter(
-            Q(quiz__owner=user)
-            | Q(quiz__classroom__members=user)
-            | Q(quiz__classroom__owner=user)
-            | Q(quiz__sessions__host=user)
-        ).distinct()
+            quiz_id__in=accessible_quiz_ids(self.request.user)
+        )
 
     def perform_destroy(self, instance):
         # Remove answers first to avoid PROTECT constraint
+        session_ids = list(instance.quiz.sessions.values_list("id", flat=True))
         AnswerRecord.objects.filter(question=instance).delete()
+        for session_id in session_ids:
+            invalidate_stats(session_id, instance.id)
+            invalidate_leaderboard(session_id)
         return super().perform_destroy(instance)
 
 
+def _sessions_for(user):
+    """
+    Sessions annotated with whether `user` takes part in them.
+    """
+    return QuizSession.objects.annotate(
+        user_is_participant=Exists(
+            ParticipantSession.objects.filter(session=OuterRef("pk"), user=user)
+        )
+    )
+
+
+# Public-live pages by URL, shared by all users of this process
+_public_live_pages = TTLCache(1000)
+
+
 class QuizSessionViewSet(viewsets.ModelViewSet):
     """
     Hosts create and manage sessions for their quizzes.
@@ -165,16 +244,30 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
 
     serializer_class = QuizSessionSerializer
     permission_classes = [IsAuthenticated, IsHostOrReadOnly]
+    pagination_class = SessionCursorPagination
 
     def get_queryset(self):
+        # One query per page: host/quiz joined, participation as an EXISTS
+        # subquery (used by the filter and by `is_participant`)
         user = self.request.user
-        qs_host = QuizSession.objects.filter(host=user)
-        qs_participant = QuizSession.objects.filter(participants__user=user)
-        return (qs_host | qs_participant).distinct()
+        return (
+            _sessions_for(user)
+            .select_related("quiz", "host")
+            .filter(Q(host=user) | Q(user_is_participant=True))
+        )
 
     def perform_create(self, serializer):
         serializer.save(host=self.request.user)
 
+    def destroy(self, request, *args, **kwargs):
+        """
+        Hide the session at once and delete its rows in the background
+        (202 + job, see DeletionJobView).
+        """
+        session = self.get_object()
+        job = hide_session(session, request.user)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=["post"], url_path="start")
     def start_session(self, request, pk=None):
         session = self.get_object()
@@ -200,36 +293,15 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
                 session.quiz.questions.all().order_by("order", "id").first()
             )
             if first_question:
-                session.current_question = first_question
-                session.save(update_fields=["current_question"])
-                channel_layer = get_channel_layer()
-                question_payload = {
-                    "question_id": first_question.id,
-                    "question_text": first_question.text,
-                    "option_a": first_question.option_a,
-                    "option_b": first_question.option_b,
-                    "option_c": first_question.option_c,
-                    "option_d": first_question.option_d,
-                    "order": first_question.order,
-                    "time_limit": first_question.effective_time_limit(),
-                }
+                session.set_current_question(first_question)
+                question_payload = question_event_data(first_question)
                 initial_payload = question_payload
-                async_to_sync(channel_layer.group_send)(
-                    f"pq_session_{session.session_code}",
-                    {
-                        "type": "broadcast_event",
-                        "event": "current_question_changed",
-                        "data": question_payload,
-                    },
+                flush_stats_updates(session.session_code)
+                publish_event_sync(
+                    session.session_code, "current_question_changed", question_payload
                 )
-                stats = compute_question_stats(session, first_question)
-                async_to_sync(channel_layer.group_send)(
-                    f"pq_session_{session.session_code}",
-                    {
-                        "type": "broadcast_event",
-                        "event": "stats_update",
-                        "data": stats,
-                    },
+                flush_stats_updates(
+                    session.session_code, session.id, first_question.id
                 )
 
         data = QuizSessionSerializer(session, context={"request": request}).data
@@ -257,6 +329,7 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
     def end_session(self, request, pk=None):
         session = self.get_object()
         session.end()
+        flush_stats_updates(session.session_code)
         return Response(
             QuizSessionSerializer(session, context={"request": request}).data
         )
@@ -268,49 +341,39 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
         Returns session + quiz (with questions) for host or joined participant.
         """
         session = get_object_or_404(
-            QuizSession.objects.select_related("quiz"), session_code=session_code
+            _sessions_for(request.user).select_related("quiz__owner", "host"),
+            session_code=session_code,
         )
 
         is_host = session.host_id == request.user.id
-        is_participant = session.participants.filter(user=request.user).exists()
+        is_participant = session.user_is_participant
         if not is_host and not is_participant:
             return Response(
                 {"detail": "Not allowed for this session."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        # Mark participant completion if total timer expired
-        if session.total_time_expires_at and timezone.now() > session.total_time_expires_at:
-            participant = session.participants.filter(user=request.user).first()
-            if participant and not participant.completed:
-                missing = list(
-                    session.quiz.questions.exclude(
-                        answers__participant=participant
-                    ).values_list("id", flat=True)
-                )
-                participant.completed = True
-                participant.completed_reason = "time_expired"
-                participant.not_done_questions = missing
-                participant.save(
-                    update_fields=["completed", "completed_reason", "not_done_questions", "last_active_at"]
-                )
+        # Complete everyone if the total timer expired before the scheduler ran
+        if (
+            session.total_time_expires_at
+            and session.time_expired_at is None
+            and timezone.now() > session.total_time_expires_at
+        ):
+            expire_session(session.id, session.session_code, session.quiz_id)
 
         session_data = QuizSessionSerializer(
             session, context={"request": request}
         ).data
-        quiz_data = QuizSerializer(
-            session.quiz, context={"request": request}
-        ).data
+        quiz_data, questions = _quiz_with_questions(session.quiz, request)
         payload = {"session": session_data, "quiz": quiz_data}
 
         # Always include question stats so participants can see results later
-        payload["question_stats"] = [
-            compute_question_stats(session, q)
-            for q in session.quiz.questions.all()
-        ]
+        payload["question_stats"] = session_question_stats(
+            session, [Question(id=q["id"]) for q in questions]
+        )
 
         if is_host:
             participants = ParticipantSessionSerializer(
-                session.participants.all(),
+                session.participants.select_related("user"),
                 many=True,
                 context={"request": request},
             ).data
@@ -332,11 +395,20 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
             many=True,
             context={"request": request},
         ).data
-        question_stats = [
-            compute_question_stats(session, q) for q in session.quiz.questions.all()
-        ]
+        report = session_report(session)
+        question_stats = session_question_stats(
+            session, session.quiz.questions.all(), report
+        )
         return Response(
-            {"participants": participants, "question_stats": question_stats},
+            {
+                "participants": participants,
+                "question_stats": question_stats,
+                "piston_profiles": (
+                    report["piston_profiles"] if report else session_profiles(session)
+                ),
+                # Full report (distributions, histograms, completion) once ended
+                "report": report,
+            },
             status=status.HTTP_200_OK,
         )
 
@@ -351,9 +423,7 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
         Returns all questions (active) and stats when the session has ended.
         """
         session = get_object_or_404(
-            QuizSession.objects.select_related("quiz", "host").prefetch_related(
-                "quiz__questions"
-            ),
+            _sessions_for(request.user).select_related("quiz__owner", "host"),
             session_code=session_code,
         )
 
@@ -363,48 +433,105 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        quiz = session.quiz
-        questions = quiz.questions.filter(active=True).order_by("order", "id")
-        question_data = QuestionSerializer(
-            questions, many=True, context={"request": request}
-        ).data
+        quiz_data, questions = _quiz_with_questions(session.quiz, request)
+        question_data = [q for q in questions if q["active"]]
 
         payload = {
             "session": QuizSessionSerializer(
                 session, context={"request": request}
             ).data,
-            "quiz": QuizSerializer(quiz, context={"request": request}).data,
+            "quiz": quiz_data,
             "questions": question_data,
+            "connected": get_presence().store.count(session.session_code),
         }
 
         if session.status == QuizSession.STATUS_ENDED:
-            payload["question_stats"] = [
-                compute_question_stats(session, q) for q in questions
-            ]
+            payload["question_stats"] = session_question_stats(
+                session, [Question(id=q["id"]) for q in question_data]
+            )
 
         return Response(payload)
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"export/(?P<file_format>csv|xlsx|parquet)",
+    )
+    def export(self, request, file_format, pk=None):
+        """
+        Every answer of the session, streamed (host/staff only). The format is
+        a path segment because DRF reserves `?format=`.
+        """
+        session = self.get_object()
+        user = request.user
+        if session.host_id != getattr(user, "id", None) and not getattr(
+            user, "is_staff", False
+        ) and not getattr(user, "is_superuser", False):
+            return Response(
+                {"detail": "Not allowed."}, status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            return export_response(
+                session_answers(session), file_format, f"session-{session.session_code}"
+            )
+        except ExportUnavailable as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
     # 🔹 NEW ACTION: public_live
     @action(detail=False, methods=["get"], url_path="public-live")
     def public_live(self, request):
         """
-        GET /api/pq/sessions/public-live/
+        GET /api/pq/sessions/public-live/?include_async=1&cursor=...
 
-        Returns all LIVE, PUBLIC sessions.
-        Serializer includes is_host / is_participant so frontend
-        can show 'Host dashboard' vs 'Join & play'.
+        Returns LIVE, PUBLIC sessions, newest first, a cursor page at a time.
+        Pages are cached for PQ_PUBLIC_LIVE_CACHE_SECONDS; is_host /
+        is_participant (so the frontend can show 'Host dashboard' vs
+        'Join & play') are filled in for the requesting user.
         """
-        include_async = request.query_params.get("include_async") in {"1", "true", "True"}
-        qs = QuizSession.objects.select_related("quiz", "host").filter(
-            is_public=True,
-            status=QuizSession.STATUS_LIVE,
+        key = request.build_absolute_uri()
+        page = _public_live_pages.get(key)
+        if page is None:
+            include_async = request.query_params.get("include_async") in {"1", "true", "True"}
+            qs = QuizSession.objects.select_related("quiz", "host").filter(
+                is_public=True,
+                status=QuizSession.STATUS_LIVE,
+            )
+            if not include_async:
+                qs = qs.filter(mode=QuizSession.MODE_LIVE)
+            paginator = SessionCursorPagination()
+            sessions = paginator.paginate_queryset(qs, request, view=self)
+            page = {
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                # Serialized without the request: no per-user fields in the cache
+                "results": QuizSessionSerializer(sessions, many=True).data,
+            }
+            _public_live_pages.set(
+                key, page, time.time() + settings.PQ_PUBLIC_LIVE_CACHE_SECONDS
+            )
+
+        user = request.user
+        session_ids = [row["id"] for row in page["results"]]
+        joined = set(
+            ParticipantSession.objects.filter(
+                user=user, session_id__in=session_ids
+            ).values_list("session_id", flat=True)
+        ) if session_ids else set()
+        return Response(
+            {
+                "next": page["next"],
+                "previous": page["previous"],
+                "results": [
+                    {
+                        **row,
+                        "is_host": row["host"] == user.id,
+                        "is_participant": row["id"] in joined,
+                    }
+                    for row in page["results"]
+                ],
+            }
         )
-        if not include_async:
-            qs = qs.filter(mode=QuizSession.MODE_LIVE)
-        data = QuizSessionSerializer(
-            qs, many=True, context={"request": request}
-        ).data
-        return Response(data)
+
 
 class JoinSessionView(APIView):
     """
@@ -455,14 +582,8 @@ class JoinSessionView(APIView):
         ).data
 
         # Notify host/projector via websocket that a participant joined
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"pq_session_{session.session_code}",
-            {
-                "type": "broadcast_event",
-                "event": "participant_joined",
-                "data": data,
-            },
+        publish_event_sync(
+            session.session_code, "participant_joined", data, hosts_only=True
         )
         return Response(data, status=status.HTTP_200_OK)
 
@@ -477,7 +598,8 @@ class SetCurrentQuestionView(APIView):
 
     def post(self, request, session_code):
         session = get_object_or_404(
-            QuizSession.objects.select_related("quiz"), session_code=session_code
+            QuizSession.objects.select_related("quiz__owner", "host"),
+            session_code=session_code,
         )
         if session.host_id != request.user.id and not request.user.is_staff and not request.user.is_superuser:
             return Response({"detail": "Not host."}, status=status.HTTP_403_FORBIDDEN)
@@ -495,40 +617,19 @@ class SetCurrentQuestionView(APIView):
         if session.status == QuizSession.STATUS_NOT_STARTED:
             session.start()
 
-        session.current_question = question
-        session.save(update_fields=["current_question"])
-
-        channel_layer = get_channel_layer()
-        question_payload = {
-            "question_id": question.id,
-            "question_text": question.text,
-            "option_a": question.option_a,
-            "option_b": question.option_b,
-            "option_c": question.option_c,
-            "option_d": question.option_d,
-            "order": question.order,
-            "time_limit": question.effective_time_limit(),
-        }
+        session.set_current_question(question)
 
-        async_to_sync(channel_layer.group_send)(
-            f"pq_session_{session.session_code}",
-            {
-                "type": "broadcast_event",
-                "event": "current_question_changed",
-                "data": question_payload,
-            },
-        )
+        # Deliver pending stats of the previous question before switching
+        flush_stats_updates(session.session_code)
 
-        stats = compute_question_stats(session, question)
-        async_to_sync(channel_layer.group_send)(
-            f"pq_session_{session.session_code}",
-            {
-                "type": "broadcast_event",
-                "event": "stats_update",
-                "data": stats,
-            },
+        question_payload = question_event_data(question)
+
+        publish_event_sync(
+            session.session_code, "current_question_changed", question_payload
         )
 
+        flush_stats_updates(session.session_code, session.id, question.id)
+
         return Response({"detail": "Question broadcast."}, status=status.HTTP_200_OK)
 
 
@@ -541,111 +642,10 @@ class SubmitAnswerView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, session_code):
-        session = get_object_or_404(QuizSession, session_code=session_code)
-
-        # Total quiz timer enforcement
-        if session.total_time_expires_at and timezone.now() > session.total_time_expires_at:
-            participant = ParticipantSession.objects.filter(
-                session=session, user=request.user
-            ).first()
-            if participant:
-                missing = list(
-                    session.quiz.questions.exclude(
-                        answers__participant=participant
-                    ).values_list("id", flat=True)
-                )
-                participant.completed = True
-                participant.completed_reason = "time_expired"
-                participant.not_done_questions = missing
-                participant.save(update_fields=["completed", "completed_reason", "not_done_questions", "last_active_at"])
-            return Response(
-                {"detail": "Quiz time is over. Unanswered questions marked as not done."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # If host hasn't explicitly started, allow first submission to start it
-        if session.status == QuizSession.STATUS_NOT_STARTED:
-            session.start()
-
-        if session.status != QuizSession.STATUS_LIVE:
-            return Response(
-                {"detail": "Session is not live."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        participant, _ = ParticipantSession.objects.get_or_create(
-            session=session,
-            user=request.user,
-            defaults={},
-        )
-
-        data = request.data or {}
-        question_id = data.get("question_id")
-        if question_id in [None, ""]:
-            # Fallback to the session's current question if not provided
-            question_id = getattr(session, "current_question_id", None)
-        try:
-            question_id = int(question_id)
-        except Exception:
-            return Response(
-                {"detail": "question_id is required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        selected_option = (data.get("selected_option") or "").upper()
-        if selected_option not in {"A", "B", "C", "D"}:
-            return Response(
-                {"detail": "selected_option must be one of A, B, C, D."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         try:
-            time_taken = float(data.get("time_taken_seconds", 0)) or 0.0
-        except Exception:
-            time_taken = 0.0
-
-        question = get_object_or_404(Question, id=question_id, quiz=session.quiz)
-
-        score = 0.0
-        if question.correct_option and selected_option == question.correct_option:
-            score = 1.0
-        # For 8PQ we will use weights later
-
-        answer, created = AnswerRecord.objects.update_or_create(
-            participant=participant,
-            question=question,
-            defaults={
-                "selected_option": selected_option,
-                "time_taken_seconds": time_taken,
-                "within_time": True,
-                "score": score,
-            },
-        )
-
-        # Mark completion if all questions answered
-        remaining = (
-            session.quiz.questions.exclude(answers__participant=participant)
-            .exclude(id=question.id)
-            .count()
-        )
-        if remaining == 0:
-            participant.completed = True
-            participant.completed_reason = "answered_all"
-            participant.not_done_questions = []
-            participant.save(
-                update_fields=["completed", "completed_reason", "not_done_questions", "last_active_at"]
-            )
-
-        channel_layer = get_channel_layer()
-        payload = compute_question_stats(session, question)
-        async_to_sync(channel_layer.group_send)(
-            f"pq_session_{session.session_code}",
-            {
-                "type": "broadcast_event",
-                "event": "stats_update",
-                "data": payload,
-            },
-        )
+            answer, _ = submit_answer(session_code, request.user, request.data)
+        except AnswerRejected as exc:
+            return Response({"detail": exc.detail}, status=exc.status_code)
 
         return Response(
             AnswerRecordSerializer(answer, context={"request": request}).data,
@@ -684,7 +684,7 @@ class MyResultDetailView(APIView):
 
     def get(self, request, participant_id):
         participant = self.get_object(request, participant_id)
-        answers = participant.answers.select_related("question").all()
+        answers = participant_answers(participant)
         data = {
             "participant": ParticipantSessionSerializer(
                 participant, context={"request": request}
@@ -708,8 +708,8 @@ class MySessionResultView(APIView):
       participant = get_object_or_404(
           ParticipantSession, session=session, user=request.user
       )
-      answers = participant.answers.values("question_id", "selected_option")
-      return Response({"answers": list(answers)}, status=status.HTTP_200_OK)
+      answers = participant_answer_values(participant, "question_id", "selected_option")
+      return Response({"answers": answers}, status=status.HTTP_200_OK)
 
 
 
@@ -722,60 +722,73 @@ class SessionStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, session_code):
-        session = get_object_or_404(QuizSession, session_code=session_code)
+        session = get_object_or_404(
+            QuizSession.objects.only("id", "current_question_id"),
+            session_code=session_code,
+        )
 
-        question = session.current_question
-        if not question:
+        if not session.current_question_id:
             return Response(
                 {"detail": "No active question for this session."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        payload = compute_question_stats(session, question)
+        payload = question_stats(session.id, session.current_question_id)
         serializer = AggregatedStatsSerializer(payload)
         return Response(serializer.data)
 
 
-def compute_question_stats(session: QuizSession, question: Question):
+class SessionLeaderboardView(APIView):
     """
-    Compute aggregated stats for a question within a session.
+    GET /api/pq/sessions/<session_code>/leaderboard/?limit=10
+    Top participants by score (ties: less total time first), plus the
+    caller's own rank when they take part in the session.
     """
 
-    answers = AnswerRecord.objects.filter(
-        question=question,
-        participant__session=session,
-    )
+    permission_classes = [IsAuthenticated]
 
-    agg = answers.aggregate(
-        total_responses=Count("id"),
-        avg_time=Avg("time_taken_seconds"),
-        a_count=Count("id", filter=Q(selected_option="A")),
-        b_count=Count("id", filter=Q(selected_option="B")),
-        c_count=Count("id", filter=Q(selected_option="C")),
-        d_count=Count("id", filter=Q(selected_option="D")),
-    )
+    def get(self, request, session_code):
+        session = get_object_or_404(
+            QuizSession.objects.only("id", "host_id", "show_leaderboard", "show_names_on_projector"),
+            session_code=session_code,
+        )
+        is_host = session.host_id == request.user.id
+        if not session.show_leaderboard and not is_host:
+            return Response(
+                {"detail": "Leaderboard is hidden for this session."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
-    total = agg["total_responses"] or 0
-
-    # compute percentages safely
-    if total > 0:
-        a_pct = (agg["a_count"] or 0) * 100.0 / total
-        b_pct = (agg["b_count"] or 0) * 100.0 / total
-        c_pct = (agg["c_count"] or 0) * 100.0 / total
-        d_pct = (agg["d_count"] or 0) * 100.0 / total
-    else:
-        a_pct = b_pct = c_pct = d_pct = 0.0
-
-    return {
-        "question_id": question.id,
-        "total_responses": total,
-        "average_time": agg["avg_time"] or 0.0,
-        "option_a_count": agg["a_count"] or 0,
-        "option_b_count": agg["b_count"] or 0,
-        "option_c_count": agg["c_count"] or 0,
-        "option_d_count": agg["d_count"] or 0,
-        "option_a_pct": a_pct,
-        "option_b_pct": b_pct,
-        "option_c_pct": c_pct,
-        "option_d_pct": d_pct,
-    }
+        try:
+            limit = min(max(int(request.query_params.get("limit", 0)), 0), 100)
+        except ValueError:
+            limit = 0
+
+        participant_id = (
+            ParticipantSession.objects.filter(session=session, user=request.user)
+            .values_list("id", flat=True)
+            .first()
+        )
+        payload = leaderboard_payload(
+            session.id,
+            participant_id=participant_id,
+            limit=limit or None,
+            show_names=is_host or session.show_names_on_projector,
+        )
+        return Response(payload)
+
+
+class DeletionJobView(APIView):
+    """
+    GET /api/pq/deletions/<job_id>/
+    Progress of a background quiz/session deletion (requester or staff).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(DeletionJob, pk=job_id)
+        user = request.user
+        if job.requested_by_id != user.id and not user.is_staff and not user.is_superuser:
+            return Response({"detail": "Not allowed."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(DeletionJobSerializer(job).data)
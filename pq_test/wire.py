@@ -0,0 +1,109 @@
+# backend/pq_test/wire.py
+"""
+Websocket wire formats.
+
+A connection picks its format when it opens: the `pq.msgpack` subprotocol
+(or `?format=msgpack`) selects MessagePack, anything else keeps JSON.
+
+JSON frames are `{"event", "data", "seq"}` objects, as before. MessagePack
+frames are `[event, seq, data]` arrays, and the high-volume events carry
+positional data instead of named keys:
+
+- stats_update:             [question_id, total_responses, average_time,
+                             [count A, B, C, D], [pct A, B, C, D],
+                             [p50, p90, p99 time], time_histogram]
+- current_question_changed: [question_id, question_text,
+                             [option A, B, C, D], order, time_limit]
+
+Group broadcasts are encoded once per format by `publish_event` (see
+`encode_frames`) and every consumer sends the ready frame for its format.
+MessagePack clients may also send their actions as binary frames.
+"""
+import json
+import urllib.parse
+
+import msgpack
+
+JSON = "json"
+MSGPACK = "msgpack"
+FORMATS = (JSON, MSGPACK)
+
+MSGPACK_SUBPROTOCOL = "pq.msgpack"
+
+_OPTIONS = ("a", "b", "c", "d")
+
+
+def negotiate(scope):
+    """
+    (format, subprotocol to accept) for a websocket scope.
+    """
+    if MSGPACK_SUBPROTOCOL in scope.get("subprotocols", []):
+        return MSGPACK, MSGPACK_SUBPROTOCOL
+    query = urllib.parse.parse_qs(scope.get("query_string", b"").decode())
+    if query.get("format", [JSON])[0] == MSGPACK:
+        return MSGPACK, None
+    return JSON, None
+
+
+def _compact_stats(data):
+    return [
+        data["question_id"],
+        data["total_responses"],
+        data["average_time"],
+        [data[f"option_{o}_count"] for o in _OPTIONS],
+        [data[f"option_{o}_pct"] for o in _OPTIONS],
+        [data["p50_time"], data["p90_time"], data["p99_time"]],
+        data["time_histogram"],
+    ]
+
+
+def _compact_question(data):
+    return [
+        data["question_id"],
+        data["question_text"],
+        [data[f"option_{o}"] for o in _OPTIONS],
+        data["order"],
+        data["time_limit"],
+    ]
+
+
+_COMPACT = {
+    "stats_update": _compact_stats,
+    "current_question_changed": _compact_question,
+}
+
+
+def encode(fmt, event, data, seq=None):
+    """
+    One frame: str for JSON, bytes for MessagePack.
+    """
+    if fmt == MSGPACK:
+        compact = _COMPACT.get(event)
+        return msgpack.packb(
+            [event, seq, compact(data) if compact else data], use_bin_type=True
+        )
+    frame = {"event": event, "data": data}
+    if seq is not None:
+        frame["seq"] = seq
+    return json.dumps(frame)
+
+
+def encode_frames(event, data, seq=None):
+    """
+    The frame in every format, for a broadcast.
+    """
+    return {fmt: encode(fmt, event, data, seq) for fmt in FORMATS}
+
+
+def decode(payload):
+    """
+    Client action from a binary (MessagePack) frame. Raises ValueError for
+    anything but a well-formed map.
+    """
+    try:
+        content = msgpack.unpackb(payload, raw=False)
+    except msgpack.UnpackException as exc:
+        raise ValueError(str(exc)) from exc
+    if not isinstance(content, dict):
+        raise ValueError("Expected a map")
+    return content